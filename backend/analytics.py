@@ -0,0 +1,354 @@
+"""
+Evaluation Analytics
+
+Flattens the evaluations of every session into one columnar table (pandas),
+one row per learner x scenario x dimension, for instructor dashboards:
+rating distributions per scenario, cohort or objective, and the scenarios
+where learners diverge most from the experts.
+
+Columns:
+    session_id, learner_id, cohort_id, training_type, module   categorical
+    situation, scenario                                         int16
+    dimension   coverage | logical_reasoning | communication | skill
+    objective   learning objective of a skill row ("" otherwise)
+    rating      High / Medium / Low, Satisfactory / Unsatisfactory,
+                Excellent / Good / Needs Improvement             categorical
+    score       rating on a 0-1 scale (RATING_SCORES)            float32
+    evaluated_at                                                 float64
+
+Storage (.analytics/): each evaluated session is appended as its own part
+file (re-evaluating a session replaces its part); once ANALYTICS_COMPACT_PARTS
+parts accumulate they are merged into base.<ext>. Parquet when pyarrow is
+installed, otherwise compressed .npz of category codes. Every worker keeps
+the table in memory and only reads the parts it has not seen yet.
+
+Rows outlive the sessions: aggregates stay available after the session TTL.
+"""
+
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+ANALYTICS_DIR = Path(__file__).parent.parent / ".analytics"
+ANALYTICS_COMPACT_PARTS = int(os.getenv("ANALYTICS_COMPACT_PARTS", "50"))
+
+RATING_SCORES: Dict[str, Dict[str, float]] = {
+    "coverage": {"High": 1.0, "Medium": 0.5, "Low": 0.0},
+    "logical_reasoning": {"Satisfactory": 1.0, "Unsatisfactory": 0.0},
+    "communication": {"Excellent": 1.0, "Good": 0.5, "Needs Improvement": 0.0},
+    "skill": {"Satisfactory": 1.0, "Unsatisfactory": 0.0},
+}
+DIMENSIONS = tuple(RATING_SCORES)
+RATINGS = list(dict.fromkeys(r for scores in RATING_SCORES.values() for r in scores))
+
+CATEGORY_COLUMNS = ("session_id", "learner_id", "cohort_id", "training_type", "module", "dimension",
+                    "objective", "rating")
+COLUMNS = ("session_id", "learner_id", "cohort_id", "training_type", "module", "situation", "scenario",
+           "dimension", "objective", "rating", "score", "evaluated_at")
+GROUP_COLUMNS = ("training_type", "cohort_id", "learner_id", "session_id", "module", "situation", "scenario",
+                 "dimension", "objective")
+
+
+def _has_pyarrow() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+FILE_SUFFIX = ".parquet" if _has_pyarrow() else ".npz"
+
+
+def _number(key: str) -> int:
+    """'scenario 4' -> 4 (0 when the key carries no number)"""
+    digits = "".join(c for c in key if c.isdigit())
+    return int(digits) if digits else 0
+
+
+def empty_frame() -> pd.DataFrame:
+    return _typed(pd.DataFrame({column: [] for column in COLUMNS}))
+
+
+def _typed(df: pd.DataFrame) -> pd.DataFrame:
+    """Apply the column types; ratings share one fixed set of categories"""
+    for column in CATEGORY_COLUMNS:
+        if column == "rating":
+            df[column] = pd.Categorical(df[column], categories=RATINGS)
+        else:
+            df[column] = df[column].astype(str).astype("category")
+    df["situation"] = df["situation"].astype(np.int16)
+    df["scenario"] = df["scenario"].astype(np.int16)
+    df["score"] = df["score"].astype(np.float32)
+    df["evaluated_at"] = df["evaluated_at"].astype(np.float64)
+    return df
+
+
+def flatten_evaluations(session_id: str, evaluations: Dict[str, Any], training_type: str,
+                        learner_id: Optional[str] = None, cohort_id: Optional[str] = None,
+                        evaluated_at: Optional[float] = None) -> pd.DataFrame:
+    """One row per module x scenario x dimension of a session's evaluations.
+
+    Skills not present in a scenario are left out; a missing rating has a
+    NaN score.
+    """
+    columns: Dict[str, List[Any]] = {column: [] for column in COLUMNS}
+
+    def add(module, situation, scenario, dimension, objective, rating):
+        for column, value in (("module", module), ("situation", situation), ("scenario", scenario),
+                              ("dimension", dimension), ("objective", objective), ("rating", rating)):
+            columns[column].append(value)
+        columns["score"].append(RATING_SCORES[dimension].get(rating, np.nan))
+
+    for module, training in evaluations.items():
+        for sit_key, situation in (training or {}).get("situations", {}).items():
+            for scen_key, scenario in (situation or {}).get("scenarios", {}).items():
+                scenario = scenario or {}
+                numbers = (_number(sit_key), _number(scen_key))
+                add(module, *numbers, "coverage", "", (scenario.get("coverage") or {}).get("score_assessment"))
+                add(module, *numbers, "logical_reasoning", "", (scenario.get("logical_reasoning") or {}).get("rating"))
+                add(module, *numbers, "communication", "", (scenario.get("communication") or {}).get("rating"))
+                for objective, skill in (scenario.get("skills_assessment") or {}).items():
+                    if skill and skill.get("present_in_scenario"):
+                        add(module, *numbers, "skill", objective, skill.get("learner_assessment"))
+
+    rows = len(columns["module"])
+    columns["session_id"] = [session_id] * rows
+    columns["learner_id"] = [learner_id or session_id] * rows
+    columns["cohort_id"] = [cohort_id or ""] * rows
+    columns["training_type"] = [training_type] * rows
+    columns["evaluated_at"] = [evaluated_at or time.time()] * rows
+    return _typed(pd.DataFrame(columns, columns=list(COLUMNS)))
+
+
+# ----- columnar files -----
+
+def write_frame(df: pd.DataFrame, path: Path):
+    """Write atomically as Parquet or, without pyarrow, as .npz of category codes"""
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    if path.suffix == ".parquet":
+        df.to_parquet(tmp, index=False)
+    else:
+        arrays = {}
+        for column in COLUMNS:
+            if column in CATEGORY_COLUMNS:
+                arrays[f"{column}__codes"] = df[column].cat.codes.to_numpy(np.int32)
+                arrays[f"{column}__categories"] = np.asarray(df[column].cat.categories, dtype=str)
+            else:
+                arrays[column] = df[column].to_numpy()
+        with open(tmp, "wb") as f:
+            np.savez_compressed(f, **arrays)
+    tmp.replace(path)
+
+
+def read_frame(path: Path) -> pd.DataFrame:
+    if path.suffix == ".parquet":
+        return _typed(pd.read_parquet(path))
+    with np.load(path, allow_pickle=False) as arrays:
+        data = {}
+        for column in COLUMNS:
+            if column in CATEGORY_COLUMNS:
+                data[column] = pd.Categorical.from_codes(arrays[f"{column}__codes"],
+                                                         categories=arrays[f"{column}__categories"].tolist())
+            else:
+                data[column] = arrays[column]
+    return _typed(pd.DataFrame(data, columns=list(COLUMNS)))
+
+
+def _concat(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenate keeping the columns categorical (categories are unioned first)"""
+    frames = [df for df in frames if len(df)]
+    if not frames:
+        return empty_frame()
+    if len(frames) == 1:
+        return frames[0]
+    for column in CATEGORY_COLUMNS:
+        if column != "rating":
+            categories = union_categoricals([df[column] for df in frames]).categories
+            frames = [df.assign(**{column: df[column].cat.set_categories(categories)}) for df in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+class EvaluationAnalytics:
+    """Columnar table of all evaluated sessions, appended per session and reloaded incrementally"""
+
+    def __init__(self, data_dir: Path = ANALYTICS_DIR, compact_parts: int = ANALYTICS_COMPACT_PARTS):
+        self.data_dir = data_dir
+        self.compact_parts = compact_parts
+        self._lock = threading.Lock()
+        self._base_mtime: Optional[float] = None
+        self._base = empty_frame()
+        self._parts: Dict[str, pd.DataFrame] = {}       # session_id -> rows
+        self._part_mtimes: Dict[str, float] = {}
+        self._frame: Optional[pd.DataFrame] = None       # base + parts, rebuilt on change
+
+    def _base_path(self) -> Path:
+        return self.data_dir / f"base{FILE_SUFFIX}"
+
+    def _part_path(self, session_id: str) -> Path:
+        safe_id = session_id.replace("/", "_").replace("..", "_")
+        return self.data_dir / f"part-{safe_id}{FILE_SUFFIX}"
+
+    def append(self, session_id: str, evaluations: Dict[str, Any], training_type: str,
+               learner_id: Optional[str] = None, cohort_id: Optional[str] = None) -> int:
+        """Add (or replace) the rows of a session; returns the number of rows"""
+        df = flatten_evaluations(session_id, evaluations, training_type, learner_id, cohort_id)
+        path = self._part_path(session_id)
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        write_frame(df, path)
+        with self._lock:
+            self._parts[session_id] = df
+            self._part_mtimes[session_id] = path.stat().st_mtime
+            self._frame = None
+            compact = len(self._parts) >= self.compact_parts
+        if compact:
+            self.compact()
+        return len(df)
+
+    def refresh(self):
+        """Read the base and part files written since the last call (by any worker)"""
+        with self._lock:
+            base_path = self._base_path()
+            base_mtime = base_path.stat().st_mtime if base_path.exists() else None
+            if base_mtime != self._base_mtime:
+                self._base = read_frame(base_path) if base_mtime is not None else empty_frame()
+                self._base_mtime = base_mtime
+                self._frame = None
+            seen = set()
+            for path in self.data_dir.glob(f"part-*{FILE_SUFFIX}") if self.data_dir.is_dir() else []:
+                session_id = path.name[len("part-"):-len(FILE_SUFFIX)]
+                seen.add(session_id)
+                try:
+                    mtime = path.stat().st_mtime
+                    if self._part_mtimes.get(session_id) != mtime:
+                        self._parts[session_id] = read_frame(path)
+                        self._part_mtimes[session_id] = mtime
+                        self._frame = None
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"⚠️  Skipping analytics part {path.name}: {e}")
+            # Parts merged into the base by a compaction
+            for session_id in set(self._parts) - seen:
+                del self._parts[session_id], self._part_mtimes[session_id]
+                self._frame = None
+
+    def _build_locked(self) -> pd.DataFrame:
+        if self._frame is None:
+            base = self._base
+            if self._parts and len(base):
+                base = base[~base["session_id"].isin(list(self._parts))]
+            self._frame = _concat([base, *self._parts.values()])
+        return self._frame
+
+    def frame(self) -> pd.DataFrame:
+        """The whole table; a part replaces the base rows of its session"""
+        self.refresh()
+        with self._lock:
+            return self._build_locked()
+
+    def compact(self):
+        """Merge the part files into the base file"""
+        self.refresh()
+        with self._lock:
+            df = self._build_locked()
+            write_frame(df, self._base_path())
+            merged = 0
+            for session_id, mtime in list(self._part_mtimes.items()):
+                path = self._part_path(session_id)
+                try:
+                    # Rewritten since it was read: keep it, it overrides the base
+                    if path.stat().st_mtime != mtime:
+                        continue
+                    path.unlink()
+                except OSError:
+                    continue
+                del self._parts[session_id], self._part_mtimes[session_id]
+                merged += 1
+            self._base, self._base_mtime = df, self._base_path().stat().st_mtime
+            self._frame = None
+        print(f"🗜️  Analytics compacted: {len(df)} rows, {merged} parts merged")
+
+    # ----- queries -----
+
+    def select(self, **filters: Optional[str]) -> pd.DataFrame:
+        """Rows matching every non-empty filter (column=value)"""
+        df = self.frame()
+        for column, value in filters.items():
+            if value not in (None, ""):
+                if column not in GROUP_COLUMNS:
+                    raise ValueError(f"Unknown filter '{column}'. Available: {', '.join(GROUP_COLUMNS)}")
+                df = df[df[column] == (int(value) if column in ("situation", "scenario") else value)]
+        return df
+
+    def group(self, by: List[str], **filters: Optional[str]) -> List[Dict[str, Any]]:
+        """Per group: row count, mean score and rating distribution"""
+        unknown = [column for column in by if column not in GROUP_COLUMNS]
+        if not by or unknown:
+            raise ValueError(f"Invalid group-by {unknown or by}. Available: {', '.join(GROUP_COLUMNS)}")
+        df = self.select(**filters)
+        if not len(df):
+            return []
+        grouped = df.groupby(by, observed=True)
+        stats = grouped["score"].agg(["mean"])
+        stats["rows"] = grouped.size()
+        stats["learners"] = grouped["learner_id"].nunique()
+        ratings = df.groupby(by + ["rating"], observed=True).size().unstack("rating", fill_value=0)
+        stats = stats.join(ratings)
+        groups = []
+        for keys, row in stats.iterrows():
+            keys = keys if isinstance(keys, tuple) else (keys,)
+            groups.append({
+                **{column: (int(key) if isinstance(key, np.integer) else key) for column, key in zip(by, keys)},
+                "rows": int(row["rows"]),
+                "learners": int(row["learners"]),
+                "mean_score": None if pd.isna(row["mean"]) else round(float(row["mean"]), 3),
+                "ratings": {rating: int(row[rating]) for rating in ratings.columns if row[rating]},
+            })
+        return groups
+
+    def divergence(self, limit: int = 10, dimension: str = "coverage", **filters: Optional[str]) -> List[Dict[str, Any]]:
+        """Scenarios where learners diverge most from the experts: lowest mean score first"""
+        if dimension not in DIMENSIONS:
+            raise ValueError(f"Unknown dimension '{dimension}'. Available: {', '.join(DIMENSIONS)}")
+        groups = self.group(["training_type", "module", "situation", "scenario"], dimension=dimension, **filters)
+        groups = [g for g in groups if g["mean_score"] is not None]
+        groups.sort(key=lambda g: (g["mean_score"], -g["learners"]))
+        return groups[:limit]
+
+    def summary(self, **filters: Optional[str]) -> Dict[str, Any]:
+        df = self.select(**filters)
+        return {
+            "rows": int(len(df)),
+            "sessions": int(df["session_id"].nunique()),
+            "learners": int(df["learner_id"].nunique()),
+            "training_types": sorted(df["training_type"].unique().tolist()),
+            "format": FILE_SUFFIX.lstrip("."),
+            "dimensions": self.group(["dimension"], **filters),
+        }
+
+
+_analytics_instance: Optional[EvaluationAnalytics] = None
+_analytics_lock = threading.Lock()
+
+
+def get_evaluation_analytics() -> EvaluationAnalytics:
+    """Process-wide evaluation analytics"""
+    global _analytics_instance
+    with _analytics_lock:
+        if _analytics_instance is None:
+            _analytics_instance = EvaluationAnalytics()
+    return _analytics_instance
+
+
+def record_evaluations(session_id: str, evaluations: Dict[str, Any], training_type: str,
+                       learner_id: Optional[str] = None, cohort_id: Optional[str] = None):
+    """Append a session to the analytics table; best-effort, never fails the evaluation"""
+    try:
+        get_evaluation_analytics().append(session_id, evaluations, training_type, learner_id, cohort_id)
+    except Exception as e:
+        print(f"⚠️  Analytics append failed for {session_id}: {e}")
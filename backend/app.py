@@ -1,5 +1,6 @@
 import sys
 import time
+import threading
 
 _startup_time = time.time()
 
@@ -10,17 +11,20 @@ def _log(msg):
 _log("BEGIN module import")
 
 _log("importing fastapi...")
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from contextlib import asynccontextmanager
-_log("importing CORSMiddleware...")
+_log("importing CORSMiddleware, GZipMiddleware...")
 from fastapi.middleware.cors import CORSMiddleware
-_log("importing FileResponse, JSONResponse...")
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.middleware.gzip import GZipMiddleware
+_log("importing JSONResponse, Response...")
+from fastapi.responses import JSONResponse, Response
 _log("importing pydantic...")
 from pydantic import BaseModel
 _log("importing typing...")
 from typing import List, Dict, Any, Optional
 _log("importing json, os, pathlib...")
+import base64
+import math
 import os
 from pathlib import Path
 _log("importing dotenv...")
@@ -43,57 +47,29 @@ sys.path.append(str(Path(__file__).parent.parent))
 from backend.session_store import (
     save_session, get_session, save_chat_history,
     delete_session_chat, cleanup_expired_sessions, generate_session_id,
+    get_performance_table_png, count_active_sessions, update_session, png_etag, session_lock,
+    SESSION_TTL_SECONDS,
 )
+from backend.static_assets import get_static_assets
+from backend.evaluation_views import project_evaluations, EVALUATION_VIEWS
+from backend.timing import start_trace
+from backend.usage_ledger import BudgetExceeded, get_usage_ledger, usage_scope
+from backend.llm_retry import LLMUnavailable
+from backend.training_catalog import get_training, get_training_catalog
+from backend.metrics import CONTENT_TYPE, register_gauge, render_metrics, record_http_request
+
+# Attach per-stage timings to every chat response (otherwise only when debug=true)
+DEBUG_TIMINGS = os.getenv("DEBUG_TIMINGS", "").lower() in ("1", "true", "yes")
 
 # Lazy imports - only import heavy modules when needed
-_training_data_cache = {}
 _evaluator_module = None
 _chat_agent_class = None
 
 
 def get_training_data(training_type: str = "migraine"):
-    """Lazy load training data based on training type"""
-    global _training_data_cache
-    if training_type not in _training_data_cache:
-        if training_type == "migraine":
-            from trainings_2_experts import training_1, training_2, training_3, training_objectives
-            _training_data_cache[training_type] = {
-                "trainings": {"training_1": training_1, "training_2": training_2, "training_3": training_3},
-                "objectives": training_objectives
-            }
-        elif training_type == "nursing_1st":
-            from trainings_nursing_1stLearner import training_1, training_objectives
-            _training_data_cache[training_type] = {
-                "trainings": {"training_1": training_1},
-                "objectives": training_objectives
-            }
-        elif training_type == "nursing_2nd":
-            from trainings_nursing_2ndLearner import training_1, training_objectives
-            _training_data_cache[training_type] = {
-                "trainings": {"training_1": training_1},
-                "objectives": training_objectives
-            }
-        elif training_type == "leadership_1st":
-            from trainings_leadership_1srLearner import training_1, training_objectives
-            _training_data_cache[training_type] = {
-                "trainings": {"training_1": training_1},
-                "objectives": training_objectives
-            }
-        elif training_type == "leadership_2nd":
-            from trainings_leadership_2ndLearner import training_1, training_objectives
-            _training_data_cache[training_type] = {
-                "trainings": {"training_1": training_1},
-                "objectives": training_objectives
-            }
-        elif training_type == "leadership_3rd":
-            from trainings_leadership_3rdLearner import training_1, training_objectives
-            _training_data_cache[training_type] = {
-                "trainings": {"training_1": training_1},
-                "objectives": training_objectives
-            }
-        else:
-            raise ValueError(f"Unknown training type: {training_type}")
-    return _training_data_cache[training_type]
+    """Training texts and objectives of a training type (see backend.training_catalog)"""
+    training = get_training(training_type)
+    return {"trainings": training.trainings, "objectives": training.objectives}
 
 
 def get_evaluator():
@@ -122,7 +98,19 @@ FRONTEND_DIR = ROOT_DIR / "frontend"
 async def lifespan(_app: FastAPI):
     _log("FastAPI startup - app is ready!")
     cleanup_expired_sessions()
+    get_usage_ledger().load()
+    get_static_assets().load()
+    # Start the render workers in the background; health checks must not wait
+    from backend.rendering import warm_renderer, shutdown_renderer
+    threading.Thread(target=warm_renderer, daemon=True).start()
     yield
+    shutdown_renderer()
+    from backend.codegen_loop import get_codegen_loop
+    get_codegen_loop().shutdown()
+    from backend.web_search_tool import get_search_loop
+    get_search_loop().shutdown()
+    from backend.cohort import get_cohort_runner
+    get_cohort_runner().shutdown()
 
 _log("creating FastAPI app...")
 app = FastAPI(title="Learner Feedback Chat System", lifespan=lifespan)
@@ -138,18 +126,99 @@ app.add_middleware(
 )
 _log("CORS middleware added")
 
+# Paths whose responses are already compressed (exclude_content_types needs a newer Starlette)
+GZIP_EXCLUDED_SUFFIXES = (".png",)
+
+
+class _GZipExcept:
+    """GZipMiddleware for every path except GZIP_EXCLUDED_SUFFIXES"""
+
+    def __init__(self, app, **kwargs):
+        self.app = app
+        self.gzip = GZipMiddleware(app, **kwargs)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].endswith(GZIP_EXCLUDED_SUFFIXES):
+            await self.app(scope, receive, send)
+        else:
+            await self.gzip(scope, receive, send)
+
+
+# Compress JSON responses (evaluations are large); PNGs are already compressed
+app.add_middleware(
+    _GZipExcept,
+    minimum_size=int(os.getenv("GZIP_MINIMUM_SIZE", "1000")),
+    compresslevel=6,
+)
+_log("GZip middleware added")
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Count and time every request under its route template (not the raw path)"""
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        record_http_request(getattr(route, "path", "unmatched"), request.method,
+                            status, time.perf_counter() - start)
+
 # In-memory cache for chat agents (recreated from disk if missing)
 chat_agents: Dict[str, Any] = {}
 
 
+def _codegen_in_flight() -> int:
+    from backend.codegen_loop import get_codegen_loop
+    return get_codegen_loop().in_flight
+
+
+register_gauge("sensai_active_sessions", "Sessions accessed within the session TTL.", count_active_sessions)
+register_gauge("sensai_chat_agents", "Chat agents held in memory.", lambda: len(chat_agents))
+register_gauge("sensai_codegen_in_flight", "Code generation queries currently running.", _codegen_in_flight)
+
+
+def _cohorts_running() -> int:
+    from backend.cohort import get_cohort_runner
+    return get_cohort_runner().running()
+
+
+register_gauge("sensai_cohorts_running", "Cohort evaluations queued or running.", _cohorts_running)
+
+
 class EvaluateRequest(BaseModel):
     training_type: str = "migraine"
 
 
+class LearnerAnswer(BaseModel):
+    response: str
+    justification: str = ""
+
+
+class CohortLearner(BaseModel):
+    learner_id: str
+    # module key ("training_1") -> scenario number -> answer
+    responses: Dict[str, Dict[int, LearnerAnswer]]
+
+
+class CohortEvaluateRequest(BaseModel):
+    training_type: str = "migraine"
+    learners: List[CohortLearner]
+
+
+class RevisedResponses(BaseModel):
+    # module key ("training_1") -> scenario number -> revised answer; empty = only stale scenarios
+    responses: Dict[str, Dict[int, LearnerAnswer]] = {}
+
+
 class ChatMessage(BaseModel):
     session_id: str
     message: str
     web_search_enabled: bool = False
+    debug: bool = False  # include per-stage timings in the response
 
 
 class ChatResponse(BaseModel):
@@ -159,6 +228,7 @@ class ChatResponse(BaseModel):
     code_output: Optional[str] = None
     citations: List[Dict[str, str]] = []
     total_tokens: int = 0
+    timings: Optional[Dict[str, Any]] = None
 
 
 _log("defining routes...")
@@ -170,28 +240,12 @@ _log("defining routes...")
 @app.get("/trainings")
 async def get_trainings(training_type: str = "migraine"):
     """Get training modules for the selected training type"""
-    data = get_training_data(training_type)
-    trainings_dict = data["trainings"]
-    objectives = data["objectives"]
+    training = get_training(training_type)
+    trainings_dict = training.trainings
+    objectives = training.objectives
+    names = training.module_names
 
     trainings = []
-    if training_type == "migraine":
-        names = {
-            "training_1": "Module 1: Diagnostic et suivi de la migraine",
-            "training_2": "Module 2: Traitement aigu et gestion des habitudes de vie de la migraine",
-            "training_3": "Module 3: Traitement preventif de la migraine"
-        }
-    elif training_type in ("nursing_1st", "nursing_2nd"):
-        names = {
-            "training_1": "Module 1: Leadership et collaboration en soins infirmiers"
-        }
-    elif training_type in ("leadership_1st", "leadership_2nd", "leadership_3rd"):
-        names = {
-            "training_1": "Module 1: Leadership et prise de decision"
-        }
-    else:
-        names = {}
-
     for tid, content in trainings_dict.items():
         trainings.append({
             "id": tid,
@@ -203,62 +257,313 @@ async def get_trainings(training_type: str = "migraine"):
     return {"trainings": trainings, "training_type": training_type}
 
 
+@app.get("/training-types")
+async def get_training_types():
+    """Training types of the catalog (built-in and from TRAINING_DATA_DIR)"""
+    return {"training_types": get_training_catalog().describe()}
+
+
+def _check_view(view: str):
+    if view not in EVALUATION_VIEWS:
+        raise HTTPException(status_code=400, detail=f"Unknown view '{view}'. Available: {', '.join(EVALUATION_VIEWS)}")
+
+
+def _check_budget(session_id: Optional[str]):
+    """Refuse new work once the session or deployment token budget is spent"""
+    try:
+        get_usage_ledger().check(session_id)
+    except BudgetExceeded as e:
+        headers = {"Retry-After": str(math.ceil(e.retry_after))} if e.retry_after else None
+        raise HTTPException(status_code=429, detail=str(e), headers=headers)
+
+
+def _unavailable(e: LLMUnavailable) -> HTTPException:
+    """The LLM provider is shedding load (circuit open or queue full): ask the client to come back"""
+    headers = {"Retry-After": str(math.ceil(e.retry_after))} if e.retry_after else None
+    return HTTPException(status_code=503, detail=f"The language model is temporarily unavailable: {e}",
+                         headers=headers)
+
+
+def _table_url(session_id: str, png: Optional[bytes]) -> Optional[str]:
+    """URL of a session's table PNG, versioned so it can be cached as immutable"""
+    if not png:
+        return None
+    return f"/performance/{session_id}.png?v={png_etag(png).strip(chr(34))[:12]}"
+
+
 @app.post("/evaluate")
-async def evaluate_trainings(request: EvaluateRequest):
-    """Run evaluations on training modules for the selected training type"""
+async def evaluate_trainings(
+    request: EvaluateRequest,
+    view: str = "full",
+    fields: Optional[List[str]] = Query(None),
+):
+    """Run evaluations on training modules for the selected training type.
+
+    `view` (full | summary | none) and `fields` (dotted paths, `*` wildcard)
+    trim the evaluations returned; the session always stores all of them.
+    """
+    _check_view(view)
+    _check_budget(None)
     try:
         training_type = request.training_type
         run_evaluations = get_evaluator()
-        evaluations = run_evaluations(training_type)
         session_id = generate_session_id()
-
-        # Generate performance table synchronously (best-effort).
-        performance_table = None
-        try:
-            from backend.table_generator import generate_performance_table
-            performance_table = generate_performance_table(evaluations)
-        except Exception as e:
-            print(f"⚠️  Performance table generation failed: {e}")
-            import traceback
-            traceback.print_exc()
-
-        save_session(session_id, evaluations, training_type, performance_table=performance_table)
+        with usage_scope(session_id):
+            evaluations = run_evaluations(training_type)
+
+            # Generate performance table synchronously (best-effort).
+            performance_table_png = None
+            performance_table_script = None
+            try:
+                from backend.table_generator import render_performance_table
+                performance_table_png, performance_table_script = render_performance_table(evaluations)
+            except Exception as e:
+                print(f"⚠️  Performance table generation failed: {e}")
+                import traceback
+                traceback.print_exc()
+
+        # Answers and scenario hashes for incremental re-evaluation (backend.reevaluation)
+        from backend.reevaluation import scenario_state, training_modules
+        extra = {**scenario_state(training_modules(training_type)),
+                 "performance_table_script": performance_table_script,
+                 "performance_table_stale": performance_table_png is None}
+        save_session(session_id, evaluations, training_type, performance_table_png=performance_table_png,
+                     extra=extra)
+        from backend.analytics import record_evaluations
+        record_evaluations(session_id, evaluations, training_type)
 
         return {
             "session_id": session_id,
             "status": "completed",
-            "evaluations": evaluations,
+            "evaluations": project_evaluations(evaluations, view, fields),
             "training_type": training_type,
-            "performance_table": performance_table,
+            # The PNG itself is served as binary by /performance/{session_id}.png
+            "performance_table_url": _table_url(session_id, performance_table_png),
         }
+    except LLMUnavailable as e:
+        raise _unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/cohorts/evaluate", status_code=202)
+async def evaluate_cohort(request: CohortEvaluateRequest):
+    """Evaluate the responses of a whole class to one training (see backend.cohort).
+
+    Returns at once with the cohort id; each learner gets a session as soon
+    as their evaluation completes, listed by GET /cohorts/{cohort_id}.
+    """
+    _check_budget(None)
+    from backend.cohort import CohortJob, get_cohort_runner
+    try:
+        training = get_training(request.training_type)
+        job = CohortJob(training, [learner.model_dump() for learner in request.learners])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    get_cohort_runner().submit(job)
+    return {
+        "cohort_id": job.cohort_id,
+        "status": job.status_value,
+        "training_type": request.training_type,
+        "learners": {learner_id: learner["session_id"] for learner_id, learner in job.learners.items()},
+        "status_url": f"/cohorts/{job.cohort_id}",
+    }
+
+
+@app.get("/cohorts/{cohort_id}")
+async def get_cohort(cohort_id: str):
+    """Progress of a cohort: per-learner status and session ids, throughput and token usage"""
+    from backend.cohort import get_cohort_runner
+    job = get_cohort_runner().get(cohort_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Cohort not found or expired")
+    return job.status()
+
+
+def _analytics_filters(training_type: Optional[str], cohort_id: Optional[str], module: Optional[str],
+                       dimension: Optional[str]) -> Dict[str, Optional[str]]:
+    return {"training_type": training_type, "cohort_id": cohort_id, "module": module, "dimension": dimension}
+
+
+@app.get("/analytics/summary")
+async def get_analytics_summary(training_type: Optional[str] = None, cohort_id: Optional[str] = None,
+                                module: Optional[str] = None):
+    """Rows, sessions and learners of the analytics table, with the rating distribution per dimension"""
+    from backend.analytics import get_evaluation_analytics
+    return get_evaluation_analytics().summary(**_analytics_filters(training_type, cohort_id, module, None))
+
+
+@app.get("/analytics/group")
+async def get_analytics_group(
+    by: List[str] = Query(...),
+    training_type: Optional[str] = None,
+    cohort_id: Optional[str] = None,
+    module: Optional[str] = None,
+    dimension: Optional[str] = None,
+):
+    """Mean score and rating distribution per group of stored evaluations.
+
+    `by` is repeated for several columns: ?by=scenario&by=dimension
+    (see backend.analytics.GROUP_COLUMNS).
+    """
+    from backend.analytics import get_evaluation_analytics
+    try:
+        groups = get_evaluation_analytics().group(by, **_analytics_filters(training_type, cohort_id, module,
+                                                                            dimension))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"by": by, "groups": groups}
+
+
+@app.get("/analytics/divergence")
+async def get_analytics_divergence(
+    training_type: Optional[str] = None,
+    cohort_id: Optional[str] = None,
+    module: Optional[str] = None,
+    dimension: str = "coverage",
+    limit: int = Query(10, ge=1, le=100),
+):
+    """Scenarios where learners diverge most from the experts (lowest mean score first)"""
+    from backend.analytics import get_evaluation_analytics
+    try:
+        scenarios = get_evaluation_analytics().divergence(limit, dimension, training_type=training_type,
+                                                          cohort_id=cohort_id, module=module)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"dimension": dimension, "scenarios": scenarios}
+
+
+# Must be registered before /performance/{session_id}, which would also match "<id>.png"
+@app.get("/performance/{session_id}.png")
+async def serve_performance_table_png(session_id: str, request: Request):
+    """Serve the performance-table PNG for a session as binary with a strong ETag."""
+    table = get_performance_table_png(session_id)
+    if table is None:
+        raise HTTPException(status_code=404, detail="Performance table not available")
+    png, etag = table
+    # A versioned URL (?v=, see _table_url) never changes; the plain one does after a
+    # re-evaluation, so it is revalidated (304 while the ETag matches)
+    if request.query_params.get("v"):
+        headers = {"ETag": etag, "Cache-Control": f"private, max-age={SESSION_TTL_SECONDS}, immutable"}
+    else:
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=png, media_type="image/png", headers=headers)
+
+
 @app.get("/performance/{session_id}")
 async def get_performance_table(session_id: str):
-    """Fetch the cached performance-table PNG (base64) for a session."""
-    session = get_session(session_id)
-    if session is None:
-        raise HTTPException(status_code=404, detail="Session not found or expired")
-    table = session.get("performance_table")
-    if not table:
+    """Fetch the performance-table PNG (base64) for a session.
+
+    Kept for older clients; prefer /performance/{session_id}.png.
+    """
+    table = get_performance_table_png(session_id)
+    if table is None:
         raise HTTPException(status_code=404, detail="Performance table not available")
-    return {"performance_table": table}
+    return {
+        "performance_table": base64.b64encode(table[0]).decode("ascii"),
+        "performance_table_url": f"/performance/{session_id}.png",
+    }
 
 
 @app.get("/evaluation/{session_id}")
-async def get_evaluation(session_id: str):
-    """Get evaluation results for a session"""
+async def get_evaluation(
+    session_id: str,
+    view: str = "full",
+    fields: Optional[List[str]] = Query(None),
+):
+    """Get evaluation results for a session, optionally projected (see /evaluate)"""
+    _check_view(view)
     session = get_session(session_id)
     if session is None:
         raise HTTPException(status_code=404, detail="Session not found or expired")
-    return session["evaluations"]
+    return project_evaluations(session["evaluations"], view, fields) or {}
+
+
+@app.post("/evaluation/{session_id}/responses")
+def revise_responses(
+    session_id: str,
+    request: RevisedResponses,
+    view: str = "full",
+    fields: Optional[List[str]] = Query(None),
+):
+    """Revise some of the learner's answers and re-evaluate only the scenarios that changed.
+
+    Scenarios are hashed with their expert context (see backend.reevaluation);
+    unchanged ones keep their evaluation, and only the rows of the changed
+    ones are redrawn in the performance table.
+    """
+    _check_view(view)
+    _check_budget(session_id)
+
+    from backend.reevaluation import reevaluate_session
+    revisions = {key: {number: answer.model_dump() for number, answer in answers.items()}
+                 for key, answers in request.responses.items()}
+    # One revision of a session at a time, each starting from what the previous one stored
+    # (a plain def, so FastAPI runs it in its threadpool and the lock serializes real threads)
+    with session_lock(session_id):
+        session = get_session(session_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail="Session not found or expired")
+        try:
+            with usage_scope(session_id):
+                result = reevaluate_session(session, revisions)
+                evaluations = result["evaluations"]
+
+                table, performance_table_png = "unchanged", None
+                performance_table_script = session.get("performance_table_script")
+                # A table left stale by a failed update is redrawn whole
+                if result["rows"] or session.get("performance_table_stale"):
+                    from backend.table_generator import render_performance_table, update_performance_table_rows
+                    try:
+                        updated = None
+                        if performance_table_script and result["rows"]:
+                            updated = update_performance_table_rows(performance_table_script, evaluations,
+                                                                    result["rows"])
+                        table = "rows" if updated else "full"
+                        performance_table_png, performance_table_script = (
+                            updated or render_performance_table(evaluations))
+                    except Exception as e:
+                        print(f"⚠️  Performance table update failed, marked stale: {e}")
+                        table, performance_table_script = "failed", None
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except LLMUnavailable as e:
+            raise _unavailable(e)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+        training_type = session.get("training_type", "migraine")
+        update_session(session_id, {
+            "evaluations": evaluations,
+            "responses": result["responses"],
+            "scenario_hashes": result["scenario_hashes"],
+            "performance_table_script": performance_table_script,
+            # The PNG no longer matches the evaluations; the next revision regenerates it
+            "performance_table_stale": table == "failed",
+        }, performance_table_png=performance_table_png)
+    # The chat agent is rebuilt from the updated session (history kept)
+    chat_agents.pop(session_id, None)
+    if result["changed"]:
+        from backend.analytics import record_evaluations
+        record_evaluations(session_id, evaluations, training_type, session.get("learner_id"),
+                           session.get("cohort_id"))
+
+    table_png = get_performance_table_png(session_id)
+    return {
+        "session_id": session_id,
+        "reevaluated": result["changed"],
+        "performance_table": table,
+        "evaluations": project_evaluations(evaluations, view, fields),
+        "performance_table_url": _table_url(session_id, table_png[0] if table_png else None),
+    }
 
 
 @app.post("/chat")
 async def chat(message: ChatMessage):
     """Chat with the feedback agent"""
+    _check_budget(message.session_id)
     try:
         print(f"\n{'='*70}")
         print(f"INCOMING REQUEST:")
@@ -299,7 +604,8 @@ async def chat(message: ChatMessage):
             chat_agents[message.session_id] = agent
 
         agent = chat_agents[message.session_id]
-        response = agent.chat(message.message, web_search_enabled=message.web_search_enabled)
+        with start_trace("chat", session_id=message.session_id) as trace, usage_scope(message.session_id):
+            response = agent.chat(message.message, web_search_enabled=message.web_search_enabled)
 
         # Persist chat history to disk
         from langchain_core.messages import HumanMessage as HM
@@ -328,10 +634,13 @@ async def chat(message: ChatMessage):
             code=response.get("code"),
             code_output=response.get("code_output"),
             citations=response.get("citations", []),
-            total_tokens=response.get("total_tokens", 0)
+            total_tokens=response.get("total_tokens", 0),
+            timings=trace.summary() if message.debug or DEBUG_TIMINGS else None,
         )
     except HTTPException:
         raise
+    except LLMUnavailable as e:
+        raise _unavailable(e)
     except Exception as e:
         print(f"ERROR in /chat endpoint: {e}")
         import traceback
@@ -355,62 +664,70 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text-format metrics"""
+    return Response(render_metrics(), media_type=CONTENT_TYPE)
+
+
+@app.get("/usage")
+async def get_usage():
+    """LLM token usage of the deployment by component and model, with budgets"""
+    return get_usage_ledger().summary()
+
+
+@app.get("/usage/{session_id}")
+async def get_session_usage(session_id: str):
+    """LLM token usage and budget state of one session"""
+    return get_usage_ledger().summary(session_id)
+
+
+def _static(name: str, request: Request):
+    """Serve a frontend file from the in-memory static asset store"""
+    response = get_static_assets().response(name, request)
+    if response is None:
+        return JSONResponse(content={"error": "File not found"}, status_code=404)
+    return response
+
+
 @app.get("/")
-async def root():
+async def root(request: Request):
     """Root endpoint - serves frontend or health check"""
-    index_file = FRONTEND_DIR / "index.html"
-    _log(f"GET / - FRONTEND_DIR={FRONTEND_DIR}, exists={FRONTEND_DIR.exists()}, index_exists={index_file.exists()}, resolved={index_file.resolve()}")
-    if index_file.exists():
-        return FileResponse(str(index_file))
+    response = get_static_assets().response("index.html", request)
+    if response is not None:
+        return response
+    _log(f"GET / - index.html not found in FRONTEND_DIR={FRONTEND_DIR}")
     return {"status": "healthy", "message": "Application is running"}
 
 
 # Serve frontend static files (for deployment where only one port is exposed)
 @app.get("/styles.css")
-async def serve_css():
-    css_file = FRONTEND_DIR / "styles.css"
-    if css_file.exists():
-        return FileResponse(str(css_file), media_type="text/css")
-    return JSONResponse(content={"error": "File not found"}, status_code=404)
+async def serve_css(request: Request):
+    return _static("styles.css", request)
 
 @app.get("/app.js")
-async def serve_app_js():
-    js_file = FRONTEND_DIR / "app.js"
-    if js_file.exists():
-        return FileResponse(str(js_file), media_type="application/javascript")
-    return JSONResponse(content={"error": "File not found"}, status_code=404)
+async def serve_app_js(request: Request):
+    return _static("app.js", request)
 
 @app.get("/chat.html")
-async def serve_chat():
+async def serve_chat(request: Request):
     """Serve the chat page"""
-    chat_file = FRONTEND_DIR / "chat.html"
-    if chat_file.exists():
-        return FileResponse(str(chat_file))
-    return JSONResponse(content={"error": "File not found"}, status_code=404)
+    return _static("chat.html", request)
 
 @app.get("/performance.html")
-async def serve_performance():
+async def serve_performance(request: Request):
     """Serve the performance overview page"""
-    perf_file = FRONTEND_DIR / "performance.html"
-    if perf_file.exists():
-        return FileResponse(str(perf_file))
-    return JSONResponse(content={"error": "File not found"}, status_code=404)
+    return _static("performance.html", request)
 
 @app.get("/test.html")
-async def serve_test():
+async def serve_test(request: Request):
     """Serve the test page"""
-    test_file = FRONTEND_DIR / "test.html"
-    if test_file.exists():
-        return FileResponse(str(test_file))
-    return JSONResponse(content={"error": "File not found"}, status_code=404)
+    return _static("test.html", request)
 
 @app.get("/index.html")
-async def serve_index_html():
+async def serve_index_html(request: Request):
     """Serve the main index page explicitly"""
-    index_file = FRONTEND_DIR / "index.html"
-    if index_file.exists():
-        return FileResponse(str(index_file))
-    return JSONResponse(content={"error": "File not found"}, status_code=404)
+    return _static("index.html", request)
 
 
 _log("all routes defined")
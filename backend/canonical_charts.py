@@ -0,0 +1,263 @@
+"""
+Canonical Visualizations
+
+Pre-written, parameterized renderers for the visualizations the initial
+feedback steers learners toward. They skip LLM code generation entirely:
+
+- scenario_comparison:   per-scenario table, learner themes vs. themes to explore
+- coverage_distribution: how many scenarios fall in each alignment level
+- skills_by_objective:   per learning objective, convergence vs. reflection points
+- key_elements_vs_themes: expert key elements next to the themes the learner addressed
+
+All renderers follow the same rules as generated code: SENSAI header, neutral
+blue/gray palette, French labels, no numerical scores or judgmental ratings.
+Figures are built with the object-oriented API (no pyplot global state).
+"""
+
+import base64
+import io
+import textwrap
+from typing import Dict, Any, List, Tuple, Callable, Iterator
+
+# Neutral SENSAI palette (no red/green/amber)
+NAVY = "#0F2A47"
+SLATE = "#2C3E50"
+BLUE = "#4A6FA5"
+LIGHT_BLUE = "#7FA7D9"
+PALE_BLUE = "#C9D9EE"
+ROW_COLORS = ["#FFFFFF", "#F4F6FA"]
+BACKGROUND = "#F8F9FA"
+
+# Qualitative labels replacing raw ratings
+COVERAGE_LABELS = {
+    "Low": "En émergence",
+    "Medium": "Partielle",
+    "High": "Marquée",
+}
+COVERAGE_ORDER = ["Low", "Medium", "High"]
+
+
+def _iter_scenarios(evaluations: Dict[str, Any], module_number: int = 0) -> Iterator[Tuple[str, str, Dict[str, Any], str, Dict[str, Any]]]:
+    """Yield (training_key, situation_key, situation, scenario_key, scenario) in order"""
+    for training_key, training in evaluations.items():
+        if module_number and training_key != f"training_{module_number}":
+            continue
+        for sit_key, situation in (training or {}).get("situations", {}).items():
+            for scen_key, scenario in (situation or {}).get("scenarios", {}).items():
+                yield training_key, sit_key, situation, scen_key, scenario
+
+
+def _short_label(training_key: str, sit_key: str, scen_key: str, multi_module: bool) -> str:
+    sit = sit_key.split()[-1]
+    scen = scen_key.split()[-1]
+    label = f"Sit. {sit} · Sc. {scen}"
+    if multi_module:
+        label = f"M{training_key.split('_')[-1]} · {label}"
+    return label
+
+
+def _split_justification(justification: str) -> Tuple[str, str]:
+    """Split the 2-line coverage justification into (addressed, to explore)"""
+    lines = [l.strip() for l in (justification or "").split("\n") if l.strip()]
+
+    def _strip_prefix(line: str) -> str:
+        head, sep, tail = line.partition(":")
+        return tail.strip() if sep and len(head) < 40 else line
+
+    addressed = _strip_prefix(lines[0]) if lines else ""
+    to_explore = _strip_prefix(lines[1]) if len(lines) > 1 else ""
+    return addressed, to_explore
+
+
+def _wrap(text: str, width: int, max_lines: int = 6) -> str:
+    lines = textwrap.wrap(text or "—", width=width)
+    if len(lines) > max_lines:
+        lines = lines[:max_lines]
+        lines[-1] = lines[-1].rstrip(" .,;") + "…"
+    return "\n".join(lines)
+
+
+def _new_figure(width: float, height: float):
+    from backend.rendering import new_figure, _make_sensai_header
+
+    fig = new_figure(figsize=(width, height), facecolor=BACKGROUND)
+    _make_sensai_header()(fig)
+    return fig
+
+
+def _to_base64(fig) -> str:
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=150, bbox_inches="tight", facecolor=fig.get_facecolor())
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def _draw_table(col_labels: List[str], rows: List[List[str]], col_widths: List[float], wrap_chars: List[int]):
+    """Render a wrapped, neutral table figure sized to its content"""
+    wrapped = [[_wrap(cell, wrap_chars[i]) for i, cell in enumerate(row)] for row in rows]
+    row_lines = [max(cell.count("\n") + 1 for cell in row) for row in wrapped] or [1]
+    line_height = 0.22
+    height = 0.6 + 0.45 + sum(0.2 + n * line_height for n in row_lines)
+
+    fig = _new_figure(13, max(height, 2.0))
+    ax = fig.add_axes([0.01, 0.01, 0.98, 0.9])
+    ax.axis("off")
+
+    table = ax.table(
+        cellText=wrapped or [["—"] * len(col_labels)],
+        colLabels=col_labels,
+        colWidths=col_widths,
+        loc="upper center",
+        cellLoc="left",
+    )
+    table.auto_set_font_size(False)
+    table.set_fontsize(9)
+
+    total_units = 1.5 + sum(0.6 + n for n in row_lines)
+    for (r, c), cell in table.get_celld().items():
+        cell.set_edgecolor("#DDE3EC")
+        cell.set_linewidth(0.6)
+        if r == 0:
+            cell.set_facecolor(SLATE)
+            cell.set_text_props(color="white", fontweight="bold", ha="center", va="center")
+            cell.set_height(1.5 / total_units)
+        else:
+            cell.set_facecolor(ROW_COLORS[(r - 1) % 2])
+            cell.set_text_props(color=SLATE, va="center", linespacing=1.3,
+                                fontweight="bold" if c == 0 else "normal")
+            cell.set_height((0.6 + row_lines[r - 1]) / total_units if r - 1 < len(row_lines) else 1 / total_units)
+    return fig
+
+
+# =============================================================================
+# Renderers
+# =============================================================================
+
+def render_scenario_comparison(evaluations: Dict[str, Any], module_number: int = 0) -> Dict[str, Any]:
+    """Per-scenario comparison table: learner's themes vs. themes to explore"""
+    multi = module_number == 0 and len(evaluations) > 1
+    rows, summary = [], []
+    for training_key, sit_key, situation, scen_key, scenario in _iter_scenarios(evaluations, module_number):
+        addressed, to_explore = _split_justification(scenario.get("coverage", {}).get("justification", ""))
+        label = _short_label(training_key, sit_key, scen_key, multi)
+        rows.append([
+            label,
+            situation.get("description", ""),
+            addressed,
+            to_explore,
+            scenario.get("logical_reasoning", {}).get("assessment", ""),
+        ])
+        summary.append({"scenario": label, "themes_abordes": addressed, "themes_a_explorer": to_explore})
+
+    fig = _draw_table(
+        ["Scénario", "Situation", "Thèmes abordés", "Pistes de réflexion", "Raisonnement"],
+        rows,
+        col_widths=[0.11, 0.19, 0.25, 0.25, 0.2],
+        wrap_chars=[16, 28, 38, 38, 30],
+    )
+    return {"image_base64": _to_base64(fig), "summary_data": {"scenarios": summary}}
+
+
+def render_coverage_distribution(evaluations: Dict[str, Any], module_number: int = 0) -> Dict[str, Any]:
+    """Number of scenarios per level of alignment with expert key elements"""
+    counts = {level: 0 for level in COVERAGE_ORDER}
+    for *_, scenario in _iter_scenarios(evaluations, module_number):
+        level = scenario.get("coverage", {}).get("score_assessment")
+        if level in counts:
+            counts[level] += 1
+
+    labels = [COVERAGE_LABELS[level] for level in COVERAGE_ORDER]
+    values = [counts[level] for level in COVERAGE_ORDER]
+
+    fig = _new_figure(10, 5.5)
+    ax = fig.add_axes([0.08, 0.1, 0.88, 0.78])
+    ax.set_facecolor(BACKGROUND)
+    bars = ax.barh(labels, values, color=[PALE_BLUE, LIGHT_BLUE, BLUE], height=0.55)
+    for bar, value in zip(bars, values):
+        ax.text(bar.get_width() + 0.05, bar.get_y() + bar.get_height() / 2,
+                f"{value} scénario{'s' if value > 1 else ''}", va="center", fontsize=10, color=SLATE)
+    ax.set_xlabel("Nombre de scénarios", color=SLATE)
+    ax.set_ylabel("Alignement avec les éléments clés des experts", color=SLATE)
+    ax.set_xlim(0, max(values + [1]) * 1.3)
+    ax.xaxis.get_major_locator().set_params(integer=True)
+    ax.grid(axis="x", linestyle=":", alpha=0.5)
+    for side in ("top", "right"):
+        ax.spines[side].set_visible(False)
+
+    return {
+        "image_base64": _to_base64(fig),
+        "summary_data": {COVERAGE_LABELS[k]: v for k, v in counts.items()},
+    }
+
+
+def render_skills_by_objective(evaluations: Dict[str, Any], module_number: int = 0) -> Dict[str, Any]:
+    """Per learning objective: scenarios converging with experts vs. reflection points"""
+    skills: Dict[str, Dict[str, int]] = {}
+    for *_, scenario in _iter_scenarios(evaluations, module_number):
+        for skill, assessment in (scenario.get("skills_assessment") or {}).items():
+            if not assessment or not assessment.get("present_in_scenario"):
+                continue
+            entry = skills.setdefault(skill, {"convergence": 0, "reflexion": 0})
+            if assessment.get("learner_assessment") == "Satisfactory":
+                entry["convergence"] += 1
+            else:
+                entry["reflexion"] += 1
+
+    names = list(skills.keys()) or ["Aucun objectif mobilisé"]
+    convergence = [skills.get(n, {}).get("convergence", 0) for n in names]
+    reflexion = [skills.get(n, {}).get("reflexion", 0) for n in names]
+
+    fig = _new_figure(11, 1.6 + 0.8 * len(names))
+    ax = fig.add_axes([0.32, 0.12, 0.64, 0.76])
+    ax.set_facecolor(BACKGROUND)
+    y = list(range(len(names)))
+    ax.barh(y, convergence, color=BLUE, height=0.5, label="Convergence avec les experts")
+    ax.barh(y, reflexion, left=convergence, color=PALE_BLUE, height=0.5, label="Piste de réflexion")
+    ax.set_yticks(y)
+    ax.set_yticklabels([_wrap(n, 40, 3) for n in names], fontsize=9, color=SLATE)
+    ax.invert_yaxis()
+    ax.set_xlabel("Scénarios où l'objectif est mobilisé", color=SLATE)
+    ax.xaxis.get_major_locator().set_params(integer=True)
+    ax.legend(loc="upper center", bbox_to_anchor=(0.5, -0.12 - 0.3 / len(names)), ncol=2, frameon=False, fontsize=9)
+    for side in ("top", "right"):
+        ax.spines[side].set_visible(False)
+
+    return {"image_base64": _to_base64(fig), "summary_data": skills}
+
+
+def render_key_elements_vs_themes(evaluations: Dict[str, Any], module_number: int = 0) -> Dict[str, Any]:
+    """Expert key elements next to the themes the learner addressed, per scenario"""
+    multi = module_number == 0 and len(evaluations) > 1
+    rows, summary = [], []
+    for training_key, sit_key, _situation, scen_key, scenario in _iter_scenarios(evaluations, module_number):
+        addressed, _ = _split_justification(scenario.get("coverage", {}).get("justification", ""))
+        elements = scenario.get("expert_key_elements") or []
+        label = _short_label(training_key, sit_key, scen_key, multi)
+        rows.append([label, " · ".join(elements), addressed])
+        summary.append({"scenario": label, "elements_cles": elements, "themes_abordes": addressed})
+
+    fig = _draw_table(
+        ["Scénario", "Éléments clés des experts", "Thèmes abordés par l'apprenant"],
+        rows,
+        col_widths=[0.12, 0.44, 0.44],
+        wrap_chars=[16, 62, 62],
+    )
+    return {"image_base64": _to_base64(fig), "summary_data": {"scenarios": summary}}
+
+
+CANONICAL_CHARTS: Dict[str, Callable[..., Dict[str, Any]]] = {
+    "scenario_comparison": render_scenario_comparison,
+    "coverage_distribution": render_coverage_distribution,
+    "skills_by_objective": render_skills_by_objective,
+    "key_elements_vs_themes": render_key_elements_vs_themes,
+}
+
+
+def render_canonical_chart(chart_type: str, evaluations: Dict[str, Any], module_number: int = 0) -> Dict[str, Any]:
+    """Render a canonical chart; raises ValueError for unknown chart types and modules"""
+    renderer = CANONICAL_CHARTS.get(chart_type)
+    if renderer is None:
+        raise ValueError(f"Unknown chart type: {chart_type}. Available: {list(CANONICAL_CHARTS)}")
+    if module_number and f"training_{module_number}" not in evaluations:
+        raise ValueError(f"Invalid module number: {module_number}. Available: {list(evaluations)}")
+    print(f"📐 Rendering canonical chart: {chart_type} (module={module_number or 'all'})")
+    return renderer(evaluations, module_number)
@@ -1,8 +1,8 @@
 from typing import List, Dict, Any, Optional, TypedDict, Literal
-from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage, ToolMessage
 from langgraph.graph import StateGraph, END
-from langchain_anthropic import ChatAnthropic
 import os
+import re
 import json
 import sys
 from pathlib import Path
@@ -10,8 +10,13 @@ from dotenv import load_dotenv
 
 sys.path.append(str(Path(__file__).parent.parent))
 
-from backend.supervisor_agent import SupervisorAgent
+from backend.supervisor_agent import SupervisorAgent, execute_tool_call
+from backend.supervisor_tools import ALL_TOOLS
 from backend.llm_retry import invoke_with_retry
+from backend.model_registry import get_chat_model
+from backend.training_catalog import get_training
+from backend.usage_ledger import budget_degraded, DEGRADED_HISTORY_MESSAGES
+from backend.timing import span
 
 load_dotenv()
 
@@ -102,6 +107,49 @@ If the supervisor indicates that the knowledge base search did NOT find relevant
 """
 
 
+# Graph modes (selected per deployment via CHAT_GRAPH_MODE):
+# - "supervisor":  supervisor LLM decides tools, then a second LLM call answers
+# - "single_loop": one tool-bound LLM answers directly or calls tools, then answers
+GRAPH_MODE_SUPERVISOR = "supervisor"
+GRAPH_MODE_SINGLE_LOOP = "single_loop"
+GRAPH_MODES = (GRAPH_MODE_SUPERVISOR, GRAPH_MODE_SINGLE_LOOP)
+DEFAULT_GRAPH_MODE = os.getenv("CHAT_GRAPH_MODE", GRAPH_MODE_SUPERVISOR)
+
+# Maximum tool-calling rounds per turn in single_loop mode before the model
+# is forced to answer with what it has.
+MAX_TOOL_ROUNDS = 2
+
+
+SINGLE_LOOP_TOOLS_SECTION = """# Tools
+You can call tools yourself before answering. Your answer MUST be grounded in the evaluation data
+already provided or in tool results — never answer domain questions from your own knowledge.
+
+Decision logic (follow in order):
+1. **Learner performance / evaluation** → answer directly, no tool needed
+2. **Explicit visualization request** ("tableau", "graphique", "chart", "diagramme") → generate_visualization
+   - include_evaluation_data=true ONLY for the learner's performance/results; otherwise false and put the data in data_context
+   - Prefer a pre-built chart_type (scenario_comparison, coverage_distribution, skills_by_objective, key_elements_vs_themes) when it matches
+   - Do NOT call it for analysis questions ("où", "quand", "comment", "pourquoi", "quel scénario")
+3. **Training scenario or expert opinion details** → get_training_content, with the situation / scenario numbers the learner mentions
+4. **Any domain/conceptual/theoretical question** → search_knowledge_base with a domain-specific query
+5. **Latest/current information, or knowledge base found nothing** → search_web (only if it is available to you)
+
+After tools return:
+- If a visualization was generated it is ALREADY shown to the learner: introduce it briefly ("Le tableau ci-dessus présente...") and give insights. Never output markdown tables or code.
+- Cite web results inline as [1], [2], ... and cite reference documents by name.
+- Follow any IMPORTANT instruction contained in a tool result (e.g. no relevant documents found).
+
+# Important Notes
+- Keep responses concise, conversational and in French
+- NEVER include Python code, code blocks, or tool-request tags in your answer
+"""
+
+SINGLE_LOOP_PROMPT = (
+    CHAT_AGENT_PROMPT.split("# CRITICAL: About Visualizations and Web Search")[0]
+    + SINGLE_LOOP_TOOLS_SECTION
+)
+
+
 # Define the state structure for the graph
 class ChatState(TypedDict):
     """State for the chat agent graph with supervisor"""
@@ -120,46 +168,39 @@ class ChatState(TypedDict):
     # RAG results
     rag_context: Optional[str]
     rag_sources: Optional[List[str]]
+    # Single-loop mode: in-turn messages (tool calls + tool results)
+    loop_messages: List[BaseMessage]
+    tool_rounds: int
+    turn_tokens: int
     # Next step
-    next_step: Literal["supervisor", "respond", "end"]
+    next_step: Literal["supervisor", "respond", "tools", "end"]
 
 
 class ChatAgent:
     """LangGraph-based chat agent with supervisor architecture"""
 
-    def __init__(self, evaluations: Dict[str, Any], training_type: str = "migraine"):
+    def __init__(self, evaluations: Dict[str, Any], training_type: str = "migraine", graph_mode: Optional[str] = None):
         self.evaluations = evaluations
         self.training_type = training_type
+        self.graph_mode = graph_mode or DEFAULT_GRAPH_MODE
+        if self.graph_mode not in GRAPH_MODES:
+            raise ValueError(f"Unknown graph mode: {self.graph_mode}. Available: {list(GRAPH_MODES)}")
 
         # Load training objectives based on training type
-        if training_type == "migraine":
-            from trainings_2_experts import training_objectives
-            self.training_objectives = training_objectives
-        elif training_type == "nursing_1st":
-            from trainings_nursing_1stLearner import training_objectives
-            self.training_objectives = training_objectives
-        elif training_type == "nursing_2nd":
-            from trainings_nursing_2ndLearner import training_objectives
-            self.training_objectives = training_objectives
-        elif training_type == "leadership_1st":
-            from trainings_leadership_1srLearner import training_objectives
-            self.training_objectives = training_objectives
-        elif training_type == "leadership_2nd":
-            from trainings_leadership_2ndLearner import training_objectives
-            self.training_objectives = training_objectives
-        elif training_type == "leadership_3rd":
-            from trainings_leadership_3rdLearner import training_objectives
-            self.training_objectives = training_objectives
-        else:
+        try:
+            self.training_objectives = get_training(training_type).objectives
+        except ValueError:
             self.training_objectives = ""
 
         self.conversation_history: List[BaseMessage] = []
-        self.llm = ChatAnthropic(
-            model="claude-sonnet-4-6",
-            temperature=0.5,
-            anthropic_api_key=os.getenv("ANTHROPIC_API_KEY")
-        )
+        self.llm = get_chat_model("chat")
         self.supervisor = SupervisorAgent(evaluations, training_type)
+        # Single-loop mode binds the tools directly to the chat LLM
+        # (with and without web search, chosen per turn)
+        self.llm_with_tools = self.llm.bind_tools(ALL_TOOLS)
+        self.llm_with_tools_no_web = self.llm.bind_tools(
+            [t for t in ALL_TOOLS if t.name != "search_web"]
+        )
         self.initial_feedback_given = False
 
         # Token usage tracking (cumulative across the session)
@@ -169,6 +210,12 @@ class ChatAgent:
         self.graph = self._build_graph()
 
     def _build_graph(self) -> StateGraph:
+        """Build the LangGraph for the configured graph mode"""
+        if self.graph_mode == GRAPH_MODE_SINGLE_LOOP:
+            return self._build_single_loop_graph()
+        return self._build_supervisor_graph()
+
+    def _build_supervisor_graph(self) -> StateGraph:
         """Build the LangGraph with supervisor architecture"""
 
         # Create the graph
@@ -189,6 +236,28 @@ class ChatAgent:
 
         return workflow.compile()
 
+    def _build_single_loop_graph(self) -> StateGraph:
+        """Build the LangGraph where one tool-bound LLM answers or calls tools"""
+
+        workflow = StateGraph(ChatState)
+
+        workflow.add_node("agent", self._agent_node)
+        workflow.add_node("tools", self._tools_node)
+
+        workflow.set_entry_point("agent")
+
+        # The agent either requested tools or produced the final answer
+        workflow.add_conditional_edges(
+            "agent",
+            lambda state: state["next_step"],
+            {"tools": "tools", "end": END},
+        )
+
+        # Tool results always go back to the agent
+        workflow.add_edge("tools", "agent")
+
+        return workflow.compile()
+
     def _supervisor_node(self, state: ChatState) -> ChatState:
         """Node 1: Supervisor decides which tools to call"""
 
@@ -209,53 +278,8 @@ class ChatAgent:
             state["supervisor_decision"] = decision
             state["tools_called"] = decision.get("tools_called", [])
 
-            # Extract tool results
-            tool_results = decision.get("tool_results", {})
-
-            # Process visualization results
-            if "generate_visualization" in state["tools_called"]:
-                viz_result = tool_results.get("generate_visualization", {})
-                if viz_result.get("status") == "success":
-                    state["visualization_output"] = viz_result.get("output")
-                    print(f"✅ Visualization generated successfully")
-                else:
-                    print(f"❌ Visualization failed: {viz_result.get('error')}")
-
-            # Process web search results
-            if "search_web" in state["tools_called"]:
-                search_result = tool_results.get("search_web", {})
-                if search_result.get("status") == "success":
-                    state["web_search_citations"] = search_result.get("citations", [])
-                    print(f"✅ Web search completed: {len(state['web_search_citations'])} sources")
-                else:
-                    print(f"❌ Web search failed: {search_result.get('error')}")
-
-            # Process training content results
-            if "get_training_content" in state["tools_called"]:
-                content_result = tool_results.get("get_training_content", {})
-                if content_result.get("status") == "success":
-                    state["training_content"] = content_result.get("content")
-                    print(f"✅ Training content retrieved: {content_result.get('module_name')}")
-                else:
-                    print(f"❌ Training content failed: {content_result.get('error')}")
-
-            # Process RAG knowledge base results
-            if "search_knowledge_base" in state["tools_called"]:
-                rag_result = tool_results.get("search_knowledge_base", {})
-                if rag_result.get("status") == "success":
-                    state["rag_context"] = rag_result.get("formatted_context")
-                    state["rag_sources"] = rag_result.get("sources", [])
-                    found_relevant = rag_result.get("found_relevant", False)
-                    attempts = rag_result.get("attempts", 1)
-                    print(f"✅ Knowledge base search completed: {len(state['rag_sources'])} sources, "
-                          f"relevant={found_relevant}, attempts={attempts}")
-                elif rag_result.get("status") == "no_relevant_info":
-                    # RAG exhausted all attempts - no relevant info found
-                    state["rag_context"] = None
-                    state["rag_sources"] = []
-                    print(f"⚠️ Knowledge base: no relevant info found after {rag_result.get('attempts', 3)} attempts")
-                else:
-                    print(f"❌ Knowledge base search failed: {rag_result.get('error')}")
+            # Extract tool results into the state
+            self._apply_tool_results(state, state["tools_called"], decision.get("tool_results", {}))
 
             state["next_step"] = "respond"
 
@@ -274,6 +298,54 @@ class ChatAgent:
 
         return state
 
+    def _apply_tool_results(self, state: ChatState, tools_called: List[str], tool_results: Dict[str, Any]):
+        """Copy tool outputs (visualization, citations, content, RAG) into the state"""
+
+        # Process visualization results
+        if "generate_visualization" in tools_called:
+            viz_result = tool_results.get("generate_visualization", {})
+            if viz_result.get("status") == "success":
+                state["visualization_output"] = viz_result.get("output")
+                print(f"✅ Visualization generated successfully")
+            else:
+                print(f"❌ Visualization failed: {viz_result.get('error')}")
+
+        # Process web search results
+        if "search_web" in tools_called:
+            search_result = tool_results.get("search_web", {})
+            if search_result.get("status") == "success":
+                state["web_search_citations"] = search_result.get("citations", [])
+                print(f"✅ Web search completed: {len(state['web_search_citations'])} sources")
+            else:
+                print(f"❌ Web search failed: {search_result.get('error')}")
+
+        # Process training content results
+        if "get_training_content" in tools_called:
+            content_result = tool_results.get("get_training_content", {})
+            if content_result.get("status") == "success":
+                state["training_content"] = content_result.get("content")
+                print(f"✅ Training content retrieved: {content_result.get('module_name')}")
+            else:
+                print(f"❌ Training content failed: {content_result.get('error')}")
+
+        # Process RAG knowledge base results
+        if "search_knowledge_base" in tools_called:
+            rag_result = tool_results.get("search_knowledge_base", {})
+            if rag_result.get("status") == "success":
+                state["rag_context"] = rag_result.get("formatted_context")
+                state["rag_sources"] = rag_result.get("sources", [])
+                found_relevant = rag_result.get("found_relevant", False)
+                attempts = rag_result.get("attempts", 1)
+                print(f"✅ Knowledge base search completed: {len(state['rag_sources'])} sources, "
+                      f"relevant={found_relevant}, attempts={attempts}")
+            elif rag_result.get("status") == "no_relevant_info":
+                # RAG exhausted all attempts - no relevant info found
+                state["rag_context"] = None
+                state["rag_sources"] = []
+                print(f"⚠️ Knowledge base: no relevant info found after {rag_result.get('attempts', 3)} attempts")
+            else:
+                print(f"❌ Knowledge base search failed: {rag_result.get('error')}")
+
     def _generate_response_node(self, state: ChatState) -> ChatState:
         """Node 2: Generate text response from LLM using supervisor's context"""
 
@@ -287,13 +359,7 @@ class ChatAgent:
         context_summary = supervisor_decision.get("context_additions", "")
 
         # Prepare base context (WITHOUT supervisor summary - that goes in a separate message)
-        context = f"""
-Objectifs d'apprentissage:
-{state['training_objectives']}
-
-Évaluations:
-{json.dumps(state['evaluations'], indent=2, ensure_ascii=False)}
-"""
+        context = self._base_context(state["training_objectives"], state["evaluations"])
 
         # Add detailed tool results
         tool_results = supervisor_decision.get("tool_results", {})
@@ -338,11 +404,12 @@ Objectifs d'apprentissage:
             messages.append(SystemMessage(content=f"<internal_instruction>\n{context_summary}\n</internal_instruction>"))
 
         # Add conversation history and user message
-        messages.extend(state["messages"])
+        messages.extend(self._history_for_llm(state["messages"]))
         messages.append(HumanMessage(content=state["user_message"]))
 
         # Get response from LLM
-        response = invoke_with_retry(self.llm.invoke, messages)
+        with span("response.llm"):
+            response = invoke_with_retry(self.llm.invoke, messages, component="chat")
         response_text = response.content
 
         # Track token usage
@@ -353,7 +420,184 @@ Objectifs d'apprentissage:
         print(f"📊 Tokens this turn: {turn_tokens} | Cumulative: {self.total_tokens}")
 
         # CRITICAL: Remove any code blocks, visualization requests, or markdown tables that might have slipped through
-        import re
+        response_text = self._sanitize_response(response_text, state.get("tools_called", []))
+
+        state["agent_response"] = response_text
+
+        # Update conversation history
+        state["messages"].append(HumanMessage(content=state["user_message"]))
+        state["messages"].append(AIMessage(content=response_text))
+
+        return state
+
+    def _agent_node(self, state: ChatState) -> ChatState:
+        """Single-loop node: tool-bound LLM answers directly or requests tools"""
+
+        rounds = state.get("tool_rounds", 0)
+        print(f"\n{'='*70}")
+        print(f"🤖 AGENT NODE (single loop): round {rounds + 1}")
+        print(f"   User: {state['user_message'][:80]}...")
+        print(f"   Web Search: {'ON' if state.get('web_search_enabled', False) else 'OFF'}")
+        print(f"{'='*70}\n")
+
+        context = self._base_context(state["training_objectives"], state["evaluations"])
+        messages = [
+            SystemMessage(content=SINGLE_LOOP_PROMPT),
+            SystemMessage(content=f"Context:\n{context}"),
+        ]
+        messages.extend(self._history_for_llm(state["messages"]))
+        messages.append(HumanMessage(content=state["user_message"]))
+
+        # Once the tool budget is spent, the model must answer without tools; the
+        # unbound model cannot be sent tool_use / tool_result blocks, so the
+        # loop so far is passed as plain text
+        if rounds >= MAX_TOOL_ROUNDS:
+            messages.extend(self._flatten_loop_messages(state["loop_messages"]))
+            llm = self.llm
+        elif state.get("web_search_enabled", False):
+            messages.extend(state["loop_messages"])
+            llm = self.llm_with_tools
+        else:
+            messages.extend(state["loop_messages"])
+            llm = self.llm_with_tools_no_web
+
+        with span("agent.llm", round=state["tool_rounds"]):
+            response = invoke_with_retry(llm.invoke, messages, component="chat")
+
+        if hasattr(response, 'usage_metadata') and response.usage_metadata:
+            state["turn_tokens"] += response.usage_metadata.get('input_tokens', 0) + response.usage_metadata.get('output_tokens', 0)
+
+        if getattr(response, "tool_calls", None):
+            print(f"\n🔧 Tools to call: {[tc['name'] for tc in response.tool_calls]}")
+            state["loop_messages"].append(response)
+            state["next_step"] = "tools"
+            return state
+
+        self.total_tokens += state["turn_tokens"]
+        print(f"📊 Tokens this turn: {state['turn_tokens']} | Cumulative: {self.total_tokens}")
+
+        # Tool-bound responses may come back as a list of content blocks
+        response_text = response.content
+        if isinstance(response_text, list):
+            response_text = "".join(
+                block.get("text", "") for block in response_text
+                if isinstance(block, dict) and block.get("type") == "text"
+            )
+        response_text = self._sanitize_response(response_text, state.get("tools_called", []))
+        state["agent_response"] = response_text
+
+        # Conversation history keeps only the user message and the final answer
+        state["messages"].append(HumanMessage(content=state["user_message"]))
+        state["messages"].append(AIMessage(content=response_text))
+        state["next_step"] = "end"
+        return state
+
+    def _tools_node(self, state: ChatState) -> ChatState:
+        """Single-loop node: execute the requested tools and feed results back"""
+
+        tool_request = state["loop_messages"][-1]
+        web_search_enabled = state.get("web_search_enabled", False)
+
+        for tool_call in tool_request.tool_calls:
+            tool_name = tool_call["name"]
+            if tool_name == "generate_visualization":
+                # The server owns the conversation history; don't trust the model to echo it
+                tool_call = {**tool_call, "args": {
+                    **tool_call["args"],
+                    "conversation_history": self.supervisor._format_conversation_history(state["messages"]),
+                }}
+
+            if tool_name == "search_web" and not web_search_enabled:
+                succeeded, result = False, {"status": "error", "error": "Web search is disabled"}
+            else:
+                succeeded, result = execute_tool_call(tool_call)
+            if result is None:
+                result = {"status": "error", "error": f"Unknown tool: {tool_name}"}
+
+            if succeeded:
+                if tool_name not in state["tools_called"]:
+                    state["tools_called"].append(tool_name)
+                self._apply_tool_results(state, [tool_name], {tool_name: result})
+
+            state["loop_messages"].append(ToolMessage(
+                content=self._tool_result_for_llm(tool_name, result, web_search_enabled),
+                tool_call_id=tool_call["id"],
+            ))
+
+        state["tool_rounds"] = state.get("tool_rounds", 0) + 1
+        return state
+
+    @staticmethod
+    def _flatten_loop_messages(loop_messages: List[BaseMessage]) -> List[BaseMessage]:
+        """Tool calls and results of the loop as plain text messages (no tool blocks)"""
+        flattened: List[BaseMessage] = []
+        names: Dict[str, str] = {}
+        for message in loop_messages:
+            if isinstance(message, ToolMessage):
+                name = names.get(message.tool_call_id, "tool")
+                flattened.append(HumanMessage(content=f"[Result of {name}]\n{message.content}"))
+                continue
+            text = message.content
+            if isinstance(text, list):
+                text = "".join(block.get("text", "") for block in text
+                               if isinstance(block, dict) and block.get("type") == "text")
+            calls = getattr(message, "tool_calls", None) or []
+            for tool_call in calls:
+                names[tool_call["id"]] = tool_call["name"]
+            if calls:
+                called = ", ".join(tool_call["name"] for tool_call in calls)
+                text = f"{text}\n[Called tools: {called}]".strip()
+            flattened.append(AIMessage(content=text))
+        return flattened
+
+    def _tool_result_for_llm(self, tool_name: str, result: Dict[str, Any], web_search_enabled: bool) -> str:
+        """Render a tool result as compact text for the model (never the image payload)"""
+        status = result.get("status")
+        parts = []
+
+        if tool_name == "generate_visualization" and status == "success":
+            output = result.get("output") or {}
+            summary = output.get("summary_data") if isinstance(output, dict) else None
+            parts.append("Visualization generated; it is displayed to the learner above your answer.")
+            if summary:
+                parts.append(f"Summary data: {json.dumps(summary, ensure_ascii=False)[:2000]}")
+        elif tool_name == "search_web" and status == "success":
+            parts.append(result.get("formatted", ""))
+        elif tool_name == "get_training_content" and status == "success":
+            parts.append(f"Module: {result.get('module_name', '')}")
+            parts.append(f"Content:\n{result.get('content', '')}")
+        elif tool_name == "search_knowledge_base" and status == "success":
+            parts.append(f"Sources: {', '.join(result.get('sources', []))}")
+            parts.append(result.get("formatted_context", ""))
+        elif status not in ("no_relevant_info", "no_documents"):
+            parts.append(f"Tool error: {result.get('error', 'unknown error')}")
+
+        # Same per-tool guidance the supervisor gives the chat agent
+        instructions = self.supervisor._generate_context_summary([tool_name], {tool_name: result}, web_search_enabled)
+        if instructions:
+            parts.append(f"<internal_instruction>\n{instructions}\n</internal_instruction>")
+
+        return "\n\n".join(p for p in parts if p)
+
+    def _base_context(self, training_objectives: str, evaluations: Dict[str, Any]) -> str:
+        """Objectives + evaluations context shared by every response prompt"""
+        return f"""
+Objectifs d'apprentissage:
+{training_objectives}
+
+Évaluations:
+{json.dumps(evaluations, indent=2, ensure_ascii=False)}
+"""
+
+    def _history_for_llm(self, messages: List[BaseMessage]) -> List[BaseMessage]:
+        """Conversation history sent to the LLM; shortened once the token budget runs low"""
+        if budget_degraded() and len(messages) > DEGRADED_HISTORY_MESSAGES:
+            print(f"💸 Token budget low - keeping the last {DEGRADED_HISTORY_MESSAGES} messages of history")
+            return messages[-DEGRADED_HISTORY_MESSAGES:]
+        return messages
+
+    def _sanitize_response(self, response_text: str, tools_called: List[str]) -> str:
+        """Strip tool-request tags, code blocks and (after a visualization) markdown tables"""
 
         # Remove any <request_visualization> tags or similar XML-style tags
         if "<request_" in response_text or "</request_" in response_text:
@@ -368,7 +612,7 @@ Objectifs d'apprentissage:
             print("⚠️  Warning: Code detected in chat response and removed")
 
         # Remove markdown tables if visualization was generated
-        if "generate_visualization" in state.get("tools_called", []):
+        if "generate_visualization" in tools_called:
             # Detect markdown tables (lines with | symbols)
             lines = response_text.split('\n')
             filtered_lines = []
@@ -393,16 +637,10 @@ Objectifs d'apprentissage:
 
             print("⚠️  Markdown table detected and removed (visualization already generated)")
 
-        state["agent_response"] = response_text
-
-        # Update conversation history
-        state["messages"].append(HumanMessage(content=state["user_message"]))
-        state["messages"].append(AIMessage(content=response_text))
-
-        return state
+        return response_text
 
     def chat(self, user_message: str, web_search_enabled: bool = False) -> Dict[str, Any]:
-        """Process a chat message using the supervisor-based graph"""
+        """Process a chat message using the configured graph (supervisor or single loop)"""
 
         # Handle initial feedback separately
         if not self.initial_feedback_given:
@@ -435,11 +673,15 @@ Objectifs d'apprentissage:
             "training_content": None,
             "rag_context": None,
             "rag_sources": None,
+            "loop_messages": [],
+            "tool_rounds": 0,
+            "turn_tokens": 0,
             "next_step": "supervisor"
         }
 
         # Run the graph
-        final_state = self.graph.invoke(initial_state)
+        with span("graph", mode=self.graph_mode):
+            final_state = self.graph.invoke(initial_state)
 
         # Update conversation history
         self.conversation_history = final_state["messages"]
@@ -464,13 +706,7 @@ Objectifs d'apprentissage:
 
     def _create_initial_feedback(self) -> str:
         """Create the initial brief feedback"""
-        context = f"""
-Objectifs d'apprentissage:
-{self.training_objectives}
-
-Évaluations:
-{json.dumps(self.evaluations, indent=2, ensure_ascii=False)}
-"""
+        context = self._base_context(self.training_objectives, self.evaluations)
 
         messages = [
             SystemMessage(content=CHAT_AGENT_PROMPT),
@@ -479,7 +715,8 @@ Objectifs d'apprentissage:
 Puis suggérez 2-3 façons spécifiques dont l'apprenant peut explorer leurs résultats plus en profondeur.""")
         ]
 
-        response = invoke_with_retry(self.llm.invoke, messages)
+        with span("initial_feedback.llm"):
+            response = invoke_with_retry(self.llm.invoke, messages, component="chat")
 
         # Track token usage for initial feedback
         if hasattr(response, 'usage_metadata') and response.usage_metadata:
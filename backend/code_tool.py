@@ -1,64 +1,17 @@
 from typing import Dict, Any, Optional, List
-from pathlib import Path
-import asyncio
-import threading
 from langchain_core.messages import BaseMessage, HumanMessage
 import os
 import json
 import sys
-import io
-import base64
+import time
 from dotenv import load_dotenv
 
-_plt = None
-
-ROOT_DIR = Path(__file__).parent.parent
-SENSAI_LOGO_PATH = ROOT_DIR / "frontend" / "assets" / "sensai_logo.png"
-
-def _get_plt():
-    global _plt
-    if _plt is None:
-        import matplotlib
-        matplotlib.use('Agg')
-        import matplotlib.pyplot as plt
-        _plt = plt
-    return _plt
-
-
-def _make_sensai_header():
-    """Build the add_sensai_header(fig) helper injected into generated code.
-
-    Places a small "SENSAI" wordmark at the top-right of the figure with no
-    gap between it and the main content. If a real logo PNG exists at
-    SENSAI_LOGO_PATH, uses it (also small, top-right). Otherwise renders
-    a single-word "SENSAI" text label in the brand navy color.
-    """
-
-    def add_sensai_header(fig, *_, **__):
-        navy = "#0F2A47"
-
-        if SENSAI_LOGO_PATH.exists():
-            try:
-                import matplotlib.image as mpimg
-                img = mpimg.imread(str(SENSAI_LOGO_PATH))
-                # Small logo anchored at top-right of the figure, no gap
-                logo_ax = fig.add_axes([0.80, 0.93, 0.18, 0.06])
-                logo_ax.imshow(img, aspect="auto")
-                logo_ax.axis("off")
-                return logo_ax
-            except Exception:
-                pass
-
-        # Fallback: small single-word "SENSAI" wordmark at top-right
-        fig.text(
-            0.985, 0.975, "SENSAI",
-            ha="right", va="top",
-            fontsize=11, fontweight="bold",
-            color=navy, family="DejaVu Sans",
-        )
-        return None
-
-    return add_sensai_header
+from backend.viz_cache import get_viz_cache, schema_hash, data_hash
+from backend.rendering import render_visualization
+from backend.codegen_loop import run_codegen
+from backend.timing import span
+from backend.metrics import record_llm_call
+from backend.usage_ledger import get_usage_ledger
 
 load_dotenv()
 
@@ -83,6 +36,7 @@ Generate Python code to create visualizations (charts, tables, graphs) based on
 5. **All labels, titles, and text must be in French**
 6. **ALWAYS use plt.close() after saving to buffer**
 7. **MUST call `add_sensai_header(fig)` (already injected into globals) immediately after creating the figure. It places a small "SENSAI" wordmark at the top-right corner of the figure with no extra spacing. Do NOT add titles, suptitles, captions, or any other text above the visualization. Do NOT define your own header.**
+8. **Pass `ax=ax` to every seaborn and pandas plotting call** (e.g. `sns.heatmap(..., ax=ax)`, `df.plot(..., ax=ax)`); figures are isolated per request and plots without an explicit axes are lost.
 
 
 # CRITICAL: Do NOT hallucinate data keys or column names!
@@ -218,10 +172,13 @@ async def _generate_code_via_claude_agent(system_prompt: str, user_prompt: str)
         query,
         ClaudeAgentOptions,
         AssistantMessage,
+        ResultMessage,
         TextBlock,
     )
 
     collected: List[str] = []
+    usage: Dict[str, int] = {}
+    started = time.perf_counter()
     options = ClaudeAgentOptions(
         system_prompt=system_prompt,
         allowed_tools=[],
@@ -231,42 +188,34 @@ async def _generate_code_via_claude_agent(system_prompt: str, user_prompt: str)
         setting_sources=[],
     )
 
-    async for msg in query(prompt=user_prompt, options=options):
-        if isinstance(msg, AssistantMessage):
-            for block in msg.content:
-                if isinstance(block, TextBlock):
-                    collected.append(block.text)
+    try:
+        async for msg in query(prompt=user_prompt, options=options):
+            if isinstance(msg, AssistantMessage):
+                for block in msg.content:
+                    if isinstance(block, TextBlock):
+                        collected.append(block.text)
+            elif isinstance(msg, ResultMessage) and msg.usage:
+                cache_read = int(msg.usage.get("cache_read_input_tokens") or 0)
+                cache_creation = int(msg.usage.get("cache_creation_input_tokens") or 0)
+                usage = {
+                    # Same convention as LangChain's usage_metadata: input includes cached input
+                    "input": int(msg.usage.get("input_tokens") or 0) + cache_read + cache_creation,
+                    "output": int(msg.usage.get("output_tokens") or 0),
+                    "cache_read": cache_read,
+                    "cache_creation": cache_creation,
+                }
+    except BaseException:
+        seconds = time.perf_counter() - started
+        record_llm_call("codegen", "claude-agent-sdk", seconds, "error", usage)
+        get_usage_ledger().record("codegen", "claude-agent-sdk", usage, seconds, outcome="error")
+        raise
+    seconds = time.perf_counter() - started
+    record_llm_call("codegen", "claude-agent-sdk", seconds, usage=usage)
+    get_usage_ledger().record("codegen", "claude-agent-sdk", usage, seconds)
 
     return "".join(collected)
 
 
-def _run_in_new_thread(coro) -> str:
-    """Run an async coroutine in a fresh thread with its own event loop.
-
-    Avoids 'Cannot run the event loop while another loop is running'
-    when called from inside FastAPI's async event loop.
-    """
-    result: list = [None]
-    exc: list = [None]
-
-    def _runner():
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            result[0] = loop.run_until_complete(coro)
-        except Exception as e:
-            exc[0] = e
-        finally:
-            loop.close()
-
-    t = threading.Thread(target=_runner, daemon=True)
-    t.start()
-    t.join()
-    if exc[0] is not None:
-        raise exc[0]
-    return result[0] or ""
-
-
 class CodeGenerationTool:
     def __init__(self, evaluations: Dict[str, Any]):
         self.evaluations = evaluations
@@ -295,6 +244,35 @@ class CodeGenerationTool:
         
         conversation_context = "\n\n".join(context_parts) if context_parts else "No previous context."
 
+        # Cache lookup: rendered result first, then reusable code. Without
+        # evaluation data, the data to visualize comes from the conversation
+        # context, so it is part of both keys (the cache is shared by sessions).
+        cache = get_viz_cache()
+        if include_evaluation_data:
+            code_key = cache.code_key(user_request, True, schema_hash(self.evaluations))
+            result_key = cache.result_key(code_key, data_hash(self.evaluations))
+        else:
+            context_key = data_hash(conversation_context)
+            code_key = cache.code_key(user_request, False, context_key)
+            result_key = cache.result_key(code_key, context_key)
+
+        cached = cache.get_result(result_key)
+        if cached is not None:
+            print(f"⚡ Visualization cache hit")
+            return cached
+
+        cached_code = cache.get_code(code_key)
+        if cached_code:
+            print(f"♻️  Re-executing cached code against current data...")
+            result = self._execute_code(cached_code)
+            if isinstance(result, dict) and "error" not in result:
+                cache.put_result(result_key, cached_code, result)
+                return {
+                    "code": cached_code,
+                    "output": result
+                }
+            print(f"⚠️  Cached code failed on current data, regenerating")
+
         # Build the prompt - only include evaluation data if specifically needed
         if include_evaluation_data:
             # Include evaluation data for performance visualizations
@@ -331,9 +309,10 @@ Generate ONLY the Python code for the `generate_visualization` function describe
         # Get code from the Claude Agent SDK (Claude Code default prompt + our requirements).
         print(f"📝 Requesting code from Claude Agent SDK...")
         print(f"📋 Context provided: {len(conversation_context)} chars from {len(context_parts)} messages")
-        response_text = _run_in_new_thread(
-            _generate_code_via_claude_agent(CODE_REQUIREMENTS, user_prompt)
-        )
+        with span("codegen.llm"):
+            response_text = run_codegen(
+                lambda: _generate_code_via_claude_agent(CODE_REQUIREMENTS, user_prompt)
+            ) or ""
         code = self._extract_code(response_text)
 
         if not code:
@@ -348,6 +327,9 @@ Generate ONLY the Python code for the `generate_visualization` function describe
             print(f"⚙️  Executing code...")
             result = self._execute_code(code)
             print(f"✅ Code executed successfully")
+            if isinstance(result, dict) and "error" not in result:
+                cache.put_code(code_key, code)
+                cache.put_result(result_key, code, result)
             return {
                 "code": code,
                 "output": result
@@ -388,53 +370,13 @@ Generate ONLY the Python code for the `generate_visualization` function describe
             return response.strip()
 
     def _execute_code(self, code: str) -> Dict[str, Any]:
-        """Execute the generated code safely and return the result dictionary"""
-        # Create a restricted execution environment
-        plt = _get_plt()
-        exec_globals = {
-            'evaluations': self.evaluations,
-            'plt': plt,
-            'base64': base64,
-            'io': io,
-            'json': json,
-            'add_sensai_header': _make_sensai_header(),
-            '__builtins__': __builtins__
-        }
-
-        # Try to import common libraries
-        try:
-            import pandas as pd
-            import numpy as np
-            exec_globals['pd'] = pd
-            exec_globals['np'] = np
-        except ImportError:
-            pass
-
-        try:
-            import seaborn as sns
-            exec_globals['sns'] = sns
-        except ImportError:
-            pass
-
-        try:
-            # Execute the code
-            exec(code, exec_globals)
-
-            # Call the generated function
-            if 'generate_visualization' in exec_globals:
-                result = exec_globals['generate_visualization'](self.evaluations)
-                # Return the dict directly, not as JSON string
-                return result
-            else:
-                error_msg = "Error: No generate_visualization function found in generated code"
-                print(f"❌ {error_msg}")
-                return {"error": error_msg}
-        except Exception as e:
-            error_msg = f"Error executing visualization code: {str(e)}"
-            print(f"❌ {error_msg}")
-            import traceback
-            traceback.print_exc()
-            return {"error": error_msg}
+        """Execute the generated code on the rendering backend and return the result dictionary"""
+        with span("codegen.exec") as s:
+            result = render_visualization(code, self.evaluations)
+            s["ok"] = not (isinstance(result, dict) and "error" in result)
+        if isinstance(result, dict) and "error" in result:
+            print(f"❌ {result['error']}")
+        return result
 
 
 def example_visualization_code():
@@ -0,0 +1,141 @@
+"""
+Code Generation Event Loop
+
+A single long-lived asyncio loop, running in a daemon thread, that executes
+Claude Agent SDK code-generation coroutines. Replaces creating a thread and
+a fresh event loop per visualization.
+
+- At most CODEGEN_CONCURRENCY generations run at once; others wait for a slot.
+- Each generation is cancelled after CODEGEN_TIMEOUT_SECONDS.
+- Synchronous callers (the LangGraph tools) block on `run_codegen`;
+  async callers can `await run_codegen_async` without blocking their loop.
+
+CodegenLoop is also used, under another name, for other async I/O started
+from synchronous tools (web searches, see backend.web_search_tool).
+"""
+
+import asyncio
+import contextvars
+import os
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Optional
+
+CODEGEN_CONCURRENCY = int(os.getenv("CODEGEN_CONCURRENCY", "4"))
+CODEGEN_TIMEOUT_SECONDS = float(os.getenv("CODEGEN_TIMEOUT_SECONDS", "180"))
+
+
+class CodegenTimeout(TimeoutError):
+    """A code generation request exceeded its timeout and was cancelled"""
+
+
+class CodegenLoop:
+    """Background event loop with a concurrency limit and per-request timeouts"""
+
+    def __init__(self, concurrency: int = CODEGEN_CONCURRENCY, timeout: float = CODEGEN_TIMEOUT_SECONDS,
+                 name: str = "codegen"):
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+
+    def start(self):
+        """Start the loop thread (idempotent)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            ready = threading.Event()
+
+            def _run():
+                loop = asyncio.new_event_loop()
+                asyncio.set_event_loop(loop)
+                self._loop = loop
+                self._semaphore = asyncio.Semaphore(self.concurrency)
+                ready.set()
+                loop.run_forever()
+                loop.close()
+
+            self._thread = threading.Thread(target=_run, name=f"{self.name}-loop", daemon=True)
+            self._thread.start()
+            ready.wait()
+            print(f"🔁 {self.name} loop started (concurrency={self.concurrency}, timeout={self.timeout:.0f}s)")
+
+    async def _guarded(self, coro_factory: Callable[[], Awaitable[Any]], timeout: float,
+                       context: contextvars.Context) -> Any:
+        async with self._semaphore:
+            self.in_flight += 1
+            try:
+                # Run in the submitter's context (usage session, timing trace)
+                task = asyncio.get_running_loop().create_task(coro_factory(), context=context)
+                return await asyncio.wait_for(task, timeout=timeout)
+            except asyncio.TimeoutError:
+                raise CodegenTimeout(f"{self.name} request exceeded {timeout:.0f}s and was cancelled")
+            finally:
+                self.in_flight -= 1
+
+    def submit(self, coro_factory: Callable[[], Awaitable[Any]], timeout: Optional[float] = None) -> Future:
+        """Schedule a coroutine on the loop; returns a concurrent Future.
+
+        `coro_factory` is called inside the loop so the coroutine is created
+        where it runs. Cancelling the returned future cancels the coroutine.
+        """
+        self.start()
+        return asyncio.run_coroutine_threadsafe(
+            self._guarded(coro_factory, timeout or self.timeout, contextvars.copy_context()), self._loop
+        )
+
+    def run(self, coro_factory: Callable[[], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the loop and block until it finishes"""
+        if threading.current_thread() is self._thread:
+            raise RuntimeError(f"run() called from the {self.name} loop itself; await the coroutine instead")
+        future = self.submit(coro_factory, timeout)
+        try:
+            return future.result()
+        except BaseException:
+            future.cancel()
+            raise
+
+    async def run_async(self, coro_factory: Callable[[], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+        """Await a coroutine on the loop from another event loop"""
+        future = self.submit(coro_factory, timeout)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+
+    def shutdown(self):
+        with self._lock:
+            if self._loop is not None and self._loop.is_running():
+                self._loop.call_soon_threadsafe(self._loop.stop)
+            if self._thread is not None:
+                self._thread.join(timeout=5)
+            self._thread = None
+            self._loop = None
+
+
+_loop_instance: Optional[CodegenLoop] = None
+_loop_lock = threading.Lock()
+
+
+def get_codegen_loop() -> CodegenLoop:
+    """Process-wide code generation loop"""
+    global _loop_instance
+    with _loop_lock:
+        if _loop_instance is None:
+            _loop_instance = CodegenLoop()
+    return _loop_instance
+
+
+def run_codegen(coro_factory: Callable[[], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+    """Run a code generation coroutine on the shared loop (blocking)"""
+    return get_codegen_loop().run(coro_factory, timeout)
+
+
+async def run_codegen_async(coro_factory: Callable[[], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+    """Run a code generation coroutine on the shared loop (awaitable)"""
+    return await get_codegen_loop().run_async(coro_factory, timeout)
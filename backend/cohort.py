@@ -0,0 +1,278 @@
+"""
+Cohort Evaluation
+
+Evaluates a whole class at once: N learners' responses to the scenarios of
+one training, instead of /evaluate's single built-in learner.
+
+- The expert side of each module is analyzed once (backend.expert_analysis)
+  and every learner is evaluated against it with the split evaluation.
+- The (module, learner) evaluations run on one bounded pool shared by all
+  cohorts (COHORT_CONCURRENCY workers), grouped per module: one learner of
+  a module goes first and writes the prompt cache of its expert brief, the
+  others then read it (see evaluator.evaluate_learner).
+- Each learner gets its own session, saved as soon as all of their modules
+  are evaluated; /chat and /evaluation/{session_id} work on it as usual.
+- Learners are also appended to the analytics table (backend.analytics)
+  with their learner and cohort ids.
+- Cohort status (per-learner session ids, throughput, tokens) is kept in
+  memory for the session TTL.
+"""
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional
+
+from .expert_analysis import apply_responses, expert_view, get_expert_analysis_cache, parse_module
+from .session_store import SESSION_TTL_SECONDS, generate_session_id, save_session
+from .training_catalog import Training
+from .usage_ledger import TOKEN_TYPES, get_usage_ledger, total_tokens, usage_scope
+
+COHORT_CONCURRENCY = int(os.getenv("COHORT_CONCURRENCY", "4"))
+COHORT_MAX_LEARNERS = int(os.getenv("COHORT_MAX_LEARNERS", "200"))
+
+
+def _wait_all(futures: List[Future]):
+    """Wait for a phase; raise when one of its tasks was cancelled (pool shut down) or raised"""
+    # wait() alone never returns for futures cancelled by shutdown(cancel_futures=True):
+    # they are not "notified" until a worker picks them up, which never happens
+    while not all(future.done() for future in futures):
+        wait(futures, timeout=1.0)
+    for future in futures:
+        if future.cancelled():
+            raise RuntimeError("Cohort evaluation was cancelled (server shutting down)")
+        error = future.exception()
+        if error is not None:
+            raise error
+
+
+class CohortJob:
+    """Evaluation of the learners of one training; status() is safe to call while it runs"""
+
+    def __init__(self, training: Training, learners: List[Dict[str, Any]]):
+        """
+        Args:
+            training: The training the learners answered
+            learners: [{"learner_id", "responses": {module key: {scenario number: answer}}}]
+
+        Raises:
+            ValueError: No learners, too many, duplicate ids, unknown modules or
+                scenarios, or a module that cannot be split into scenarios
+        """
+        if not learners:
+            raise ValueError("No learners given")
+        if len(learners) > COHORT_MAX_LEARNERS:
+            raise ValueError(f"At most {COHORT_MAX_LEARNERS} learners per cohort")
+        ids = [learner["learner_id"] for learner in learners]
+        if len(set(ids)) != len(ids):
+            raise ValueError("Duplicate learner_id in the cohort")
+
+        self.cohort_id = f"cohort_{uuid.uuid4().hex[:12]}"
+        self.training = training
+        self.modules: Dict[str, Dict[str, Any]] = {}
+        self.learners: Dict[str, Dict[str, Any]] = {}
+        for learner in learners:
+            responses = learner["responses"]
+            if not responses:
+                raise ValueError(f"Learner '{learner['learner_id']}' has no responses")
+            modules = {}
+            for key, answers in responses.items():
+                modules[key] = apply_responses(self._module(key), answers)
+            self.learners[learner["learner_id"]] = {
+                "session_id": generate_session_id(),
+                "modules": modules,
+                "evaluations": {},
+                "status": "pending",
+                "error": None,
+                "seconds": None,
+            }
+
+        self.status_value = "queued"
+        self.created_at = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def _module(self, key: str) -> Dict[str, Any]:
+        if key not in self.modules:
+            if key not in self.training.module_names:
+                raise ValueError(f"Unknown module '{key}'. Available: {list(self.training.module_names)}")
+            module = parse_module(self.training.trainings[key])
+            if module is None:
+                raise ValueError(f"Module '{key}' has no tagged scenarios with expert responses")
+            self.modules[key] = module
+        return self.modules[key]
+
+    def _units(self) -> Dict[str, List[str]]:
+        """module key -> learner ids, in submission order"""
+        units: Dict[str, List[str]] = {key: [] for key in self.modules}
+        for learner_id, learner in self.learners.items():
+            for key in learner["modules"]:
+                units[key].append(learner_id)
+        return units
+
+    # ----- running -----
+
+    def run(self, pool: ThreadPoolExecutor):
+        """Schedule the evaluations on the pool and wait for them (runs in the cohort's own thread)"""
+        from backend.analytics import record_evaluations
+        from backend.evaluator import evaluate_learner
+        from backend.reevaluation import scenario_state
+
+        def module_name(key: str) -> str:
+            return f"{self.training.module_names.get(key, key)} ({self.cohort_id})"
+
+        def analyze(key: str):
+            with usage_scope(self.cohort_id):
+                get_expert_analysis_cache().get_or_compute(expert_view(self.modules[key]), module_name(key))
+
+        def evaluate(key: str, learner_id: str):
+            learner = self.learners[learner_id]
+            with self._lock:
+                if learner["status"] == "failed":
+                    return
+                learner["status"] = "running"
+            start = time.perf_counter()
+            try:
+                with usage_scope(learner["session_id"]):
+                    evaluation = evaluate_learner(learner["modules"][key], f"{module_name(key)} / {learner_id}")
+            except Exception as e:
+                print(f"❌ Cohort {self.cohort_id}: {learner_id} / {key} failed: {e}")
+                with self._lock:
+                    learner["status"], learner["error"] = "failed", f"{key}: {e}"
+                return
+            with self._lock:
+                learner["evaluations"][key] = evaluation
+                learner["seconds"] = round((learner["seconds"] or 0) + time.perf_counter() - start, 3)
+                done = len(learner["evaluations"]) == len(learner["modules"])
+            if done:
+                # Stream the learner into the session store without waiting for the cohort
+                evaluations = {k: learner["evaluations"][k] for k in learner["modules"]}
+                extra = {**scenario_state(learner["modules"]), "learner_id": learner_id, "cohort_id": self.cohort_id}
+                save_session(learner["session_id"], evaluations, self.training.training_type, extra=extra)
+                record_evaluations(learner["session_id"], evaluations, self.training.training_type,
+                                   learner_id, self.cohort_id)
+                with self._lock:
+                    learner["status"] = "completed"
+                print(f"✅ Cohort {self.cohort_id}: {learner_id} evaluated ({learner['session_id']})")
+
+        self.status_value, self.started = "running", time.time()
+        print(f"🎓 Cohort {self.cohort_id}: {len(self.learners)} learners of {self.training.training_type}")
+        try:
+            units = self._units()
+            # Expert analysis, then one learner per module to write the prompt cache
+            _wait_all([pool.submit(analyze, key) for key in units])
+            _wait_all([pool.submit(evaluate, key, learner_ids[0]) for key, learner_ids in units.items()])
+            # The rest, grouped per module so its cached prefix stays warm
+            _wait_all([pool.submit(evaluate, key, learner_id)
+                       for key, learner_ids in units.items() for learner_id in learner_ids[1:]])
+            self.status_value = "completed"
+        except Exception as e:
+            print(f"❌ Cohort {self.cohort_id} failed: {e}")
+            self.status_value, self.error = "failed", str(e)
+            with self._lock:
+                for learner in self.learners.values():
+                    if learner["status"] in ("pending", "running"):
+                        learner["status"], learner["error"] = "failed", str(e)
+        self.finished = time.time()
+        print(f"🎓 Cohort {self.cohort_id} {self.status_value} in {self.finished - self.started:.1f}s")
+
+    # ----- reporting -----
+
+    def _usage(self) -> Dict[str, Any]:
+        """Tokens of the cohort (expert analyses) and of its learner sessions"""
+        ledger = get_usage_ledger()
+        totals = {t: 0 for t in TOKEN_TYPES}
+        calls = 0
+        for session_id in [self.cohort_id] + [learner["session_id"] for learner in self.learners.values()]:
+            summary = ledger.summary(session_id)["totals"]
+            calls += summary["calls"]
+            for t in TOKEN_TYPES:
+                totals[t] += summary[t]
+        return {
+            "calls": calls,
+            **totals,
+            "tokens": total_tokens(totals),
+            # Share of the input read from the prompt cache
+            "cache_read_ratio": round(totals["cache_read"] / totals["input"], 3) if totals["input"] else 0.0,
+        }
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            learners = [{"learner_id": learner_id, "session_id": learner["session_id"],
+                         "status": learner["status"], "modules_done": len(learner["evaluations"]),
+                         "modules": len(learner["modules"]), "error": learner["error"],
+                         "seconds": learner["seconds"]}
+                        for learner_id, learner in self.learners.items()]
+        counts = {status: sum(learner["status"] == status for learner in learners)
+                  for status in ("pending", "running", "completed", "failed")}
+        evaluations = sum(learner["modules_done"] for learner in learners)
+        elapsed = ((self.finished or time.time()) - self.started) if self.started else 0.0
+        return {
+            "cohort_id": self.cohort_id,
+            "training_type": self.training.training_type,
+            "status": self.status_value,
+            "error": self.error,
+            "learners": counts,
+            "evaluations": {"done": evaluations, "total": sum(learner["modules"] for learner in learners)},
+            "throughput": {
+                "elapsed_seconds": round(elapsed, 3),
+                "learners_per_minute": round(counts["completed"] * 60 / elapsed, 2) if elapsed else 0.0,
+                "evaluations_per_minute": round(evaluations * 60 / elapsed, 2) if elapsed else 0.0,
+                "concurrency": COHORT_CONCURRENCY,
+            },
+            "usage": self._usage(),
+            "results": learners,
+        }
+
+
+class CohortRunner:
+    """Runs cohort jobs on one bounded pool and keeps their status for the session TTL"""
+
+    def __init__(self, concurrency: int = COHORT_CONCURRENCY):
+        self.concurrency = concurrency
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._jobs: Dict[str, CohortJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, job: CohortJob) -> CohortJob:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="cohort")
+            pool = self._pool
+            cutoff = time.time() - SESSION_TTL_SECONDS
+            for cohort_id in [c for c, j in self._jobs.items() if j.finished and j.finished < cutoff]:
+                del self._jobs[cohort_id]
+            self._jobs[job.cohort_id] = job
+        threading.Thread(target=job.run, args=(pool,), name=job.cohort_id, daemon=True).start()
+        return job
+
+    def get(self, cohort_id: str) -> Optional[CohortJob]:
+        with self._lock:
+            return self._jobs.get(cohort_id)
+
+    def running(self) -> int:
+        with self._lock:
+            return sum(job.status_value in ("queued", "running") for job in self._jobs.values())
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+_runner_instance: Optional[CohortRunner] = None
+_runner_lock = threading.Lock()
+
+
+def get_cohort_runner() -> CohortRunner:
+    """Process-wide cohort runner"""
+    global _runner_instance
+    with _runner_lock:
+        if _runner_instance is None:
+            _runner_instance = CohortRunner()
+    return _runner_instance
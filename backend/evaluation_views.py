@@ -0,0 +1,107 @@
+"""
+Evaluation Views
+
+Lean projections of the evaluations dict for the API, so each page only
+downloads what it renders.
+
+- view=full     the whole evaluations dict (default)
+- view=summary  per scenario only the coverage level and the reasoning /
+                communication ratings, plus situation descriptions
+- view=none     no evaluations at all
+
+`fields` narrows the chosen view to dotted paths, relative to each training
+module unless the path starts with a module key; `*` matches every key:
+
+    fields=situations.*.description
+    fields=situations.*.scenarios.*.coverage.score_assessment
+    fields=training_2.situations
+"""
+
+from typing import Any, Dict, List, Optional
+
+EVALUATION_VIEWS = ("full", "summary", "none")
+
+_MISSING = object()
+
+
+def summarize_evaluations(evaluations: Dict[str, Any]) -> Dict[str, Any]:
+    """Situation descriptions and per-scenario ratings, without the text"""
+    summary: Dict[str, Any] = {}
+    for training_key, training in evaluations.items():
+        situations = {}
+        for sit_key, situation in (training or {}).get("situations", {}).items():
+            scenarios = {}
+            for scen_key, scenario in (situation or {}).get("scenarios", {}).items():
+                scenario = scenario or {}
+                scenarios[scen_key] = {
+                    "coverage": (scenario.get("coverage") or {}).get("score_assessment"),
+                    "logical_reasoning": (scenario.get("logical_reasoning") or {}).get("rating"),
+                    "communication": (scenario.get("communication") or {}).get("rating"),
+                }
+            situations[sit_key] = {"description": situation.get("description", ""), "scenarios": scenarios}
+        summary[training_key] = {"situations": situations}
+    return summary
+
+
+def _project(value: Any, segments: List[str]) -> Any:
+    if not segments:
+        return value
+    head, rest = segments[0], segments[1:]
+    if isinstance(value, dict):
+        keys = list(value.keys()) if head == "*" else ([head] if head in value else [])
+        projected = {}
+        for key in keys:
+            sub = _project(value[key], rest)
+            if sub is not _MISSING:
+                projected[key] = sub
+        return projected if projected else _MISSING
+    if isinstance(value, list) and head == "*":
+        items = [_project(item, rest) for item in value]
+        items = [item for item in items if item is not _MISSING]
+        return items if items else _MISSING
+    return _MISSING
+
+
+def _merge(a: Any, b: Any) -> Any:
+    if isinstance(a, dict) and isinstance(b, dict):
+        merged = dict(a)
+        for key, value in b.items():
+            merged[key] = _merge(merged[key], value) if key in merged else value
+        return merged
+    if isinstance(a, list) and isinstance(b, list) and len(a) == len(b):
+        return [_merge(x, y) for x, y in zip(a, b)]
+    return b
+
+
+def parse_fields(fields: Optional[List[str]]) -> List[str]:
+    """Flatten repeated and comma-separated `fields` query values"""
+    paths = []
+    for value in fields or []:
+        paths.extend(p.strip() for p in value.split(",") if p.strip())
+    return paths
+
+
+def select_fields(evaluations: Dict[str, Any], paths: List[str]) -> Dict[str, Any]:
+    """Keep only the given dotted paths of the evaluations dict"""
+    result: Dict[str, Any] = {}
+    for path in paths:
+        segments = path.split(".")
+        if segments[0] == "*" or segments[0] in evaluations:
+            projected = _project(evaluations, segments)
+        else:
+            projected = _project(evaluations, ["*"] + segments)
+        if projected is not _MISSING:
+            result = _merge(result, projected)
+    return result
+
+
+def project_evaluations(evaluations: Dict[str, Any], view: str = "full",
+                        fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+    """Apply a view and optional field selection; raises ValueError on an unknown view"""
+    if view not in EVALUATION_VIEWS:
+        raise ValueError(f"Unknown view '{view}'. Available: {', '.join(EVALUATION_VIEWS)}")
+    if view == "none":
+        return None
+    data = summarize_evaluations(evaluations) if view == "summary" else evaluations
+    paths = parse_fields(fields)
+    return select_fields(data, paths) if paths else data
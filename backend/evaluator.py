@@ -1,20 +1,29 @@
-from typing import Dict, Any
+from typing import Any, Collection, Dict, Optional
 from langchain_core.messages import SystemMessage, HumanMessage
-from langchain_anthropic import ChatAnthropic
 import os
 import sys
 from pathlib import Path
 import concurrent.futures
+import contextvars
 from dotenv import load_dotenv
 
 sys.path.append(str(Path(__file__).parent.parent))
 
-from prompts import EVALUATOR_PROMPT
-from models import TrainingEvaluation
+from prompts import EVALUATOR_PROMPT, LEARNER_EVALUATION_PROMPT
+from models import LearnerEvaluation, TrainingEvaluation
 from backend.llm_retry import invoke_with_retry
+from backend.model_registry import cacheable_content, get_chat_model
+from backend.training_catalog import get_training
+from backend.expert_analysis import (
+    expert_brief, expert_view, get_expert_analysis_cache, learner_answers, merge_evaluation, parse_module,
+    select_scenarios,
+)
 
 load_dotenv()
 
+# split: expert analysis cached per training version + per-learner evaluation; single: one full-text call
+EVALUATOR_MODE = os.getenv("EVALUATOR_MODE", "split").lower()
+
 # Configure LangSmith tracing
 os.environ["LANGCHAIN_TRACING_V2"] = "true"
 os.environ["LANGCHAIN_PROJECT"] = "Feedback_Chat_Agent"
@@ -23,18 +32,28 @@ if not os.getenv("LANGCHAIN_API_KEY"):
 
 
 def get_llm_model():
-    """Initialize Claude model"""
-    return ChatAnthropic(
-        model="claude-sonnet-4-6",
-        temperature=0.3,
-        anthropic_api_key=os.getenv("ANTHROPIC_API_KEY")
-    )
+    """Initialize the evaluator model (see backend.model_registry)"""
+    return get_chat_model("evaluator")
 
 
 def evaluate_training(training_content: str, training_name: str) -> Dict[str, Any]:
-    """Evaluate a single training module"""
+    """Evaluate a single training module.
+
+    In "split" mode (default) the expert side is analyzed once per training
+    version (backend.expert_analysis) and the learner is evaluated against
+    it; texts that cannot be parsed into scenarios, or learner evaluations
+    missing a scenario, fall back to a single full-text evaluation.
+    """
     print(f"\n🔍 Evaluating {training_name}...")
 
+    if EVALUATOR_MODE == "split":
+        module = parse_module(training_content)
+        if module is not None:
+            try:
+                return evaluate_learner(module, training_name)
+            except ValueError as e:
+                print(f"⚠️  {training_name}: {e}; evaluating the full text instead")
+
     llm = get_llm_model()
     structured_llm = llm.with_structured_output(TrainingEvaluation)
 
@@ -43,65 +62,57 @@ def evaluate_training(training_content: str, training_name: str) -> Dict[str, An
         HumanMessage(content=training_content)
     ]
 
-    result = invoke_with_retry(structured_llm.invoke, messages)
+    result = invoke_with_retry(structured_llm.invoke, messages, component="evaluator")
 
     print(f"✅ {training_name} evaluation completed")
     return result.model_dump()
 
 
+def evaluate_learner(module: Dict[str, Any], training_name: str,
+                     scenarios: Optional[Collection[int]] = None) -> Dict[str, Any]:
+    """Evaluate the learner's responses of a parsed module against the cached expert analysis.
+
+    The system prompt (instructions + expert brief) is the same for every
+    learner of the training and is marked as a prompt-cache prefix; only the
+    learner's answers differ between calls. With `scenarios`, only those
+    scenario numbers are sent and returned (incremental re-evaluation); the
+    prefix stays that of the whole module.
+    """
+    analysis = get_expert_analysis_cache().get_or_compute(expert_view(module), training_name)
+    answered = select_scenarios(module, scenarios) if scenarios is not None else module
+
+    llm = get_llm_model()
+    structured_llm = llm.with_structured_output(LearnerEvaluation)
+
+    system = f"{LEARNER_EVALUATION_PROMPT}\n\n{expert_brief(module, analysis)}"
+    messages = [
+        SystemMessage(content=cacheable_content("evaluator", system)),
+        HumanMessage(content=learner_answers(answered))
+    ]
+
+    result = invoke_with_retry(structured_llm.invoke, messages, component="evaluator")
+    evaluation = merge_evaluation(answered, analysis, result.model_dump())
+
+    print(f"✅ {training_name} evaluation completed")
+    return evaluation
+
+
 def run_evaluations(training_type: str = "migraine") -> Dict[str, Dict[str, Any]]:
     """Run evaluations for training modules based on training type"""
     print("\n" + "="*80)
     print(f"🚀 Starting Evaluations for training type: {training_type}")
     print("="*80)
 
-    if training_type == "migraine":
-        from trainings_2_experts import training_1, training_2, training_3
-        with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
-            future_1 = executor.submit(evaluate_training, training_1, "Training 1")
-            future_2 = executor.submit(evaluate_training, training_2, "Training 2")
-            future_3 = executor.submit(evaluate_training, training_3, "Training 3")
-
-            eval_1 = future_1.result()
-            eval_2 = future_2.result()
-            eval_3 = future_3.result()
-
-        print("\n✅ All evaluations completed!")
-        return {
-            "training_1": eval_1,
-            "training_2": eval_2,
-            "training_3": eval_3
+    training = get_training(training_type)
+    modules = training.trainings
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(modules)) as executor:
+        # Each worker runs in a copy of this context (usage session, timing trace)
+        futures = {
+            key: executor.submit(contextvars.copy_context().run, evaluate_training, content,
+                                 training.module_names.get(key, key))
+            for key, content in modules.items()
         }
+        evaluations = {key: future.result() for key, future in futures.items()}
 
-    elif training_type == "nursing_1st":
-        from trainings_nursing_1stLearner import training_1
-        eval_1 = evaluate_training(training_1, "Nursing Leadership (1st Learner)")
-        print("\n✅ Evaluation completed!")
-        return {"training_1": eval_1}
-
-    elif training_type == "nursing_2nd":
-        from trainings_nursing_2ndLearner import training_1
-        eval_1 = evaluate_training(training_1, "Nursing Leadership (2nd Learner)")
-        print("\n✅ Evaluation completed!")
-        return {"training_1": eval_1}
-
-    elif training_type == "leadership_1st":
-        from trainings_leadership_1srLearner import training_1
-        eval_1 = evaluate_training(training_1, "Leadership (1st Learner)")
-        print("\n✅ Evaluation completed!")
-        return {"training_1": eval_1}
-
-    elif training_type == "leadership_2nd":
-        from trainings_leadership_2ndLearner import training_1
-        eval_1 = evaluate_training(training_1, "Leadership (2nd Learner)")
-        print("\n✅ Evaluation completed!")
-        return {"training_1": eval_1}
-
-    elif training_type == "leadership_3rd":
-        from trainings_leadership_3rdLearner import training_1
-        eval_1 = evaluate_training(training_1, "Leadership (3rd Learner)")
-        print("\n✅ Evaluation completed!")
-        return {"training_1": eval_1}
-
-    else:
-        raise ValueError(f"Unknown training type: {training_type}")
+    print("\n✅ All evaluations completed!")
+    return evaluations
@@ -1,4 +1,31 @@
-TABLE_GENERATOR_PROMPT = r'''
+# Shared by the full table prompt and the row update prompt
+RATING_MAPS = r'''================================================================================
+RATING MAPS (apply verbatim; never expose raw harsh terms in the table)
+================================================================================
+COVERAGE_MAP = {
+    "Low":     "Early",
+    "Medium":  "Partial",
+    "High":    "Achieved",
+}
+
+REASONING_MAP = {
+    "Unsatisfactory":    "Developing",
+    "Needs Improvement": "Developing",
+    "Satisfactory":      "Emerging",
+    "Good":              "Established",
+    "Very Good":         "Strong",
+}
+
+COMMUNICATION_MAP = {
+    "Unsatisfactory":    "Early",
+    "Needs Improvement": "Early",
+    "Satisfactory":      "Developing",
+    "Good":              "Developing",
+    "Very Good":         "Established",
+}
+'''
+
+TABLE_GENERATOR_PROMPT = (r'''
 You convert a structured evaluation (Learning by Concordance, nursing
 education) into ONE runnable Python script that reproduces the table in
 `table1_detailed.png` using the CODE TEMPLATE below.
@@ -69,31 +96,7 @@ any of the example titles, themes, or ratings unless they truly appear in
 the new input. The number of rows must equal the total number of scenarios
 in the input — not always 6.
 
-================================================================================
-RATING MAPS (apply verbatim; never expose raw harsh terms in the table)
-================================================================================
-COVERAGE_MAP = {
-    "Low":     "Early",
-    "Medium":  "Partial",
-    "High":    "Achieved",
-}
-
-REASONING_MAP = {
-    "Unsatisfactory":    "Developing",
-    "Needs Improvement": "Developing",
-    "Satisfactory":      "Emerging",
-    "Good":              "Established",
-    "Very Good":         "Strong",
-}
-
-COMMUNICATION_MAP = {
-    "Unsatisfactory":    "Early",
-    "Needs Improvement": "Early",
-    "Satisfactory":      "Developing",
-    "Good":              "Developing",
-    "Very Good":         "Established",
-}
-
+''' + RATING_MAPS + r'''
 ================================================================================
 CODE TEMPLATE (this is the canonical visual format — do not change anything
 outside the clearly marked EDIT regions)
@@ -270,4 +273,26 @@ OUTPUT FORMAT (STRICT)
 - The script must run as-is and write `table1_detailed.png` to the current
   working directory.
 - Deterministic: same input -> same script.
-'''.strip()
\ No newline at end of file
+''').strip()
+
+TABLE_ROWS_PROMPT = (r'''
+You update some rows of an existing "Learning by Concordance — Detailed
+Scenario Review" table after the learner's answers to these scenarios were
+re-evaluated.
+
+The user message contains a JSON list; each item has the table `row` number
+and the evaluation of one scenario (coverage, logical_reasoning,
+communication, skills_assessment, expert_key_elements).
+
+For every item return its `row` number and:
+- coverage: COVERAGE_MAP[coverage.score_assessment]
+- logical_reasoning: REASONING_MAP[logical_reasoning.rating]
+- communication: COMMUNICATION_MAP[communication.rating]
+- themes_addressed: short English summary of the "Thèmes abordés" portion
+  of coverage.justification (<= 2 lines, break with \n)
+- themes_missing: short English summary of the "Thèmes manquants" portion
+  of coverage.justification (<= 2 lines, break with \n)
+
+Justifications may be in French or English; output cells must be in English.
+
+''' + RATING_MAPS).strip()
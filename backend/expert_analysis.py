@@ -0,0 +1,276 @@
+"""
+Expert Analysis Cache
+
+The learners of a training (nursing_1st / nursing_2nd, leadership_1st /
+2nd / 3rd) share the same situations, scenarios and expert responses and
+differ only in their own answers. The expert side of the evaluation
+(situation descriptions, expert key elements and consensus, objectives at
+stake per scenario) is therefore computed once per version of the expert
+content and cached; each learner is then evaluated against it with a much
+smaller prompt (see evaluator.evaluate_training) whose expert part is
+shared by all learners and marked for prompt caching.
+
+- Keyed on a hash of the objectives + scenarios + expert responses (learner
+  responses excluded), the evaluator model and ANALYSIS_VERSION: editing an
+  expert response or changing the model produces a new analysis
+- Kept in memory and persisted to disk (.expert_cache/); entries never
+  expire since the key changes with the content
+- Concurrent evaluations of the same training wait for one analysis
+"""
+
+import copy
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Collection, Dict, Optional
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from .llm_retry import invoke_with_retry
+from .metrics import record_cache_lookup
+from .model_registry import get_chat_model, get_model_registry
+from .training_index import format_situations, parse_training
+from .viz_cache import data_hash
+
+CACHE_DIR = Path(__file__).parent.parent / ".expert_cache"
+ANALYSIS_VERSION = 1  # bump when EXPERT_ANALYSIS_PROMPT or ExpertAnalysis change
+
+
+def expert_view(module: Dict[str, Any]) -> str:
+    """Objectives, situations, scenarios and expert responses of a parsed module (no learner data)"""
+    return f"Training Objectives:\n{module['objectives']}\n\n{format_situations(module['situations'], 'experts')}"
+
+
+def response_distribution(scenario: Dict[str, Any]) -> str:
+    """'Renforcée (3), Fortement renforcée (1)'"""
+    counts: Dict[str, int] = {}
+    for expert in scenario["experts"]:
+        response = expert["response"].rstrip(". ")
+        if response:
+            counts[response] = counts.get(response, 0) + 1
+    return ", ".join(f"{response} ({n})" for response, n in counts.items())
+
+
+class ExpertAnalysisCache:
+    """Memory + disk cache of ExpertAnalysis results, one computation per key at a time"""
+
+    def __init__(self, cache_dir: Path = CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._memory: Dict[str, Dict[str, Any]] = {}
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.computed = 0
+
+    @staticmethod
+    def key(expert_text: str) -> str:
+        model = get_model_registry().spec("evaluator")["model"]
+        return data_hash([ANALYSIS_VERSION, model, expert_text])
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            analysis = self._memory.get(key)
+        if analysis is not None:
+            return analysis
+        path = self._path(key)
+        if not path.exists():
+            return None
+        try:
+            analysis = json.loads(path.read_text(encoding="utf-8"))
+        except (json.JSONDecodeError, OSError):
+            return None
+        with self._lock:
+            self._memory[key] = analysis
+        return analysis
+
+    def _store(self, key: str, analysis: Dict[str, Any]):
+        with self._lock:
+            self._memory[key] = analysis
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_text(json.dumps(analysis, ensure_ascii=False), encoding="utf-8")
+            tmp.replace(path)
+        except OSError as e:
+            print(f"⚠️  Expert analysis cache write failed: {e}")
+
+    def get_or_compute(self, expert_text: str, training_name: str) -> Dict[str, Any]:
+        key = self.key(expert_text)
+        analysis = self._load(key)
+        record_cache_lookup("expert_analysis", analysis is not None)
+        if analysis is not None:
+            print(f"⚡ Expert analysis cache hit for {training_name}")
+            return analysis
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            # Computed by a concurrent evaluation while we waited
+            analysis = self._load(key)
+            if analysis is None:
+                analysis = self._compute(expert_text, training_name)
+                self._store(key, analysis)
+        return analysis
+
+    def _compute(self, expert_text: str, training_name: str) -> Dict[str, Any]:
+        from models import ExpertAnalysis
+        from prompts import EXPERT_ANALYSIS_PROMPT
+
+        print(f"🧠 Analyzing expert responses for {training_name}...")
+        structured_llm = get_chat_model("evaluator").with_structured_output(ExpertAnalysis)
+        messages = [SystemMessage(content=EXPERT_ANALYSIS_PROMPT), HumanMessage(content=expert_text)]
+        result = invoke_with_retry(structured_llm.invoke, messages, component="expert_analysis")
+        with self._lock:
+            self.computed += 1
+        return result.model_dump()
+
+
+def expert_brief(module: Dict[str, Any], analysis: Dict[str, Any]) -> str:
+    """Learner-independent part of the per-learner prompt: scenario prompts and the expert analysis.
+
+    Identical for every learner of a training version, so it goes in the
+    system prompt where the provider can cache it (see cacheable_content).
+    """
+    scenarios = {s["scenario"]: s for s in analysis["scenarios"]}
+    lines = ["Learning Objectives:"] + [f"- {name}" for name in analysis["objectives"]]
+    for situation in module["situations"]:
+        for scenario in situation["scenarios"]:
+            expert = scenarios.get(scenario["number"], {})
+            lines += [
+                "",
+                f"Scenario {scenario['number']} (Situation {situation['number']}):",
+                scenario["prompt"],
+                f"Expert panel responses: {response_distribution(scenario)}",
+                f"Expert key elements: {', '.join(expert.get('expert_key_elements', []))}",
+                f"Expert consensus: {expert.get('expert_consensus', '')}",
+                f"Applicable objectives: {'; '.join(expert.get('applicable_objectives', []))}",
+            ]
+    return "\n".join(lines)
+
+
+def learner_answers(module: Dict[str, Any]) -> str:
+    """The learner's responses of a parsed module, one line per scenario"""
+    lines = ["Learner's responses:"]
+    for situation in module["situations"]:
+        for scenario in situation["scenarios"]:
+            learner = scenario["learner"] or {}
+            lines.append(f"Scenario {scenario['number']}: {learner.get('response') or '(no response)'}"
+                         + (f" | Justification: {learner['justification']}" if learner.get("justification") else ""))
+    return "\n".join(lines)
+
+
+def merge_evaluation(module: Dict[str, Any], analysis: Dict[str, Any],
+                     learner: Dict[str, Any]) -> Dict[str, Any]:
+    """TrainingEvaluation dict from the expert analysis and the learner assessments.
+
+    Raises ValueError when the learner assessment misses a scenario.
+    """
+    descriptions = {s["situation"]: s["description"] for s in analysis["situations"]}
+    experts = {s["scenario"]: s for s in analysis["scenarios"]}
+    assessments = {s["scenario"]: s for s in learner["scenarios"]}
+    situations = {}
+    for situation in module["situations"]:
+        scenarios = {}
+        for scenario in situation["scenarios"]:
+            number = scenario["number"]
+            if number not in assessments:
+                raise ValueError(f"Learner evaluation is missing scenario {number}")
+            assessment = assessments[number]
+            expert = experts.get(number, {})
+            applicable = expert.get("applicable_objectives", [])
+            skills = {}
+            for objective in analysis["objectives"]:
+                skill = assessment["skills_assessment"].get(objective)
+                if skill is not None and objective in applicable:
+                    skills[objective] = skill
+                else:
+                    skills[objective] = {"present_in_scenario": False, "learner_assessment": None,
+                                         "justification": None}
+            scenarios[f"scenario {number}"] = {
+                "expert_key_elements": expert.get("expert_key_elements", []),
+                "coverage": assessment["coverage"],
+                "logical_reasoning": assessment["logical_reasoning"],
+                "communication": assessment["communication"],
+                "skills_assessment": skills,
+            }
+        situations[f"situation {situation['number']}"] = {
+            "description": descriptions.get(situation["number"], situation["description"].split("\n")[0]),
+            "scenarios": scenarios,
+        }
+    return {"situations": situations}
+
+
+def parse_module(training_content: str) -> Optional[Dict[str, Any]]:
+    """Parsed module, or None when the text has no tagged situations / expert responses"""
+    module = parse_training(training_content)
+    scenarios = [sc for s in module["situations"] for sc in s["scenarios"]]
+    if not scenarios or not all(sc["experts"] for sc in scenarios):
+        return None
+    return module
+
+
+def module_responses(module: Dict[str, Any]) -> Dict[int, Dict[str, str]]:
+    """{scenario number: {"response", "justification"}} of the learner answers of a parsed module"""
+    return {sc["number"]: dict(sc["learner"]) for s in module["situations"] for sc in s["scenarios"]
+            if sc["learner"]}
+
+
+def apply_responses(module: Dict[str, Any], responses: Dict[int, Dict[str, str]]) -> Dict[str, Any]:
+    """Copy of a parsed module with the learner's answers replaced by `responses`.
+
+    `responses` maps scenario numbers to {"response", "justification"};
+    scenarios without an answer are evaluated as unanswered. Raises
+    ValueError for scenario numbers the module does not have.
+    """
+    module = copy.deepcopy(module)
+    scenarios = {sc["number"]: sc for s in module["situations"] for sc in s["scenarios"]}
+    unknown = sorted(set(responses) - set(scenarios))
+    if unknown:
+        raise ValueError(f"Unknown scenarios {unknown}. Available: {sorted(scenarios)}")
+    for number, scenario in scenarios.items():
+        answer = responses.get(number)
+        scenario["learner"] = {"response": answer.get("response", ""),
+                               "justification": answer.get("justification", "")} if answer else None
+    return module
+
+
+def select_scenarios(module: Dict[str, Any], numbers: Collection[int]) -> Dict[str, Any]:
+    """Copy of a parsed module limited to some scenarios (situations left without any are dropped)"""
+    situations = []
+    for situation in module["situations"]:
+        scenarios = [sc for sc in situation["scenarios"] if sc["number"] in numbers]
+        if scenarios:
+            situations.append({**situation, "scenarios": scenarios})
+    return {**module, "situations": situations}
+
+
+def scenario_hashes(module: Dict[str, Any]) -> Dict[int, str]:
+    """Per scenario, a hash of what its evaluation depends on.
+
+    The learner's answer plus its expert context (situation, scenario
+    prompt, expert responses, objectives), the evaluator model and
+    ANALYSIS_VERSION: a scenario needs re-evaluating when its hash changes.
+    """
+    model = get_model_registry().spec("evaluator")["model"]
+    return {
+        scenario["number"]: data_hash([ANALYSIS_VERSION, model, module["objectives"], situation["number"],
+                                       situation["description"], scenario["prompt"], scenario["experts"],
+                                       scenario["learner"]])
+        for situation in module["situations"] for scenario in situation["scenarios"]
+    }
+
+
+_cache_instance: Optional[ExpertAnalysisCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_expert_analysis_cache() -> ExpertAnalysisCache:
+    """Process-wide expert analysis cache"""
+    global _cache_instance
+    with _cache_lock:
+        if _cache_instance is None:
+            _cache_instance = ExpertAnalysisCache()
+    return _cache_instance
@@ -0,0 +1,283 @@
+"""
+LLM Hedging
+
+HedgedRunnable sends a call to the primary model and, when a secondary
+model from another provider is configured (see backend.model_registry):
+
+- hedge: if the primary has not answered after its recent p<HEDGE_PERCENTILE>
+  latency, a duplicate request goes to the secondary and the first
+  successful answer wins
+- failover: if the primary fails with a retryable error (rate limit,
+  overload, 5xx, timeout, open circuit), the secondary is called at once
+
+Each branch goes through the circuit breaker / rate limiter of its own
+provider (backend.llm_retry), so invoke_with_retry does not guard these
+calls itself. The answering provider and route (primary / hedge / failover)
+are counted in sensai_llm_answers_total. A sync hedge that loses keeps
+running to completion; its tokens are recorded with outcome "abandoned".
+
+    HEDGE_PERCENTILE=95           latency percentile that triggers a hedge (0 = failover only)
+    HEDGE_MIN_SAMPLES=20          primary latencies needed before using the percentile
+    HEDGE_INITIAL_DELAY_SECONDS=15  hedge delay until then
+    HEDGE_MIN_DELAY_SECONDS=1     never hedge earlier than this
+"""
+
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Deque, Dict, List, Optional
+
+from langchain_core.runnables import Runnable, RunnableConfig
+from langchain_core.runnables.fallbacks import RunnableWithFallbacks
+
+from backend.llm_retry import LLMUnavailable, classify_error, get_provider_guard, _with_usage_callback
+
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_INITIAL_DELAY_SECONDS = float(os.getenv("HEDGE_INITIAL_DELAY_SECONDS", "15"))
+HEDGE_MIN_DELAY_SECONDS = float(os.getenv("HEDGE_MIN_DELAY_SECONDS", "1"))
+HEDGE_WINDOW = 200  # recent primary latencies kept per component
+HEDGE_POOL_WORKERS = 32
+
+COMPONENT_METADATA_KEY = "llm_component"
+
+
+# =============================================================================
+# Primary latency tracking
+# =============================================================================
+
+class LatencyTracker:
+    """Rolling window of primary latencies per component and model"""
+
+    def __init__(self, window: int = HEDGE_WINDOW):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, key: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(key, deque(maxlen=self.window)).append(seconds)
+
+    def hedge_delay(self, key: str) -> Optional[float]:
+        """Seconds to wait for the primary before hedging; None = never hedge"""
+        if HEDGE_PERCENTILE <= 0:
+            return None
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_INITIAL_DELAY_SECONDS
+        index = min(len(samples) - 1, int(len(samples) * HEDGE_PERCENTILE / 100))
+        return max(HEDGE_MIN_DELAY_SECONDS, samples[index])
+
+
+_tracker = LatencyTracker()
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=HEDGE_POOL_WORKERS, thread_name_prefix="llm-hedge")
+    return _pool
+
+
+def _should_fail_over(exc: BaseException) -> bool:
+    retryable, _ = classify_error(exc)
+    return retryable or isinstance(exc, LLMUnavailable) or getattr(exc, "status_code", None) == 404
+
+
+def _structured_output_kwargs(provider: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    # OpenAI's default json_schema mode rejects open-ended objects
+    # (Dict[str, ...] fields such as TrainingEvaluation.situations)
+    if provider == "openai" and "method" not in kwargs:
+        return {**kwargs, "method": "function_calling"}
+    return kwargs
+
+
+# =============================================================================
+# Hedged runnable
+# =============================================================================
+
+class HedgedRunnable(RunnableWithFallbacks):
+    """Primary runnable with a hedged / failover secondary on another provider.
+
+    Subclasses RunnableWithFallbacks so bind_tools, with_structured_output
+    and friends are applied to both branches.
+    """
+
+    component: str
+    providers: List[str]   # provider of the primary, then of the secondary
+    labels: List[str]      # "provider:model" of each branch, for logs
+    guards_providers: bool = True
+
+    def with_structured_output(self, schema, **kwargs) -> Runnable:
+        branches = [branch.with_structured_output(schema, **_structured_output_kwargs(provider, kwargs))
+                    for branch, provider in zip([self.runnable, *self.fallbacks], self.providers)]
+        return self.__class__(**{**self.model_dump(), "runnable": branches[0], "fallbacks": branches[1:]})
+
+    # ----- helpers -----
+
+    def _component(self, config: Optional[RunnableConfig]) -> str:
+        return ((config or {}).get("metadata") or {}).get(COMPONENT_METADATA_KEY) or self.component
+
+    def _tracker_key(self, component: str) -> str:
+        return f"{component}:{self.labels[0]}"
+
+    def _answered(self, component: str, index: int, route: str, started: float):
+        from backend.metrics import record_llm_answer
+        record_llm_answer(component, self.providers[index], route)
+        if route != "primary":
+            print(f"🔀 {component} answered by {self.labels[index]} ({route} after "
+                  f"{time.perf_counter() - started:.1f}s)")
+
+    # ----- sync -----
+
+    def _run_branch(self, index: int, input: Any, config: Optional[RunnableConfig], handler, **kwargs) -> Any:
+        guard = get_provider_guard(self.providers[index])
+        wait_s = guard.reserve()
+        branch = self.runnable if index == 0 else self.fallbacks[index - 1]
+        start = time.perf_counter()
+        try:
+            if wait_s:
+                time.sleep(wait_s)
+            result = branch.invoke(input, _with_usage_callback({"config": config}, handler)["config"], **kwargs)
+        except Exception as e:
+            guard.on_failure(*classify_error(e))
+            raise
+        except BaseException:
+            guard.release()
+            raise
+        guard.on_success()
+        if index == 0:
+            _tracker.observe(self._tracker_key(self._component(config)), time.perf_counter() - start)
+        return result
+
+    def _submit(self, index: int, input: Any, config: Optional[RunnableConfig], **kwargs):
+        from backend.metrics import make_usage_handler
+        handler = make_usage_handler()
+        started = time.perf_counter()
+        future = _get_pool().submit(contextvars.copy_context().run,
+                                    self._run_branch, index, input, config, handler, **kwargs)
+        future.branch = (index, handler, started)
+        return future
+
+    def _record_abandoned(self, component: str, future):
+        """Account for a losing branch that still completes (tokens are billed)"""
+        ctx = contextvars.copy_context()
+
+        def done(f):
+            if f.cancelled() or f.exception() is not None:
+                return
+            _, handler, started = f.branch
+            seconds = time.perf_counter() - started
+            from backend.metrics import record_llm_call
+            from backend.usage_ledger import get_usage_ledger
+            record_llm_call(component, handler.model, seconds, "abandoned", handler.usage)
+            ctx.run(get_usage_ledger().record, component, handler.model, handler.usage, seconds,
+                    outcome="abandoned")
+
+        future.add_done_callback(done)
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        component = self._component(config)
+        started = time.perf_counter()
+        primary = self._submit(0, input, config, **kwargs)
+        delay = _tracker.hedge_delay(self._tracker_key(component))
+        done, _ = wait([primary], timeout=delay)
+
+        if done:
+            try:
+                result = primary.result()
+            except Exception as e:
+                if not _should_fail_over(e) or not self.fallbacks:
+                    raise
+                print(f"⚠️  {component}: {self.labels[0]} failed ({e}), failing over to {self.labels[1]}")
+                result = self._submit(1, input, config, **kwargs).result()
+                self._answered(component, 1, "failover", started)
+                return result
+            self._answered(component, 0, "primary", started)
+            return result
+
+        # Slow primary: hedge with the secondary, first success wins
+        pending = {primary, self._submit(1, input, config, **kwargs)}
+        errors: List[BaseException] = []
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    errors.append(future.exception())
+                    continue
+                index = future.branch[0]
+                for loser in pending:
+                    self._record_abandoned(component, loser)
+                self._answered(component, index, "primary" if index == 0 else "hedge", started)
+                return future.result()
+        raise errors[0]
+
+    # ----- async -----
+
+    async def _arun_branch(self, index: int, input: Any, config: Optional[RunnableConfig], **kwargs) -> Any:
+        guard = get_provider_guard(self.providers[index])
+        wait_s = guard.reserve()
+        branch = self.runnable if index == 0 else self.fallbacks[index - 1]
+        start = time.perf_counter()
+        try:
+            if wait_s:
+                await asyncio.sleep(wait_s)
+            result = await branch.ainvoke(input, config, **kwargs)
+        except Exception as e:
+            guard.on_failure(*classify_error(e))
+            raise
+        except BaseException:
+            # The losing branch is cancelled: hand back its slot (and the half-open probe, if it held it)
+            guard.release()
+            raise
+        guard.on_success()
+        if index == 0:
+            _tracker.observe(self._tracker_key(self._component(config)), time.perf_counter() - start)
+        return result
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        component = self._component(config)
+        started = time.perf_counter()
+        tasks = {asyncio.ensure_future(self._arun_branch(0, input, config, **kwargs)): 0}
+        delay = _tracker.hedge_delay(self._tracker_key(component))
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+
+        if done:
+            primary = next(iter(done))
+            try:
+                result = primary.result()
+            except Exception as e:
+                if not _should_fail_over(e) or not self.fallbacks:
+                    raise
+                print(f"⚠️  {component}: {self.labels[0]} failed ({e}), failing over to {self.labels[1]}")
+                result = await self._arun_branch(1, input, config, **kwargs)
+                self._answered(component, 1, "failover", started)
+                return result
+            self._answered(component, 0, "primary", started)
+            return result
+
+        tasks[asyncio.ensure_future(self._arun_branch(1, input, config, **kwargs))] = 1
+        pending = set(tasks)
+        errors: List[BaseException] = []
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        errors.append(task.exception())
+                        continue
+                    index = tasks[task]
+                    self._answered(component, index, "primary" if index == 0 else "hedge", started)
+                    return task.result()
+            raise errors[0]
+        finally:
+            for task in pending:
+                task.cancel()
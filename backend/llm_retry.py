@@ -1,27 +1,398 @@
+"""
+LLM Retry
+
+invoke_with_retry / ainvoke_with_retry wrap every LLM call with:
+
+- Error classification: only rate limits, overload, 5xx, timeouts and
+  connection errors are retried; anything else (bad request, validation or
+  parsing errors) is raised at once
+- Full-jitter backoff, or the server's Retry-After when it sends one
+- A process-wide guard per provider, shared by all requests:
+  - circuit breaker: after retryable failures of CIRCUIT_FAILURE_THRESHOLD
+    distinct calls in a row (the attempts of one call count once), calls
+    fail fast with CircuitOpenError for
+    CIRCUIT_COOLDOWN_SECONDS, then a single probe call decides whether to
+    close it again
+  - token bucket (<PROVIDER>_REQUESTS_PER_MINUTE, 0 = unlimited): calls
+    queue for a slot, and a 429 with Retry-After pauses every caller until
+    it expires. A call that would wait longer than LLM_MAX_QUEUE_SECONDS
+    raises RateLimitQueueFull instead.
+"""
+
+import asyncio
+import contextvars
+import itertools
+import os
+import random
+import threading
 import time
-from typing import Any, Callable
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
 
 MAX_RETRY = 5
-BASE_DELAY = 1.0  # seconds; delays between attempts: 1, 2, 4, 8
+BASE_DELAY = 1.0  # seconds; backoff caps between attempts: 1, 2, 4, 8
+MAX_DELAY = 30.0
+DEFAULT_PROVIDER = "anthropic"
+
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_COOLDOWN_SECONDS = float(os.getenv("CIRCUIT_COOLDOWN_SECONDS", "30"))
+LLM_MAX_QUEUE_SECONDS = float(os.getenv("LLM_MAX_QUEUE_SECONDS", "60"))
+
+# Id of the logical call (all its attempts) the current LLM request belongs to
+_call_ids = itertools.count(1)
+_current_call: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("llm_call", default=None)
+
+# 529 = Anthropic "overloaded"
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+RETRYABLE_NAME_PARTS = ("Timeout", "Connection", "Overloaded")
+
+
+class LLMUnavailable(Exception):
+    """The provider is not accepting calls right now"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(LLMUnavailable):
+    pass
+
+
+class RateLimitQueueFull(LLMUnavailable):
+    pass
+
+
+# =============================================================================
+# Error classification
+# =============================================================================
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    for obj in (exc, getattr(exc, "response", None)):
+        code = getattr(obj, "status_code", None)
+        if isinstance(code, int):
+            return code
+    return None
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    """Seconds from the retry-after-ms / retry-after response header, if any"""
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return max(0.0, float(headers["retry-after-ms"]) / 1000)
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_error(exc: BaseException) -> Tuple[bool, Optional[float]]:
+    """(retryable, retry_after seconds) for an exception raised by an LLM call"""
+    if isinstance(exc, LLMUnavailable):
+        return False, exc.retry_after
+    status = _status_code(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS, _retry_after(exc)
+    if isinstance(exc, (TimeoutError, ConnectionError, asyncio.TimeoutError)):
+        return True, None
+    name = type(exc).__name__
+    return any(part in name for part in RETRYABLE_NAME_PARTS), None
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Full jitter, so concurrent callers that failed together don't retry together"""
+    if retry_after is not None:
+        return retry_after + random.uniform(0, BASE_DELAY)
+    return random.uniform(0, min(MAX_DELAY, BASE_DELAY * (2 ** attempt)))
+
+
+# =============================================================================
+# Provider guard: circuit breaker + token bucket
+# =============================================================================
+
+class ProviderGuard:
+    """Circuit breaker and request rate limiter shared by all calls to a provider"""
+
+    def __init__(self, provider: str, requests_per_minute: float = 0,
+                 failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 cooldown_seconds: float = CIRCUIT_COOLDOWN_SECONDS,
+                 max_queue_seconds: float = LLM_MAX_QUEUE_SECONDS):
+        self.provider = provider
+        self.rate = requests_per_minute / 60.0  # slots per second; 0 = unlimited
+        self.capacity = max(1.0, self.rate * 10)  # ~10 s of burst
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.max_queue_seconds = max_queue_seconds
+        self._lock = threading.Lock()
+        self._tokens = self.capacity
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self.state = "closed"  # closed | open | half_open
+        self._failed_calls: Set[int] = set()  # ids of the calls that failed since the last success
+        self._open_until = 0.0
+        self._probe_in_flight = False
+
+    def reserve(self) -> float:
+        """Claim a call slot and return how long to wait before calling.
+
+        Raises CircuitOpenError or RateLimitQueueFull to fail fast.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self.state == "open":
+                if now < self._open_until:
+                    raise CircuitOpenError(f"{self.provider} circuit is open",
+                                           retry_after=self._open_until - now)
+                self.state = "half_open"
+            if self.state == "half_open":
+                if self._probe_in_flight:
+                    raise CircuitOpenError(f"{self.provider} circuit is half-open",
+                                           retry_after=self.cooldown_seconds)
+                self._probe_in_flight = True
+
+            wait = max(0.0, self._paused_until - now)
+            if self.rate:
+                self._tokens = min(self.capacity, self._tokens + (now - self._refilled_at) * self.rate)
+                self._refilled_at = now
+                # Reserve now, possibly going negative: the debt is the queue ahead of this call
+                self._tokens -= 1
+                if self._tokens < 0:
+                    wait = max(wait, -self._tokens / self.rate)
+            if wait > self.max_queue_seconds:
+                if self.rate:
+                    self._tokens += 1
+                if self.state == "half_open":
+                    self._probe_in_flight = False
+                raise RateLimitQueueFull(f"{self.provider} request queue is full", retry_after=wait)
+            return wait
 
+    def release(self):
+        """Give back a reserved slot whose call was abandoned (e.g. cancelled) without an outcome"""
+        with self._lock:
+            if self.rate:
+                self._tokens = min(self.capacity, self._tokens + 1)
+            if self.state == "half_open":
+                self._probe_in_flight = False
 
-def invoke_with_retry(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    def on_success(self):
+        with self._lock:
+            self.state = "closed"
+            self._failed_calls.clear()
+            self._probe_in_flight = False
+
+    def on_failure(self, retryable: bool, retry_after: Optional[float] = None):
+        """Record a failed attempt; retries of one invoke_with_retry call count as one failure"""
+        call = _current_call.get() or next(_call_ids)
+        with self._lock:
+            now = time.monotonic()
+            was_probe = self._probe_in_flight
+            self._probe_in_flight = False
+            if not retryable:
+                # The provider answered; the request itself was bad
+                self.state = "closed"
+                self._failed_calls.clear()
+                return
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + retry_after)
+            self._failed_calls.add(call)
+            if was_probe or len(self._failed_calls) >= self.failure_threshold:
+                self.state = "open"
+                self._open_until = now + max(self.cooldown_seconds, retry_after or 0)
+                print(f"🔌 {self.provider} circuit open for {self._open_until - now:.0f}s "
+                      f"after {len(self._failed_calls)} failed calls")
+                self._failed_calls.clear()
+
+
+_guards: Dict[str, ProviderGuard] = {}
+_guards_lock = threading.Lock()
+
+
+def get_provider_guard(provider: str = DEFAULT_PROVIDER) -> ProviderGuard:
+    """Process-wide guard of a provider, configured from the environment"""
+    with _guards_lock:
+        if provider not in _guards:
+            rpm = float(os.getenv(f"{provider.upper()}_REQUESTS_PER_MINUTE", "0"))
+            _guards[provider] = ProviderGuard(provider, requests_per_minute=rpm)
+        return _guards[provider]
+
+
+# =============================================================================
+# Call recording (metrics + usage ledger)
+# =============================================================================
+
+def _with_usage_callback(kwargs: dict, handler) -> dict:
+    """Add the usage handler to the runnable config passed to fn"""
+    config = dict(kwargs.get("config") or {})
+    callbacks = config.get("callbacks")
+    if callbacks is None:
+        config["callbacks"] = [handler]
+    elif isinstance(callbacks, list):
+        config["callbacks"] = callbacks + [handler]
+    else:  # a CallbackManager
+        callbacks = callbacks.copy()
+        callbacks.add_handler(handler, inherit=True)
+        config["callbacks"] = callbacks
+    return {**kwargs, "config": config}
+
+
+class _CallRecorder:
+    """Metrics and ledger bookkeeping of one call (all its attempts)"""
+
+    def __init__(self, component: Optional[str], provider: str):
+        self.component = component
+        self.provider = provider
+        self.timer = self.handler = self.ledger = None
+        if component:
+            from backend.metrics import LLMCallTimer, make_usage_handler
+            from backend.usage_ledger import get_usage_ledger
+            self.ledger = get_usage_ledger()
+            self.timer = LLMCallTimer(component)
+            self.handler = make_usage_handler()
+
+    def prepare(self, kwargs: dict) -> dict:
+        if not self.handler:
+            return kwargs
+        kwargs = _with_usage_callback(kwargs, self.handler)
+        # Lets runnables that record their own calls (backend.llm_hedging) attribute them
+        kwargs["config"]["metadata"] = {**(kwargs["config"].get("metadata") or {}), "llm_component": self.component}
+        return kwargs
+
+    def success(self, result):
+        if self.timer is not None:
+            model, usage, seconds = self.timer.finish_with(result, self.handler)
+            self.ledger.record(self.component, model, usage, seconds)
+
+    def retry(self, attempt: int, error: BaseException, delay: float):
+        print(
+            f"⚠️  LLM call failed (attempt {attempt + 1}/{MAX_RETRY}): {error}. "
+            f"Retrying in {delay:.1f}s..."
+        )
+        if self.component:
+            from backend.metrics import record_llm_retry
+            record_llm_retry(self.component)
+
+    def failure(self, error: BaseException, attempted: bool = True):
+        if isinstance(error, LLMUnavailable):
+            from backend.metrics import record_llm_rejected
+            record_llm_rejected(self.provider, type(error).__name__)
+        if self.timer is not None and attempted:
+            seconds = self.timer.finish(self.handler.model, self.handler.usage, outcome="error")
+            self.ledger.record(self.component, self.handler.model, self.handler.usage, seconds, outcome="error")
+
+
+def _after_failure(guard: Optional[ProviderGuard], recorder: _CallRecorder, attempt: int,
+                   error: Exception) -> float:
+    """Update the guard; return the delay before the next attempt, or re-raise"""
+    retryable, retry_after = classify_error(error)
+    if guard is not None:
+        guard.on_failure(retryable, retry_after)
+    if not retryable or attempt == MAX_RETRY - 1:
+        recorder.failure(error)
+        raise error
+    delay = backoff_delay(attempt, retry_after)
+    recorder.retry(attempt, error, delay)
+    return delay
+
+
+def _guard_for(fn: Callable[..., Any], provider: str) -> Optional[ProviderGuard]:
+    """Provider guard of a call, or None when the runnable guards each
+    provider it calls itself (hedged / failover runnables)"""
+    if getattr(getattr(fn, "__self__", None), "guards_providers", False):
+        return None
+    return get_provider_guard(provider)
+
+
+def _reserve(guard: Optional[ProviderGuard], recorder: _CallRecorder, attempt: int) -> float:
+    if guard is None:
+        return 0.0
+    try:
+        return guard.reserve()
+    except LLMUnavailable as e:
+        # Only a call that already failed against the provider counts as an LLM error
+        recorder.failure(e, attempted=attempt > 0)
+        raise
+
+
+# =============================================================================
+# Entry points
+# =============================================================================
+
+def invoke_with_retry(fn: Callable[..., Any], *args, component: Optional[str] = None,
+                      provider: str = DEFAULT_PROVIDER, **kwargs) -> Any:
     """Call an LLM invocable (e.g. llm.invoke, structured_llm.invoke) with
-    up to MAX_RETRY attempts and exponential backoff between retries.
-    Re-raises the last exception if all attempts fail.
+    up to MAX_RETRY attempts on retryable errors, under the provider's
+    circuit breaker and rate limiter. Non-retryable errors are raised at
+    once, retryable ones after the last attempt; LLMUnavailable when the
+    provider is shedding load.
+
+    With `component` set (e.g. "supervisor"), the call's latency, outcome
+    and token usage are recorded in backend.metrics and in the usage ledger
+    (attributed to the current usage_scope session) under that component.
     """
-    last_exc: BaseException | None = None
-    for attempt in range(MAX_RETRY):
-        try:
-            return fn(*args, **kwargs)
-        except Exception as e:
-            last_exc = e
-            if attempt < MAX_RETRY - 1:
-                delay = BASE_DELAY * (2 ** attempt)
-                print(
-                    f"⚠️  LLM call failed (attempt {attempt + 1}/{MAX_RETRY}): {e}. "
-                    f"Retrying in {delay}s..."
-                )
-                time.sleep(delay)
-    assert last_exc is not None
-    raise last_exc
+    guard = _guard_for(fn, provider)
+    recorder = _CallRecorder(component, provider)
+    kwargs = recorder.prepare(kwargs)
+
+    token = _current_call.set(next(_call_ids))
+    try:
+        for attempt in range(MAX_RETRY):
+            wait = _reserve(guard, recorder, attempt)
+            try:
+                if wait:
+                    time.sleep(wait)
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                time.sleep(_after_failure(guard, recorder, attempt, e))
+                continue
+            except BaseException:
+                # Cancelled with no outcome: a held probe would keep the circuit half-open forever
+                if guard is not None:
+                    guard.release()
+                raise
+            if guard is not None:
+                guard.on_success()
+            recorder.success(result)
+            return result
+    finally:
+        _current_call.reset(token)
+
+
+async def ainvoke_with_retry(fn: Callable[..., Awaitable[Any]], *args, component: Optional[str] = None,
+                             provider: str = DEFAULT_PROVIDER, **kwargs) -> Any:
+    """invoke_with_retry for coroutine invocables (e.g. llm.ainvoke); waits
+    with asyncio.sleep so queued calls don't block the event loop"""
+    guard = _guard_for(fn, provider)
+    recorder = _CallRecorder(component, provider)
+    kwargs = recorder.prepare(kwargs)
+
+    token = _current_call.set(next(_call_ids))
+    try:
+        for attempt in range(MAX_RETRY):
+            wait = _reserve(guard, recorder, attempt)
+            try:
+                if wait:
+                    await asyncio.sleep(wait)
+                result = await fn(*args, **kwargs)
+            except Exception as e:
+                await asyncio.sleep(_after_failure(guard, recorder, attempt, e))
+                continue
+            except BaseException:
+                # Cancelled with no outcome: a held probe would keep the circuit half-open forever
+                if guard is not None:
+                    guard.release()
+                raise
+            if guard is not None:
+                guard.on_success()
+            recorder.success(result)
+            return result
+    finally:
+        _current_call.reset(token)
@@ -0,0 +1,325 @@
+"""
+Metrics
+
+A small in-process registry rendered in the Prometheus text format at
+/metrics (no prometheus_client dependency).
+
+Recorded:
+- HTTP requests per route: count by status, latency histogram
+- LLM calls per component (evaluator, supervisor, chat, ranking, rewrite,
+  table, codegen): count by outcome, latency, retries, and input / output /
+  cache_read / cache_creation tokens
+- RAG searches: attempts histogram and found_relevant counts
+- Cache lookups (visualization code / results): hits and misses
+- Gauges evaluated at scrape time: active sessions, chat agents, in-flight
+  code generations
+"""
+
+import math
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+LLM_LATENCY_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120, 240)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in items
+        ]
+
+
+class Gauge(_Metric):
+    """Gauge whose samples come from a callback at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], float]):
+        super().__init__(name, documentation)
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        try:
+            value = float(self.callback())
+        except Exception:
+            return []
+        return self.header() + [f"{self.name} {_format_value(value)}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series: Dict[LabelValues, List[float]] = {}  # bucket counts..., sum, count
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        lines = self.header()
+        for key, series in items:
+            for i, bound in enumerate(self.buckets):
+                labels = _format_labels(self.labelnames + ("le",), key + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {_format_value(series[i])}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{labels} {_format_value(series[-1])}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "sensai_http_requests_total", "HTTP requests by route, method and status.",
+    ("route", "method", "status")))
+HTTP_LATENCY = REGISTRY.register(Histogram(
+    "sensai_http_request_duration_seconds", "HTTP request latency by route.",
+    ("route", "method")))
+
+LLM_CALLS = REGISTRY.register(Counter(
+    "sensai_llm_calls_total", "LLM calls by component, model and outcome (success/error).",
+    ("component", "model", "outcome")))
+LLM_LATENCY = REGISTRY.register(Histogram(
+    "sensai_llm_call_duration_seconds", "LLM call latency including retries, by component.",
+    ("component", "model"), buckets=LLM_LATENCY_BUCKETS))
+LLM_RETRIES = REGISTRY.register(Counter(
+    "sensai_llm_retries_total", "Failed LLM attempts that were retried, by component.",
+    ("component",)))
+LLM_REJECTED = REGISTRY.register(Counter(
+    "sensai_llm_rejected_total", "LLM calls refused before reaching the provider, by reason.",
+    ("provider", "reason")))
+LLM_ANSWERS = REGISTRY.register(Counter(
+    "sensai_llm_answers_total", "Answers of hedged LLM calls by component, provider and route "
+    "(primary/hedge/failover).",
+    ("component", "provider", "route")))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "sensai_llm_tokens_total", "LLM tokens by component, model and type (input/output/cache_read/cache_creation).",
+    ("component", "model", "type")))
+
+RAG_SEARCHES = REGISTRY.register(Counter(
+    "sensai_rag_searches_total", "Knowledge base searches by training type and outcome.",
+    ("training_type", "found_relevant")))
+RAG_ATTEMPTS = REGISTRY.register(Histogram(
+    "sensai_rag_search_attempts", "Retrieve/rank attempts per knowledge base search.",
+    (), buckets=(1, 2, 3, 4, 5)))
+
+CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "sensai_cache_lookups_total", "Cache lookups by cache and result (hit/miss).",
+    ("cache", "result")))
+
+
+def register_gauge(name: str, documentation: str, callback: Callable[[], float]):
+    """Expose a value computed at scrape time"""
+    REGISTRY.register(Gauge(name, documentation, callback))
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
+
+
+# =============================================================================
+# Recording helpers
+# =============================================================================
+
+def record_http_request(route: str, method: str, status: int, seconds: float):
+    HTTP_REQUESTS.inc(route=route, method=method, status=str(status))
+    HTTP_LATENCY.observe(seconds, route=route, method=method)
+
+
+def record_cache_lookup(cache: str, hit: bool):
+    CACHE_LOOKUPS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def record_rag_search(training_type: str, found_relevant: bool, attempts: int):
+    RAG_SEARCHES.inc(training_type=training_type, found_relevant=str(bool(found_relevant)).lower())
+    RAG_ATTEMPTS.observe(attempts)
+
+
+def record_llm_call(component: str, model: str, seconds: float, outcome: str = "success",
+                    usage: Optional[Dict[str, int]] = None):
+    """Record one logical LLM call (all retries included) and its token usage"""
+    model = model or "unknown"
+    LLM_CALLS.inc(component=component, model=model, outcome=outcome)
+    LLM_LATENCY.observe(seconds, component=component, model=model)
+    for token_type, count in (usage or {}).items():
+        if count:
+            LLM_TOKENS.inc(count, component=component, model=model, type=token_type)
+
+
+def record_llm_retry(component: str):
+    LLM_RETRIES.inc(component=component)
+
+
+def record_llm_rejected(provider: str, reason: str):
+    LLM_REJECTED.inc(provider=provider, reason=reason)
+
+
+def record_llm_answer(component: str, provider: str, route: str):
+    LLM_ANSWERS.inc(component=component, provider=provider, route=route)
+
+
+def usage_from_metadata(usage_metadata: Optional[Dict]) -> Dict[str, int]:
+    """Normalize LangChain usage_metadata to input/output/cache_read/cache_creation"""
+    if not usage_metadata:
+        return {}
+    details = usage_metadata.get("input_token_details") or {}
+    return {
+        "input": int(usage_metadata.get("input_tokens") or 0),
+        "output": int(usage_metadata.get("output_tokens") or 0),
+        "cache_read": int(details.get("cache_read") or 0),
+        "cache_creation": int(details.get("cache_creation") or 0),
+    }
+
+
+def _merge_usage(total: Dict[str, int], usage: Dict[str, int]):
+    for key, value in usage.items():
+        total[key] = total.get(key, 0) + value
+
+
+_usage_handler_class = None
+
+
+def make_usage_handler():
+    """LangChain callback handler collecting model name and token usage.
+
+    Works for structured-output runnables too, whose return value carries
+    no usage_metadata. Built lazily so importing this module stays cheap.
+    """
+    global _usage_handler_class
+    if _usage_handler_class is None:
+        from langchain_core.callbacks import BaseCallbackHandler
+
+        class UsageCallbackHandler(BaseCallbackHandler):
+            def __init__(self):
+                self.usage: Dict[str, int] = {}
+                self.model = ""
+
+            def on_llm_end(self, response, **kwargs):
+                for generations in response.generations or []:
+                    for generation in generations:
+                        message = getattr(generation, "message", None)
+                        if message is None:
+                            continue
+                        _merge_usage(self.usage, usage_from_metadata(getattr(message, "usage_metadata", None)))
+                        metadata = getattr(message, "response_metadata", None) or {}
+                        self.model = metadata.get("model_name") or metadata.get("model") or self.model
+
+        _usage_handler_class = UsageCallbackHandler
+    return _usage_handler_class()
+
+
+class LLMCallTimer:
+    """Times one logical LLM call; used by invoke_with_retry"""
+
+    def __init__(self, component: str):
+        self.component = component
+        self.start = time.perf_counter()
+
+    def finish(self, model: str, usage: Dict[str, int], outcome: str = "success") -> float:
+        """Record the call; returns its duration in seconds"""
+        seconds = time.perf_counter() - self.start
+        record_llm_call(self.component, model, seconds, outcome, usage)
+        return seconds
+
+    def finish_with(self, result, handler) -> Tuple[str, Dict[str, int], float]:
+        """Record a success, preferring callback usage over the result's own metadata.
+
+        Returns (model, usage, seconds).
+        """
+        usage, model = handler.usage, handler.model
+        if not usage:
+            usage = usage_from_metadata(getattr(result, "usage_metadata", None))
+        if not model:
+            metadata = getattr(result, "response_metadata", None) or {}
+            model = metadata.get("model_name") or metadata.get("model") or ""
+        return model, usage, self.finish(model, usage)
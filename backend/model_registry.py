@@ -0,0 +1,181 @@
+"""
+Model Registry
+
+One place for the model, temperature and max_tokens of every LLM component,
+plus a fallback chain tried when a model is unavailable (rate limited,
+overloaded, 5xx, retired), and an optional secondary model on another
+provider for hedged requests and failover (see backend.llm_hedging).
+
+Model ids may carry a provider prefix: "openai:gpt-4.1-mini",
+"google:gemini-2.5-flash"; no prefix means Anthropic.
+
+The yes/no ranking judge, the query rewriter and the tool-routing
+supervisor are short classification / rewriting calls and run on
+SMALL_MODEL by default (falling back to LARGE_MODEL); the chat answer, the
+evaluator and the performance table keep LARGE_MODEL.
+
+Environment overrides, per component (COMPONENT = EVALUATOR, TABLE, CHAT,
+SUPERVISOR, RANKING, REWRITE):
+    LARGE_MODEL / SMALL_MODEL          defaults of the two tiers
+    LARGE_SECONDARY_MODEL /            secondary of each tier on another provider
+    SMALL_SECONDARY_MODEL              (default: none, no hedging)
+    MODEL_<COMPONENT>                  model id
+    MODEL_<COMPONENT>_TEMPERATURE
+    MODEL_<COMPONENT>_MAX_TOKENS
+    MODEL_<COMPONENT>_FALLBACKS        comma-separated model ids ("" = none)
+    MODEL_<COMPONENT>_SECONDARY        model id on another provider ("" = none)
+"""
+
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from langchain_anthropic import ChatAnthropic
+from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_openai import ChatOpenAI
+
+LARGE_MODEL = os.getenv("LARGE_MODEL", "claude-sonnet-4-6")
+SMALL_MODEL = os.getenv("SMALL_MODEL", "claude-haiku-4-5")
+LARGE_SECONDARY_MODEL = os.getenv("LARGE_SECONDARY_MODEL", "")
+SMALL_SECONDARY_MODEL = os.getenv("SMALL_SECONDARY_MODEL", "")
+
+PROVIDERS = ("anthropic", "openai", "google")
+
+# component -> {"model", "temperature", "max_tokens", "fallbacks", "secondary"}
+DEFAULT_SPECS: Dict[str, Dict[str, Any]] = {
+    "evaluator": {"model": LARGE_MODEL, "temperature": 0.3, "secondary": LARGE_SECONDARY_MODEL},
+    "table": {"model": LARGE_MODEL, "temperature": 0, "secondary": LARGE_SECONDARY_MODEL},
+    "chat": {"model": LARGE_MODEL, "temperature": 0.5, "secondary": LARGE_SECONDARY_MODEL},
+    # Lower temperature for more consistent tool decisions
+    "supervisor": {"model": SMALL_MODEL, "temperature": 0.3, "max_tokens": 1024, "fallbacks": [LARGE_MODEL],
+                   "secondary": SMALL_SECONDARY_MODEL},
+    "ranking": {"model": SMALL_MODEL, "temperature": 0.1, "max_tokens": 256, "fallbacks": [LARGE_MODEL],
+                "secondary": SMALL_SECONDARY_MODEL},
+    "rewrite": {"model": SMALL_MODEL, "temperature": 0.3, "max_tokens": 512, "fallbacks": [LARGE_MODEL],
+                "secondary": SMALL_SECONDARY_MODEL},
+}
+
+
+def split_model_id(model_id: str) -> Tuple[str, str]:
+    """("openai", "gpt-4.1-mini") for "openai:gpt-4.1-mini"; Anthropic by default"""
+    provider, sep, model = model_id.partition(":")
+    if not sep:
+        return "anthropic", model_id
+    if provider not in PROVIDERS:
+        raise ValueError(f"Unknown LLM provider '{provider}'. Available: {', '.join(PROVIDERS)}")
+    return provider, model
+
+
+def _env_spec(component: str, spec: Dict[str, Any]) -> Dict[str, Any]:
+    """Apply the MODEL_<COMPONENT>* environment overrides to a spec"""
+    prefix = f"MODEL_{component.upper()}"
+    spec = {"max_tokens": None, "fallbacks": [], "secondary": "", **spec}
+    if os.getenv(prefix):
+        spec["model"] = os.environ[prefix]
+    if os.getenv(f"{prefix}_TEMPERATURE"):
+        spec["temperature"] = float(os.environ[f"{prefix}_TEMPERATURE"])
+    if os.getenv(f"{prefix}_MAX_TOKENS"):
+        spec["max_tokens"] = int(os.environ[f"{prefix}_MAX_TOKENS"])
+    if f"{prefix}_FALLBACKS" in os.environ:
+        spec["fallbacks"] = [m.strip() for m in os.environ[f"{prefix}_FALLBACKS"].split(",") if m.strip()]
+    if f"{prefix}_SECONDARY" in os.environ:
+        spec["secondary"] = os.environ[f"{prefix}_SECONDARY"].strip()
+    spec["fallbacks"] = [m for m in spec["fallbacks"] if m != spec["model"]]
+    return spec
+
+
+def _fallback_errors() -> tuple:
+    """Errors after which the next model of the chain is tried"""
+    import anthropic
+    return (
+        anthropic.RateLimitError,
+        anthropic.InternalServerError,  # includes 529 overloaded
+        anthropic.APIConnectionError,   # includes timeouts
+        anthropic.NotFoundError,        # retired or unknown model id
+    )
+
+
+class ModelRegistry:
+    def __init__(self, specs: Optional[Dict[str, Dict[str, Any]]] = None):
+        specs = DEFAULT_SPECS if specs is None else specs
+        self.specs = {component: _env_spec(component, spec) for component, spec in specs.items()}
+
+    def spec(self, component: str) -> Dict[str, Any]:
+        if component not in self.specs:
+            raise KeyError(f"Unknown LLM component '{component}'. Available: {', '.join(self.specs)}")
+        return dict(self.specs[component])
+
+    def _build(self, model_id: str, spec: Dict[str, Any]):
+        provider, model = split_model_id(model_id)
+        kwargs: Dict[str, Any] = {"model": model, "temperature": spec["temperature"]}
+        if provider == "openai":
+            if spec.get("max_tokens"):
+                kwargs["max_tokens"] = spec["max_tokens"]
+            return ChatOpenAI(**kwargs, openai_api_key=os.getenv("OPENAI_API_KEY"))
+        if provider == "google":
+            if spec.get("max_tokens"):
+                kwargs["max_output_tokens"] = spec["max_tokens"]
+            return ChatGoogleGenerativeAI(**kwargs, google_api_key=os.getenv("GOOGLE_API_KEY"))
+        if spec.get("max_tokens"):
+            kwargs["max_tokens"] = spec["max_tokens"]
+        return ChatAnthropic(**kwargs, anthropic_api_key=os.getenv("ANTHROPIC_API_KEY"))
+
+    def chat_model(self, component: str):
+        """Chat model of a component, wrapped with its fallback chain and,
+        if configured, hedged with its secondary model.
+
+        Both follow bind_tools / with_structured_output, so callers use the
+        result like a plain ChatAnthropic.
+        """
+        spec = self.spec(component)
+        llm = self._build(spec["model"], spec)
+        if spec["fallbacks"]:
+            fallbacks = [self._build(model, spec) for model in spec["fallbacks"]]
+            llm = llm.with_fallbacks(fallbacks, exceptions_to_handle=_fallback_errors())
+        if not spec["secondary"]:
+            return llm
+        from backend.llm_hedging import HedgedRunnable
+        return HedgedRunnable(
+            runnable=llm,
+            fallbacks=[self._build(spec["secondary"], spec)],
+            component=component,
+            providers=[split_model_id(spec["model"])[0], split_model_id(spec["secondary"])[0]],
+            labels=[spec["model"], spec["secondary"]],
+        )
+
+    def describe(self) -> Dict[str, Dict[str, Any]]:
+        return {component: self.spec(component) for component in self.specs}
+
+
+_registry_instance: Optional[ModelRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    """Process-wide model registry"""
+    global _registry_instance
+    with _registry_lock:
+        if _registry_instance is None:
+            _registry_instance = ModelRegistry()
+    return _registry_instance
+
+
+def get_chat_model(component: str):
+    """Shortcut for get_model_registry().chat_model(component)"""
+    return get_model_registry().chat_model(component)
+
+
+def cacheable_content(component: str, text: str) -> Union[str, List[Dict[str, Any]]]:
+    """Message content marking `text` as an Anthropic prompt-cache prefix.
+
+    Calls sharing the prefix (system prompt up to and including this block)
+    within the cache lifetime read it at a tenth of the input price. Plain
+    text when a model of the component's chain is on another provider,
+    which would reject the cache_control field.
+    """
+    spec = get_model_registry().spec(component)
+    models = [spec["model"], *spec["fallbacks"]] + ([spec["secondary"]] if spec["secondary"] else [])
+    if any(split_model_id(model)[0] != "anthropic" for model in models):
+        return text
+    return [{"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}]
+
@@ -23,12 +23,16 @@ from pathlib import Path
 
 from pydantic import BaseModel, Field
 from langchain_openai import OpenAIEmbeddings
-from langchain_anthropic import ChatAnthropic
 from langchain_core.messages import SystemMessage, HumanMessage
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 
 from .llm_retry import invoke_with_retry
+from .model_registry import get_chat_model
+from .timing import span
+from .metrics import record_rag_search
+from .usage_ledger import budget_degraded
+from .training_catalog import get_training
 
 
 # =============================================================================
@@ -56,12 +60,6 @@ class RewrittenQuery(BaseModel):
 ROOT_DIR = Path(__file__).parent.parent
 CHROMA_PERSIST_DIR = ROOT_DIR / ".chroma_db"
 
-# Mapping of training types to document folders
-TRAINING_DOCS_MAP = {
-    "migraine": ROOT_DIR / "Docs_migraine",
-    "nursing_1st": ROOT_DIR / "Docs_nursing",
-    "nursing_2nd": ROOT_DIR / "Docs_nursing",
-}
 
 
 class AgenticRAGModule:
@@ -69,34 +67,25 @@ class AgenticRAGModule:
     Agentic RAG module with ranking and query rewriting capabilities.
 
     Supports multiple document folders with separate ChromaDB collections
-    per training type. Each training type indexes from its own docs folder.
+    per training type. Each training type indexes from the docs folder and
+    into the collection given by the training catalog (training types with
+    the same documents share a collection).
     """
 
     def __init__(self, training_type: str = "migraine"):
         self.training_type = training_type
-        self.docs_path = TRAINING_DOCS_MAP.get(training_type, TRAINING_DOCS_MAP["migraine"])
-        self.collection_name = f"knowledge_base_{training_type}"
-        # For nursing types, they share the same docs, so share the collection
-        if training_type in ("nursing_1st", "nursing_2nd"):
-            self.collection_name = "knowledge_base_nursing"
+        training = get_training(training_type)
+        self.docs_path = training.docs_path or get_training("migraine").docs_path
+        self.collection_name = training.collection
 
         self.embeddings = OpenAIEmbeddings(
             model="text-embedding-3-small",
             openai_api_key=os.getenv("OPENAI_API_KEY")
         )
 
-        # Initialize base LLMs
-        base_ranking_llm = ChatAnthropic(
-            model="claude-sonnet-4-6",
-            temperature=0.1,
-            anthropic_api_key=os.getenv("ANTHROPIC_API_KEY")
-        )
-
-        base_rewrite_llm = ChatAnthropic(
-            model="claude-sonnet-4-6",
-            temperature=0.3,
-            anthropic_api_key=os.getenv("ANTHROPIC_API_KEY")
-        )
+        # Initialize base LLMs (small fast model by default, see backend.model_registry)
+        base_ranking_llm = get_chat_model("ranking")
+        base_rewrite_llm = get_chat_model("rewrite")
 
         # Create structured output LLMs with Pydantic models
         self.ranking_llm = base_ranking_llm.with_structured_output(RankingResult)
@@ -271,15 +260,17 @@ class AgenticRAGModule:
 
     def retrieve(self, query: str, top_k: int = 10) -> List[Dict[str, Any]]:
         """Retrieve the top-k most relevant chunks for a query."""
-        # Generate query embedding
-        query_embedding = self.embeddings.embed_query(query)
-
-        # Query ChromaDB
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=top_k,
-            include=["documents", "metadatas", "distances"]
-        )
+        with span("rag.retrieve", top_k=top_k):
+            # Generate query embedding
+            with span("rag.embed_query"):
+                query_embedding = self.embeddings.embed_query(query)
+
+            # Query ChromaDB
+            results = self.collection.query(
+                query_embeddings=[query_embedding],
+                n_results=top_k,
+                include=["documents", "metadatas", "distances"]
+            )
 
         # Format results
         chunks = []
@@ -331,7 +322,9 @@ Evaluate whether these chunks can help answer the user's query.
         ]
 
         try:
-            result: RankingResult = invoke_with_retry(self.ranking_llm.invoke, messages)
+            with span("rag.rank", chunks=len(chunks)) as s:
+                result: RankingResult = invoke_with_retry(self.ranking_llm.invoke, messages, component="ranking")
+                s["relevant"] = result.is_relevant
             return result.is_relevant, result.reasoning
 
         except Exception as e:
@@ -364,7 +357,8 @@ Provide a better query to search the document database.""")
         ]
 
         try:
-            result: RewrittenQuery = invoke_with_retry(self.rewrite_llm.invoke, messages)
+            with span("rag.rewrite", attempt=attempt):
+                result: RewrittenQuery = invoke_with_retry(self.rewrite_llm.invoke, messages, component="rewrite")
             return result.query
 
         except Exception as e:
@@ -386,6 +380,7 @@ Provide a better query to search the document database.""")
         current_query = query
         best_chunks = []
         best_relevance = False
+        ranking_skipped = False
 
         print(f"\n{'='*60}")
         print(f"🔍 AGENTIC RAG [{self.collection_name}]: Starting search")
@@ -401,13 +396,19 @@ Provide a better query to search the document database.""")
 
             if not chunks:
                 print(f"   ⚠️ No chunks retrieved")
-                if attempt < max_retries:
+                if attempt < max_retries and not budget_degraded():
                     current_query = self.rewrite_query(current_query, user_message, attempt)
                     query_history.append(current_query)
                 continue
 
             print(f"   📚 Retrieved {len(chunks)} chunks")
 
+            # Close to the token budget: trust vector similarity, no ranking / rewrite agents
+            if budget_degraded():
+                print(f"   💸 Token budget low - skipping ranking and rewrite agents")
+                best_chunks, best_relevance, ranking_skipped = chunks, True, True
+                break
+
             # Step 2: Rank chunks
             is_relevant, reasoning = self.rank_chunks(current_query, chunks)
 
@@ -451,16 +452,19 @@ Provide a better query to search the document database.""")
             print(f"   Sources: {sources}")
             print(f"   Relevant: {best_relevance}")
 
+            record_rag_search(self.training_type, best_relevance, len(query_history))
             return {
                 "status": "success",
                 "chunks": formatted_chunks,
                 "sources": sources,
                 "query_history": query_history,
                 "attempts": len(query_history),
-                "found_relevant": best_relevance
+                "found_relevant": best_relevance,
+                "ranking_skipped": ranking_skipped
             }
         else:
             print(f"\n❌ RAG search failed - no chunks found")
+            record_rag_search(self.training_type, False, len(query_history))
             return {
                 "status": "no_relevant_info",
                 "error": "No relevant documents found after all attempts",
@@ -525,12 +529,10 @@ NO_DOCUMENTS_MESSAGE = (
 
 def _has_documents(training_type: str) -> bool:
     """Return True if the training type has reference documents available."""
-    if training_type not in TRAINING_DOCS_MAP:
-        return False
-    docs_path = TRAINING_DOCS_MAP[training_type]
-    if not docs_path.exists():
+    try:
+        return get_training(training_type).has_documents()
+    except ValueError:
         return False
-    return any(docs_path.glob("*.pdf"))
 
 
 def get_rag_module(training_type: str = "migraine"):
@@ -0,0 +1,145 @@
+"""
+Incremental Re-evaluation
+
+When a learner revises some answers, only the scenarios whose inputs
+changed are sent to the evaluator again.
+
+- Every evaluated session stores the learner's answers per module and a
+  hash per scenario of the answer plus its expert context
+  (expert_analysis.scenario_hashes), next to the evaluations.
+- A revision is applied on top of the stored answers; scenarios whose hash
+  differs from the stored one (revised answer, edited expert content or a
+  new evaluator model) are evaluated with evaluator.evaluate_learner,
+  limited to them, and merged into the stored evaluations.
+- The performance table script stored with the session gets new cells for
+  those rows only (table_generator.update_performance_table_rows); the
+  whole table is regenerated when the rows cannot be matched.
+
+Sessions saved before this have no stored answers or hashes: they are
+taken from the training texts the session was evaluated on.
+"""
+
+import concurrent.futures
+import contextvars
+from typing import Any, Dict, List, Optional, Tuple
+
+from .expert_analysis import apply_responses, module_responses, parse_module, scenario_hashes
+from .training_catalog import get_training
+
+
+def _number(key: str) -> int:
+    digits = "".join(c for c in key if c.isdigit())
+    return int(digits) if digits else 0
+
+
+def scenario_state(modules: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Session fields recording the answers and scenario hashes of evaluated modules"""
+    return {
+        "responses": {key: {str(n): answer for n, answer in module_responses(module).items()}
+                      for key, module in modules.items()},
+        "scenario_hashes": {key: {str(n): h for n, h in scenario_hashes(module).items()}
+                            for key, module in modules.items()},
+    }
+
+
+def training_modules(training_type: str) -> Dict[str, Dict[str, Any]]:
+    """Parsed modules of a training's texts (those that can be split into scenarios)"""
+    training = get_training(training_type)
+    modules = {key: parse_module(text) for key, text in training.trainings.items()}
+    return {key: module for key, module in modules.items() if module is not None}
+
+
+def _stored_modules(session: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """The session's modules with the learner answers it was evaluated on"""
+    modules = training_modules(session.get("training_type", "migraine"))
+    stored = session.get("responses") or {}
+    result = {}
+    for key in session["evaluations"]:
+        if key not in modules:
+            continue
+        module = modules[key]
+        if key in stored:
+            module = apply_responses(module, {int(n): answer for n, answer in stored[key].items()})
+        result[key] = module
+    return result
+
+
+def _merge(evaluation: Dict[str, Any], update: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """Merge re-evaluated scenarios into a module evaluation, matching keys by number.
+
+    Returns the (situation key, scenario key) of the merged scenarios.
+    """
+    situations = evaluation.setdefault("situations", {})
+    merged = []
+    for sit_key, situation in update["situations"].items():
+        existing_sit = next((k for k in situations if _number(k) == _number(sit_key)), None)
+        if existing_sit is None:
+            situations[sit_key] = {"description": situation["description"], "scenarios": {}}
+            existing_sit = sit_key
+        scenarios = situations[existing_sit].setdefault("scenarios", {})
+        for scen_key, scenario in situation["scenarios"].items():
+            existing = next((k for k in scenarios if _number(k) == _number(scen_key)), scen_key)
+            scenarios[existing] = scenario
+            merged.append((existing_sit, existing))
+    return merged
+
+
+def reevaluate_session(session: Dict[str, Any],
+                       revisions: Optional[Dict[str, Dict[int, Dict[str, str]]]] = None) -> Dict[str, Any]:
+    """Apply revised answers to a session and re-evaluate the scenarios whose hash changed.
+
+    Args:
+        session: Stored session (see session_store.get_session)
+        revisions: {module key: {scenario number: {"response", "justification"}}};
+            none re-evaluates only the scenarios made stale by expert or model changes
+
+    Returns:
+        {"evaluations", "responses", "scenario_hashes" (to store), "changed"
+        ({module key: [scenario numbers]}), "rows" ([(module, situation key,
+        scenario key)] re-evaluated)}
+
+    Raises:
+        ValueError: Unknown module or scenario, or a module that cannot be
+            split into scenarios
+    """
+    from backend.evaluator import evaluate_learner
+
+    revisions = revisions or {}
+    modules = _stored_modules(session)
+    unknown = [key for key in revisions if key not in modules]
+    if unknown:
+        raise ValueError(f"Cannot re-evaluate modules {unknown} per scenario. Available: {list(modules)}")
+
+    stored_hashes = session.get("scenario_hashes") or {}
+    revised: Dict[str, Dict[str, Any]] = {}
+    changed: Dict[str, List[int]] = {}
+    for key, module in modules.items():
+        old_hashes = stored_hashes.get(key) or {str(n): h for n, h in scenario_hashes(module).items()}
+        if key in revisions:
+            module = apply_responses(module, {**module_responses(module), **revisions[key]})
+        revised[key] = module
+        stale = [n for n, h in scenario_hashes(module).items() if old_hashes.get(str(n)) != h]
+        if stale:
+            changed[key] = stale
+
+    training = get_training(session.get("training_type", "migraine"))
+    evaluations = session["evaluations"]
+    rows = []
+    if changed:
+        print(f"\n♻️  Re-evaluating {sum(map(len, changed.values()))} scenario(s): {changed}")
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(changed)) as executor:
+            futures = {
+                key: executor.submit(contextvars.copy_context().run, evaluate_learner, revised[key],
+                                     training.module_names.get(key, key), numbers)
+                for key, numbers in changed.items()
+            }
+            updates = {key: future.result() for key, future in futures.items()}
+        for key, update in updates.items():
+            rows += [(key, *scenario) for scenario in _merge(evaluations.setdefault(key, {}), update)]
+
+    return {
+        "evaluations": evaluations,
+        **scenario_state(revised),
+        "changed": changed,
+        "rows": rows,
+    }
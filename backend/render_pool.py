@@ -0,0 +1,344 @@
+"""
+Isolated Render Pool
+
+Executes LLM-written visualization code outside the server process.
+
+A pool of worker processes is forked from a forkserver that has matplotlib,
+pandas, numpy and seaborn already imported, so a job pays no import cost.
+Each job runs with:
+- a wall-clock timeout (the parent kills and replaces the worker),
+- a CPU-time limit (RLIMIT_CPU, the kernel kills the worker),
+- an address-space limit (RLIMIT_AS) on top of the preloaded libraries,
+- no file writes (RLIMIT_FSIZE = 0), from an empty scratch directory,
+- no network: the worker moves to its own empty network namespace (Linux;
+  needs root or unprivileged user namespaces, logged when unavailable),
+- optionally another user (RENDER_WORKER_USER, when the server runs as
+  root), so the server's files are out of reach. That user must be able to
+  read the Python installation and its packages.
+
+The in-process guard rails of backend/rendering.py (import whitelist, no
+file builtins) apply too, but the worker is the boundary: generated code
+can still read what the worker's user can read.
+
+Rendered PNGs come back to the parent through a pipe, so renders run in
+parallel across cores and a runaway script only costs one worker.
+
+Used when RENDER_BACKEND=process (see backend/rendering.py).
+
+Configuration (environment):
+    RENDER_POOL_WORKERS    number of workers (0 = execute in-process)
+    RENDER_TIMEOUT_SECONDS wall-clock limit per job
+    RENDER_CPU_SECONDS     CPU-time limit per job
+    RENDER_MEMORY_MB       extra address space allowed per worker
+    RENDER_WORKER_USER     user the workers run as ("" = the server's user)
+    RENDER_NO_NETWORK      put workers in an empty network namespace (default true)
+"""
+
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from backend.rendering import ROOT_DIR, execute_visualization_code, execute_table_script, load_logo
+
+POOL_WORKERS = int(os.getenv("RENDER_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+JOB_TIMEOUT_SECONDS = float(os.getenv("RENDER_TIMEOUT_SECONDS", "60"))
+JOB_CPU_SECONDS = int(os.getenv("RENDER_CPU_SECONDS", "45"))
+WORKER_MEMORY_MB = int(os.getenv("RENDER_MEMORY_MB", "1024"))
+WORKER_USER = os.getenv("RENDER_WORKER_USER", "")
+WORKER_NO_NETWORK = os.getenv("RENDER_NO_NETWORK", "true").lower() == "true"
+WORKER_MAX_JOBS = 50           # recycle workers to bound leaks
+WORKER_READY_TIMEOUT = 120     # first start imports the scientific stack
+PRELOAD_MODULES = ["matplotlib", "matplotlib.pyplot", "pandas", "numpy", "seaborn"]
+
+
+class RenderError(RuntimeError):
+    """A render job failed inside a render worker"""
+
+
+class RenderTimeout(RenderError):
+    """A render job exceeded its time or CPU limit and the worker was killed"""
+
+
+_JOB_HANDLERS = {
+    "visualization": lambda payload: execute_visualization_code(payload["code"], payload["evaluations"]),
+    "table_script": lambda payload: execute_table_script(payload["script"]),
+}
+
+
+# =============================================================================
+# Worker process
+# =============================================================================
+
+def _vm_size_bytes() -> int:
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmSize:"):
+                return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+
+_CLONE_NEWUSER = 0x10000000
+_CLONE_NEWNET = 0x40000000
+
+
+def _unshare_network() -> bool:
+    """Move the process to a new, empty network namespace (loopback down)"""
+    if not sys.platform.startswith("linux"):
+        return False
+    import ctypes
+
+    libc = ctypes.CDLL(None, use_errno=True)
+    if libc.unshare(_CLONE_NEWNET) == 0:
+        return True
+    # Unprivileged: a user namespace grants the capability inside it
+    return libc.unshare(_CLONE_NEWUSER | _CLONE_NEWNET) == 0
+
+
+def _isolate(user: str, no_network: bool) -> List[str]:
+    """Cut the worker off the network, the server's files and file writes.
+
+    Returns the measures applied; raises OSError when RENDER_WORKER_USER
+    cannot be applied (the worker must not run as the server's user then).
+    """
+    applied = []
+    if no_network:
+        if _unshare_network():
+            applied.append("no network")
+        else:
+            print("⚠️  Render worker keeps network access (network namespaces unavailable)")
+    if user:
+        import pwd
+
+        try:
+            entry = pwd.getpwnam(user)
+        except KeyError:
+            raise OSError(f"Unknown RENDER_WORKER_USER '{user}'")
+        if os.geteuid() != 0:
+            raise OSError(f"RENDER_WORKER_USER '{user}' needs the server to run as root")
+        os.setgroups([])
+        os.setgid(entry.pw_gid)
+        os.setuid(entry.pw_uid)
+        applied.append(f"user {user}")
+    try:
+        import resource
+        import signal
+
+        # Writes fail with EFBIG instead of killing the worker
+        signal.signal(signal.SIGXFSZ, signal.SIG_IGN)
+        resource.setrlimit(resource.RLIMIT_FSIZE, (0, 0))
+        applied.append("no file writes")
+    except (ImportError, AttributeError, ValueError, OSError):
+        pass
+    return applied
+
+
+def _worker_main(conn, memory_mb: int, cpu_seconds: int, user: str = "", no_network: bool = True):
+    """Worker loop: import the stack once, then serve jobs from the pipe"""
+    try:
+        import resource
+    except ImportError:  # non-POSIX: no kernel limits, wall-clock timeout still applies
+        resource = None
+
+    for module in PRELOAD_MODULES:
+        try:
+            __import__(module)
+        except ImportError:
+            pass
+    import matplotlib
+    matplotlib.use("Agg")
+
+    # Read what renders need from disk before losing access to it
+    load_logo()
+
+    # Work from a scratch directory so stray savefig() calls land nowhere important
+    import tempfile
+    scratch = tempfile.mkdtemp(prefix="render_worker_")
+    os.chmod(scratch, 0o777)
+    os.chdir(scratch)
+
+    try:
+        isolation = _isolate(user, no_network)
+    except OSError as e:
+        conn.send(("error", f"Render worker isolation failed: {e}"))
+        return
+
+    if resource is not None and memory_mb > 0:
+        current = _vm_size_bytes()
+        if current:
+            limit = current + memory_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    conn.send(("ready", isolation))
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        if message is None:
+            break
+        kind, payload = message
+
+        if resource is not None and cpu_seconds > 0:
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            used = int(usage.ru_utime + usage.ru_stime) + 1
+            _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+            soft = used + cpu_seconds
+            if hard != resource.RLIM_INFINITY:
+                soft = min(soft, hard)
+            resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+        try:
+            result = _JOB_HANDLERS[kind](payload)
+            conn.send(("ok", result))
+        except MemoryError:
+            conn.send(("error", "Visualization code exceeded the memory limit"))
+        except BaseException as e:  # report everything, including SystemExit from the script
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+class _Worker:
+    def __init__(self, ctx):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, WORKER_MEMORY_MB, JOB_CPU_SECONDS, WORKER_USER, WORKER_NO_NETWORK),
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+        self.isolation: List[str] = []
+        self.jobs = 0
+
+    def wait_ready(self, timeout: float = WORKER_READY_TIMEOUT):
+        if self.ready:
+            return
+        if not self.conn.poll(timeout):
+            raise RenderError("Render worker failed to start")
+        status, detail = self.conn.recv()
+        if status != "ready":
+            raise RenderError(detail)
+        self.ready = True
+        self.isolation = detail
+
+    def kill(self):
+        try:
+            self.process.kill()
+            self.process.join(timeout=5)
+        except Exception:
+            pass
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+            self.process.join(timeout=2)
+        except Exception:
+            pass
+        if self.process.is_alive():
+            self.kill()
+
+
+class RenderPool:
+    """Pre-forked pool of isolated render workers"""
+
+    def __init__(self, size: int = POOL_WORKERS):
+        self.size = max(1, size)
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        self._ctx = multiprocessing.get_context(method)
+        if method == "forkserver":
+            self._ctx.set_forkserver_preload(PRELOAD_MODULES)
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._started = False
+        self._closed = False
+        self._isolation_logged = False
+
+    def start(self):
+        """Fork the workers (idempotent)"""
+        with self._lock:
+            if self._started:
+                return
+            # Workers import `backend.*` by module name
+            root = str(ROOT_DIR)
+            if root not in sys.path:
+                sys.path.append(root)
+            for _ in range(self.size):
+                self._idle.put(_Worker(self._ctx))
+            self._started = True
+            print(f"🧪 Render pool started with {self.size} worker(s)")
+
+    def run(self, kind: str, payload: Dict[str, Any], timeout: float = JOB_TIMEOUT_SECONDS) -> Any:
+        """Run one job on an idle worker; blocks until a worker is free"""
+        if self._closed:
+            raise RenderError("Render pool is shut down")
+        self.start()
+        worker = self._idle.get()
+        healthy = False
+        try:
+            worker.wait_ready()
+            if not self._isolation_logged:
+                self._isolation_logged = True
+                print(f"🧪 Render worker isolation: {', '.join(worker.isolation) or 'none'}")
+            worker.conn.send((kind, payload))
+            if not worker.conn.poll(timeout):
+                raise RenderTimeout(f"Render job exceeded {timeout:.0f}s and was killed")
+            try:
+                status, result = worker.conn.recv()
+            except (EOFError, OSError):
+                raise RenderTimeout("Render worker died (CPU or memory limit exceeded)")
+            healthy = True
+            worker.jobs += 1
+            if status != "ok":
+                raise RenderError(result)
+            return result
+        except (BrokenPipeError, EOFError, OSError) as e:
+            raise RenderError(f"Render worker failed: {e}")
+        finally:
+            if not healthy:
+                worker.kill()
+                worker = _Worker(self._ctx)
+            elif worker.jobs >= WORKER_MAX_JOBS:
+                worker.stop()
+                worker = _Worker(self._ctx)
+            self._idle.put(worker)
+
+    def shutdown(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().stop()
+            except queue.Empty:
+                break
+
+
+_pool_instance: Optional[RenderPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_render_pool() -> Optional[RenderPool]:
+    """Process-wide render pool, or None when RENDER_POOL_WORKERS=0"""
+    global _pool_instance
+    if POOL_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool_instance is None:
+            _pool_instance = RenderPool(POOL_WORKERS)
+    return _pool_instance
+
+
+def warm_render_pool():
+    """Fork the workers ahead of the first visualization request"""
+    pool = get_render_pool()
+    if pool is not None:
+        pool.start()
@@ -0,0 +1,552 @@
+"""
+Rendering Layer
+
+Runs LLM-written visualization code and performance-table scripts without
+touching pyplot's global figure state.
+
+Every render gets its own PyplotShim: a pyplot-compatible object that
+creates `Figure` objects attached to a `FigureCanvasAgg` and tracks the
+current figure/axes for that render only. Generated code keeps writing
+`plt.subplots()`, `plt.title()`, `plt.savefig()` and `plt.close()`, but two
+concurrent renders can no longer draw on or close each other's figures.
+`import matplotlib.pyplot as plt` inside generated code also resolves to
+the shim.
+
+Generated code also gets an import whitelist, no file builtins, an `io`
+limited to BytesIO / StringIO and a `matplotlib` limited to its plotting
+modules. These are guard rails against accidental file and OS access, not
+a security boundary: numpy / pandas I/O and the object graph of any module
+still reach the filesystem. Only the process backend isolates the code
+(see backend/render_pool.py).
+
+Backends (RENDER_BACKEND):
+    process  isolated worker processes (backend/render_pool.py), default
+    thread   thread pool in the server process (RENDER_THREADS workers)
+    inline   run in the calling thread
+"""
+
+import base64
+import builtins
+import io
+import json
+import os
+import sys
+import threading
+import types
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+ROOT_DIR = Path(__file__).parent.parent
+SENSAI_LOGO_PATH = ROOT_DIR / "frontend" / "assets" / "sensai_logo.png"
+
+RENDER_BACKENDS = ("process", "thread", "inline")
+RENDER_BACKEND = os.getenv("RENDER_BACKEND", "process")
+if RENDER_BACKEND not in RENDER_BACKENDS:
+    print(f"⚠️  Unknown RENDER_BACKEND '{RENDER_BACKEND}', using 'process' (choices: {', '.join(RENDER_BACKENDS)})")
+    RENDER_BACKEND = "process"
+RENDER_THREADS = int(os.getenv("RENDER_THREADS", "4"))
+RENDER_TIMEOUT_SECONDS = float(os.getenv("RENDER_TIMEOUT_SECONDS", "60"))
+
+# Top-level modules generated code may import
+ALLOWED_IMPORTS = {
+    "matplotlib", "mpl_toolkits", "pandas", "numpy", "seaborn",
+    "io", "base64", "json", "math", "statistics", "textwrap", "re", "string",
+    "collections", "itertools", "functools", "datetime", "random", "copy",
+    "unicodedata", "typing", "dataclasses", "enum", "operator", "decimal",
+    "fractions", "colorsys", "warnings",
+}
+BLOCKED_BUILTINS = {"open", "input", "exit", "quit", "breakpoint", "help"}
+# `matplotlib.<name>` as seen by generated code (plotting modules and settings only)
+MATPLOTLIB_ATTRS = {
+    "__version__", "artist", "axes", "axis", "cm", "collections", "colorbar", "colormaps",
+    "colors", "container", "dates", "figure", "font_manager", "gridspec", "image", "legend",
+    "lines", "markers", "offsetbox", "patches", "path", "patheffects", "projections",
+    "rc", "rc_context", "rcdefaults", "rcParams", "scale", "spines", "style", "table",
+    "text", "ticker", "transforms", "get_backend",
+}
+# matplotlib.pyplot names the shim forwards: classes and helpers without figure state
+PYPLOT_HELPERS = {
+    "Annotation", "Arrow", "Artist", "AutoLocator", "Axes", "Circle", "Colormap", "Figure",
+    "FixedFormatter", "FixedLocator", "FormatStrFormatter", "Formatter", "FuncFormatter",
+    "GridSpec", "IndexLocator", "Line2D", "LinearLocator", "Locator", "LogFormatter",
+    "LogFormatterExponent", "LogFormatterMathtext", "LogLocator", "MaxNLocator",
+    "MultipleLocator", "Normalize", "NullFormatter", "NullLocator", "Polygon", "Rectangle",
+    "ScalarFormatter", "SubplotSpec", "Text", "cm", "color_sequences", "colormaps", "cycler",
+    "figaspect", "get", "get_cmap", "getp", "rc", "rc_context", "rcdefaults", "rcParams",
+    "setp", "style",
+}
+# `io` as seen by generated code: in-memory buffers only
+SAFE_IO = types.SimpleNamespace(BytesIO=io.BytesIO, StringIO=io.StringIO)
+
+
+_logo_cache: List[Any] = []
+
+
+def load_logo():
+    """SENSAI logo image (None when absent), read once per process.
+
+    Render workers call it before dropping their file access.
+    """
+    if not _logo_cache:
+        image = None
+        try:
+            if SENSAI_LOGO_PATH.exists():
+                import matplotlib.image as mpimg
+                image = mpimg.imread(str(SENSAI_LOGO_PATH))
+        except Exception:
+            pass
+        _logo_cache.append(image)
+    return _logo_cache[0]
+
+
+def _make_sensai_header():
+    """Build the add_sensai_header(fig) helper injected into generated code.
+
+    Places a small "SENSAI" wordmark at the top-right of the figure with no
+    gap between it and the main content. If a real logo PNG exists at
+    SENSAI_LOGO_PATH, uses it (also small, top-right). Otherwise renders
+    a single-word "SENSAI" text label in the brand navy color.
+    """
+
+    def add_sensai_header(fig, *_, **__):
+        navy = "#0F2A47"
+
+        img = load_logo()
+        if img is not None:
+            try:
+                # Small logo anchored at top-right of the figure, no gap
+                logo_ax = fig.add_axes([0.80, 0.93, 0.18, 0.06])
+                logo_ax.imshow(img, aspect="auto")
+                logo_ax.axis("off")
+                return logo_ax
+            except Exception:
+                pass
+
+        # Fallback: small single-word "SENSAI" wordmark at top-right
+        fig.text(
+            0.985, 0.975, "SENSAI",
+            ha="right", va="top",
+            fontsize=11, fontweight="bold",
+            color=navy, family="DejaVu Sans",
+        )
+        return None
+
+    return add_sensai_header
+
+
+def new_figure(figsize=None, dpi=None, facecolor=None, **kwargs):
+    """Create a Figure bound to its own Agg canvas (no pyplot registration)"""
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(figsize=figsize, dpi=dpi, facecolor=facecolor, **kwargs)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+# =============================================================================
+# pyplot-compatible shim
+# =============================================================================
+
+class PyplotShim:
+    """Per-render stand-in for `matplotlib.pyplot`.
+
+    Figure-creation and state functions are implemented on this object's own
+    figure list. Axes methods (plot, bar, legend, text, ...) go to the current
+    axes; the stateless helpers of PYPLOT_HELPERS (cm, rcParams, get_cmap,
+    Rectangle, ...) come from matplotlib.pyplot. Any other pyplot function
+    would touch pyplot's global figures and raises AttributeError.
+    """
+
+    def __init__(self):
+        self._figures: List[Any] = []
+        self._current = None
+
+    # ----- figures -----
+
+    def figure(self, num=None, figsize=None, dpi=None, facecolor=None, edgecolor=None,
+               frameon=True, clear=False, **kwargs):
+        if num is not None and not isinstance(num, (int, str)) and num in self._figures:
+            self._current = num
+            return num
+        fig = new_figure(figsize=figsize, dpi=dpi, facecolor=facecolor,
+                         edgecolor=edgecolor, frameon=frameon, **kwargs)
+        self._figures.append(fig)
+        self._current = fig
+        return fig
+
+    def subplots(self, nrows=1, ncols=1, *, sharex=False, sharey=False, squeeze=True,
+                 width_ratios=None, height_ratios=None, subplot_kw=None, gridspec_kw=None,
+                 **fig_kw):
+        fig = self.figure(**fig_kw)
+        axs = fig.subplots(nrows, ncols, sharex=sharex, sharey=sharey, squeeze=squeeze,
+                           width_ratios=width_ratios, height_ratios=height_ratios,
+                           subplot_kw=subplot_kw, gridspec_kw=gridspec_kw)
+        return fig, axs
+
+    def subplot_mosaic(self, mosaic, *, sharex=False, sharey=False, width_ratios=None,
+                       height_ratios=None, empty_sentinel=".", subplot_kw=None,
+                       gridspec_kw=None, **fig_kw):
+        fig = self.figure(**fig_kw)
+        axd = fig.subplot_mosaic(mosaic, sharex=sharex, sharey=sharey, width_ratios=width_ratios,
+                                 height_ratios=height_ratios, empty_sentinel=empty_sentinel,
+                                 subplot_kw=subplot_kw, gridspec_kw=gridspec_kw)
+        return fig, axd
+
+    def gcf(self):
+        if self._current is None:
+            return self.figure()
+        return self._current
+
+    def gca(self):
+        return self.gcf().gca()
+
+    def sca(self, ax):
+        self._current = ax.figure.figure  # root figure, also for subfigures
+        ax.figure.sca(ax)
+        return ax
+
+    def subplot(self, *args, **kwargs):
+        fig = self.gcf()
+        ax = fig.add_subplot(*args or (1, 1, 1), **kwargs)
+        fig.sca(ax)
+        return ax
+
+    def subplot2grid(self, shape, loc, rowspan=1, colspan=1, fig=None, **kwargs):
+        fig = fig if fig is not None else self.gcf()
+        rows, cols = shape
+        gs = fig.add_gridspec(rows, cols)
+        ax = fig.add_subplot(gs[loc[0]:loc[0] + rowspan, loc[1]:loc[1] + colspan], **kwargs)
+        fig.sca(ax)
+        return ax
+
+    def axes(self, arg=None, **kwargs):
+        fig = self.gcf()
+        ax = fig.add_subplot(**kwargs) if arg is None else fig.add_axes(arg, **kwargs)
+        fig.sca(ax)
+        return ax
+
+    def close(self, fig=None):
+        if fig == "all":
+            targets = list(self._figures)
+        elif fig is None:
+            targets = [self._current] if self._current is not None else []
+        else:
+            targets = [fig] if fig in self._figures else []
+        for target in targets:
+            self._figures.remove(target)
+            target.clear()
+        if self._current not in self._figures:
+            self._current = self._figures[-1] if self._figures else None
+
+    def clf(self):
+        self.gcf().clear()
+
+    def cla(self):
+        self.gca().cla()
+
+    def get_fignums(self):
+        return list(range(1, len(self._figures) + 1))
+
+    def fignum_exists(self, num):
+        return num in self._figures or num in self.get_fignums()
+
+    # ----- output -----
+
+    def savefig(self, *args, **kwargs):
+        return self.gcf().savefig(*args, **kwargs)
+
+    def show(self, *args, **kwargs):
+        pass
+
+    def draw(self):
+        self.gcf().canvas.draw_idle()
+
+    def pause(self, interval):
+        pass
+
+    def ion(self):
+        pass
+
+    def ioff(self):
+        pass
+
+    # ----- figure-level helpers -----
+
+    def suptitle(self, t, **kwargs):
+        return self.gcf().suptitle(t, **kwargs)
+
+    def figtext(self, x, y, s, *args, **kwargs):
+        return self.gcf().text(x, y, s, *args, **kwargs)
+
+    def figlegend(self, *args, **kwargs):
+        return self.gcf().legend(*args, **kwargs)
+
+    def tight_layout(self, **kwargs):
+        return self.gcf().tight_layout(**kwargs)
+
+    def subplots_adjust(self, **kwargs):
+        return self.gcf().subplots_adjust(**kwargs)
+
+    def colorbar(self, mappable=None, cax=None, ax=None, **kwargs):
+        if mappable is None:
+            mappable = self.gca()._gci()
+            if mappable is None:
+                raise RuntimeError("No mappable was found to use for colorbar creation")
+        if ax is None and cax is None:
+            ax = self.gca()
+        return self.gcf().colorbar(mappable, cax=cax, ax=ax, **kwargs)
+
+    def gci(self):
+        return self.gca()._gci()
+
+    # ----- axes-level helpers with pyplot-specific names -----
+
+    def title(self, label, fontdict=None, loc=None, pad=None, **kwargs):
+        return self.gca().set_title(label, fontdict=fontdict, loc=loc, pad=pad, **kwargs)
+
+    def xlabel(self, xlabel, fontdict=None, labelpad=None, **kwargs):
+        return self.gca().set_xlabel(xlabel, fontdict=fontdict, labelpad=labelpad, **kwargs)
+
+    def ylabel(self, ylabel, fontdict=None, labelpad=None, **kwargs):
+        return self.gca().set_ylabel(ylabel, fontdict=fontdict, labelpad=labelpad, **kwargs)
+
+    def xlim(self, *args, **kwargs):
+        ax = self.gca()
+        if not args and not kwargs:
+            return ax.get_xlim()
+        return ax.set_xlim(*args, **kwargs)
+
+    def ylim(self, *args, **kwargs):
+        ax = self.gca()
+        if not args and not kwargs:
+            return ax.get_ylim()
+        return ax.set_ylim(*args, **kwargs)
+
+    def xscale(self, value, **kwargs):
+        self.gca().set_xscale(value, **kwargs)
+
+    def yscale(self, value, **kwargs):
+        self.gca().set_yscale(value, **kwargs)
+
+    def _ticks(self, axis, ticks=None, labels=None, minor=False, **kwargs):
+        from matplotlib.artist import setp
+
+        if ticks is None:
+            locs = axis.get_ticklocs(minor=minor)
+            if labels is not None:
+                raise TypeError("xticks(): Parameter 'labels' can't be set without setting 'ticks'")
+        else:
+            locs = axis.set_ticks(ticks, minor=minor)
+        if labels is None:
+            tick_labels = axis.get_ticklabels(minor=minor)
+            setp(tick_labels, **kwargs)
+        else:
+            tick_labels = axis.set_ticklabels(labels, minor=minor, **kwargs)
+        return locs, tick_labels
+
+    def xticks(self, ticks=None, labels=None, *, minor=False, **kwargs):
+        return self._ticks(self.gca().xaxis, ticks, labels, minor, **kwargs)
+
+    def yticks(self, ticks=None, labels=None, *, minor=False, **kwargs):
+        return self._ticks(self.gca().yaxis, ticks, labels, minor, **kwargs)
+
+    def __getattr__(self, name):
+        from matplotlib.axes import Axes
+        import matplotlib.pyplot as pyplot
+
+        if name.startswith("__"):
+            raise AttributeError(name)
+        if hasattr(Axes, name):
+            return getattr(self.gca(), name)
+        if name in PYPLOT_HELPERS:
+            return getattr(pyplot, name)
+        raise AttributeError(f"plt.{name} is not available in visualization code (it uses pyplot's global figures)")
+
+
+class _MatplotlibProxy:
+    """`matplotlib` module as seen by generated code: `.pyplot` is the shim"""
+
+    def __init__(self, shim: PyplotShim):
+        self.pyplot = shim
+
+    def use(self, backend, force=True):
+        """Renders always use Agg"""
+
+    def __getattr__(self, name):
+        import matplotlib
+
+        if name not in MATPLOTLIB_ATTRS:
+            raise AttributeError(f"matplotlib.{name} is not available in visualization code")
+        return getattr(matplotlib, name)
+
+
+# =============================================================================
+# Restricted execution
+# =============================================================================
+
+def _restricted_builtins(shim: PyplotShim) -> Dict[str, Any]:
+    proxy = _MatplotlibProxy(shim)
+
+    def guarded_import(name, globals=None, locals=None, fromlist=(), level=0):
+        if level == 0 and name.split(".")[0] not in ALLOWED_IMPORTS:
+            raise ImportError(f"Import of '{name}' is not allowed in visualization code")
+        if level == 0 and name == "io":
+            return SAFE_IO
+        if level == 0 and name == "matplotlib.pyplot" and fromlist:
+            return shim
+        module = builtins.__import__(name, globals, locals, fromlist, level)
+        if level == 0 and name.split(".")[0] == "matplotlib" and (not fromlist or name == "matplotlib"):
+            return proxy
+        return module
+
+    safe = {k: v for k, v in vars(builtins).items() if k not in BLOCKED_BUILTINS}
+    safe["__import__"] = guarded_import
+    return safe
+
+
+def _base_globals(shim: PyplotShim) -> Dict[str, Any]:
+    exec_globals: Dict[str, Any] = {
+        "__builtins__": _restricted_builtins(shim),
+        "matplotlib": _MatplotlibProxy(shim),
+        "plt": shim,
+        "base64": base64,
+        "io": SAFE_IO,
+        "json": json,
+        "add_sensai_header": _make_sensai_header(),
+    }
+    try:
+        import pandas as pd
+        import numpy as np
+        exec_globals["pd"] = pd
+        exec_globals["np"] = np
+    except ImportError:
+        pass
+    try:
+        import seaborn as sns
+        exec_globals["sns"] = sns
+    except ImportError:
+        pass
+    return exec_globals
+
+
+def _close_pyplot_figures():
+    """Close figures left in pyplot's global state (seaborn / pandas calls without ax=)"""
+    pyplot = sys.modules.get("matplotlib.pyplot")
+    if pyplot is not None and pyplot.get_fignums():
+        print(f"⚠️  Render left {len(pyplot.get_fignums())} global pyplot figure(s); closing them")
+        pyplot.close("all")
+
+
+def execute_visualization_code(code: str, evaluations: Dict[str, Any]) -> Dict[str, Any]:
+    """Exec generated code and call its generate_visualization(evaluations)"""
+    shim = PyplotShim()
+    exec_globals = _base_globals(shim)
+    exec_globals["evaluations"] = evaluations
+    try:
+        exec(compile(code, "<visualization>", "exec"), exec_globals)
+        if "generate_visualization" not in exec_globals:
+            return {"error": "Error: No generate_visualization function found in generated code"}
+        return exec_globals["generate_visualization"](evaluations)
+    finally:
+        shim.close("all")
+        _close_pyplot_figures()
+
+
+def execute_table_script(script: str) -> bytes:
+    """Exec a performance-table script that writes its PNG into `_buf`"""
+    import matplotlib.patches as mpatches
+    from matplotlib.gridspec import GridSpec
+
+    shim = PyplotShim()
+    buf = io.BytesIO()
+    exec_globals = _base_globals(shim)
+    exec_globals.update({"mpatches": mpatches, "GridSpec": GridSpec, "_buf": buf})
+    try:
+        exec(compile(script, "<table_generator>", "exec"), exec_globals)
+    finally:
+        shim.close("all")
+        _close_pyplot_figures()
+
+    data = buf.getvalue()
+    if not data:
+        raise RuntimeError("Table script produced no PNG bytes")
+    return data
+
+
+# =============================================================================
+# Backends
+# =============================================================================
+
+_thread_pool: Optional[ThreadPoolExecutor] = None
+_thread_pool_lock = threading.Lock()
+
+
+def _get_thread_pool() -> ThreadPoolExecutor:
+    global _thread_pool
+    with _thread_pool_lock:
+        if _thread_pool is None:
+            import matplotlib
+            matplotlib.use("Agg")
+            _thread_pool = ThreadPoolExecutor(max_workers=max(1, RENDER_THREADS),
+                                              thread_name_prefix="render")
+            print(f"🧵 Render thread pool started with {RENDER_THREADS} thread(s)")
+    return _thread_pool
+
+
+def _run_threaded(fn, *args):
+    future = _get_thread_pool().submit(fn, *args)
+    try:
+        return future.result(timeout=RENDER_TIMEOUT_SECONDS)
+    except FutureTimeout:
+        # Threads cannot be killed; the render keeps its thread until it returns
+        raise TimeoutError(f"Render job exceeded {RENDER_TIMEOUT_SECONDS:.0f}s")
+
+
+def _process_pool():
+    if RENDER_BACKEND != "process":
+        return None
+    from backend.render_pool import get_render_pool
+    return get_render_pool()
+
+
+def render_visualization(code: str, evaluations: Dict[str, Any]) -> Dict[str, Any]:
+    """Run generated visualization code on the configured backend"""
+    try:
+        pool = _process_pool()
+        if pool is not None:
+            return pool.run("visualization", {"code": code, "evaluations": evaluations})
+        if RENDER_BACKEND == "thread":
+            return _run_threaded(execute_visualization_code, code, evaluations)
+        return execute_visualization_code(code, evaluations)
+    except Exception as e:
+        return {"error": f"Error executing visualization code: {e}"}
+
+
+def render_table_script(script: str) -> bytes:
+    """Run a performance-table script on the configured backend"""
+    pool = _process_pool()
+    if pool is not None:
+        return pool.run("table_script", {"script": script})
+    if RENDER_BACKEND == "thread":
+        return _run_threaded(execute_table_script, script)
+    return execute_table_script(script)
+
+
+def warm_renderer():
+    """Start the configured backend ahead of the first render"""
+    pool = _process_pool()
+    if pool is not None:
+        pool.start()
+    elif RENDER_BACKEND == "thread":
+        _get_thread_pool()
+
+
+def shutdown_renderer():
+    if RENDER_BACKEND == "process":
+        from backend.render_pool import _pool_instance
+        if _pool_instance is not None:
+            _pool_instance.shutdown()
+    if _thread_pool is not None:
+        _thread_pool.shutdown(wait=False, cancel_futures=True)
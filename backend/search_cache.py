@@ -0,0 +1,221 @@
+"""
+Web Search Cache
+
+Caches Tavily results so learners of a cohort asking the same thing within
+a few hours ("dernières recommandations migraine") share one upstream
+search.
+
+- Keyed on the normalized query (lowercase, no accents / punctuation),
+  max_results and search depth
+- Kept in memory and persisted to disk (.search_cache/), expiring after
+  SEARCH_CACHE_TTL_SECONDS (default 6 hours; 0 disables the cache)
+- Single-flight: while a search for a key is in flight, identical requests
+  wait for its result instead of calling Tavily again, for at most the
+  search timeout (WEB_SEARCH_TIMEOUT_SECONDS); past it they search themselves
+
+Entries hold the parsed results of WebSearchTool.search, so cached results
+go through format_results_for_llm / get_citations unchanged.
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .metrics import record_cache_lookup
+from .viz_cache import data_hash, normalize_request
+
+CACHE_DIR = Path(__file__).parent.parent / ".search_cache"
+SEARCH_CACHE_TTL_SECONDS = int(os.getenv("SEARCH_CACHE_TTL_SECONDS", str(6 * 60 * 60)))
+MEMORY_MAX_ENTRIES = 256
+# How long identical searches wait for an in-flight one before calling Tavily themselves
+FOLLOWER_TIMEOUT_SECONDS = float(os.getenv("WEB_SEARCH_TIMEOUT_SECONDS", "30"))
+
+Results = List[Dict[str, Any]]
+
+
+class SearchCache:
+    """Memory + disk cache of web search results with in-flight deduplication"""
+
+    def __init__(self, cache_dir: Path = CACHE_DIR, ttl_seconds: int = SEARCH_CACHE_TTL_SECONDS):
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.upstream_calls = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def key(query: str, max_results: int, search_depth: str) -> str:
+        return data_hash([normalize_request(query), int(max_results), search_depth])
+
+    # ----- storage -----
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def _expired(self, entry: Dict[str, Any]) -> bool:
+        return time.time() - entry.get("created_at", 0) > self.ttl_seconds
+
+    def _load(self, key: str) -> Optional[Results]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+        if entry is None:
+            path = self._path(key)
+            if not path.exists():
+                return None
+            try:
+                entry = json.loads(path.read_text(encoding="utf-8"))
+            except (json.JSONDecodeError, OSError):
+                return None
+            self._remember(key, entry)
+        if self._expired(entry):
+            return None
+        return [dict(result) for result in entry["results"]]
+
+    def _remember(self, key: str, entry: Dict[str, Any]):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > MEMORY_MAX_ENTRIES:
+                self._memory.popitem(last=False)
+
+    def _store(self, key: str, query: str, results: Results):
+        entry = {"query": query, "results": [dict(result) for result in results], "created_at": time.time()}
+        self._remember(key, entry)
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_text(json.dumps(entry, ensure_ascii=False), encoding="utf-8")
+            tmp.replace(path)
+        except OSError as e:
+            print(f"⚠️  Search cache write failed: {e}")
+
+    # ----- lookup -----
+
+    def _lookup(self, key: str, query: str) -> Optional[Results]:
+        cached = self._load(key)
+        record_cache_lookup("web_search", cached is not None)
+        if cached is not None:
+            print(f"⚡ Web search cache hit for: {query}")
+        return cached
+
+    def _claim(self, key: str, query: str) -> Tuple[bool, Future]:
+        """(leader, future): the leader runs the search, the others wait on the future"""
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is None:
+                future = self._in_flight[key] = Future()
+                self.upstream_calls += 1
+                return True, future
+            self.coalesced += 1
+        print(f"⏳ Waiting for in-flight web search: {query}")
+        return False, future
+
+    def _settle(self, key: str, query: str, future: Future, results: Results):
+        if results:
+            self._store(key, query, results)
+        future.set_result(results)
+
+    @staticmethod
+    def _fail(future: Future, exc: BaseException):
+        """Fail the followers' wait; a cancelled leader reaches them as a plain error they can catch"""
+        if not isinstance(exc, Exception):
+            exc = RuntimeError("in-flight search cancelled")
+        future.set_exception(exc)
+
+    def _search_alone(self, key: str, query: str, results: Results) -> Results:
+        """Results of a follower that stopped waiting for the in-flight search"""
+        with self._lock:
+            self.upstream_calls += 1
+        if results:
+            self._store(key, query, results)
+        return results
+
+    def _release(self, key: str):
+        with self._lock:
+            self._in_flight.pop(key, None)
+
+    def get_or_search(self, query: str, max_results: int, search_depth: str,
+                      search: Callable[[], Results],
+                      timeout: float = FOLLOWER_TIMEOUT_SECONDS) -> Results:
+        """Cached results, or the results of `search()` (run once per key at a time).
+
+        Errors raised by `search` propagate to every waiting caller and are
+        not cached; neither are empty results. A caller waiting longer than
+        `timeout` for an in-flight search runs `search()` itself.
+        """
+        if self.ttl_seconds <= 0:
+            return search()
+        key = self.key(query, max_results, search_depth)
+        cached = self._lookup(key, query)
+        if cached is not None:
+            return cached
+        leader, future = self._claim(key, query)
+        if not leader:
+            try:
+                return [dict(result) for result in future.result(timeout=timeout)]
+            except FutureTimeout:
+                print(f"⚠️  In-flight search still running after {timeout:g}s, searching again: {query[:60]}")
+                return self._search_alone(key, query, search())
+        try:
+            # A search that finished between our lookup and taking the lead
+            results = self._load(key) or search()
+            self._settle(key, query, future, results)
+            return results
+        except BaseException as e:
+            self._fail(future, e)
+            raise
+        finally:
+            self._release(key)
+
+    async def aget_or_search(self, query: str, max_results: int, search_depth: str,
+                             search: Callable[[], Awaitable[Results]],
+                             timeout: float = FOLLOWER_TIMEOUT_SECONDS) -> Results:
+        """get_or_search for a coroutine search; shares in-flight searches with sync callers"""
+        if self.ttl_seconds <= 0:
+            return await search()
+        key = self.key(query, max_results, search_depth)
+        cached = self._lookup(key, query)
+        if cached is not None:
+            return cached
+        leader, future = self._claim(key, query)
+        if not leader:
+            try:
+                # shield: giving up must not cancel the leader's future
+                results = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
+                return [dict(result) for result in results]
+            except asyncio.TimeoutError:
+                print(f"⚠️  In-flight search still running after {timeout:g}s, searching again: {query[:60]}")
+                return self._search_alone(key, query, await search())
+        try:
+            results = self._load(key) or await search()
+            self._settle(key, query, future, results)
+            return results
+        except BaseException as e:
+            self._fail(future, e)
+            raise
+        finally:
+            self._release(key)
+
+
+_cache_instance: Optional[SearchCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> SearchCache:
+    """Process-wide web search cache"""
+    global _cache_instance
+    with _cache_lock:
+        if _cache_instance is None:
+            _cache_instance = SearchCache()
+    return _cache_instance
@@ -4,19 +4,39 @@ File-based Session Store with TTL
 Persists session data (evaluations and chat history) to disk so that
 sessions survive container restarts on Replit Cloud Run.
 Sessions expire after 2 hours of inactivity.
+
+The performance table PNG is kept as raw bytes in a sidecar file
+(<session_id>.png) next to the session JSON, with its ETag recorded in the
+JSON. Re-evaluating a session (update_session) replaces it.
+
+Writes of a session file hold its lock (session_lock), which callers also
+take around a whole read-modify-write such as a re-evaluation.
 """
 
+import base64
+import hashlib
 import json
 import os
+import threading
 import time
 from pathlib import Path
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 
 # Store sessions in a directory that persists across restarts
 SESSIONS_DIR = Path(__file__).parent.parent / ".sessions"
 SESSION_TTL_SECONDS = 2 * 60 * 60  # 2 hours
 
 
+_session_locks: Dict[str, threading.RLock] = {}
+_session_locks_lock = threading.Lock()
+
+
+def session_lock(session_id: str) -> threading.RLock:
+    """Lock serializing the writes of one session (reentrant)"""
+    with _session_locks_lock:
+        return _session_locks.setdefault(_session_path(session_id).stem, threading.RLock())
+
+
 def _ensure_dir():
     SESSIONS_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -28,25 +48,93 @@ def _session_path(session_id: str) -> Path:
     return SESSIONS_DIR / f"{safe_id}.json"
 
 
+def _table_path(session_id: str) -> Path:
+    """Get the file path for a session's performance table PNG"""
+    return _session_path(session_id).with_suffix(".png")
+
+
+def _remove_session_files(path: Path):
+    for target in (path, path.with_suffix(".png")):
+        try:
+            target.unlink()
+        except OSError:
+            pass
+    with _session_locks_lock:
+        _session_locks.pop(path.stem, None)
+
+
+def png_etag(png: bytes) -> str:
+    """Strong ETag for PNG bytes"""
+    return f'"{hashlib.sha256(png).hexdigest()[:32]}"'
+
+
 def save_session(
     session_id: str,
     evaluations: Dict[str, Any],
     training_type: str = "migraine",
     performance_table: Optional[str] = None,
+    performance_table_png: Optional[bytes] = None,
+    extra: Optional[Dict[str, Any]] = None,
 ):
-    """Save evaluation data for a session"""
+    """Save evaluation data for a session.
+
+    The performance table can be given as raw PNG bytes or (legacy) as a
+    base64 string; either way it is stored as a binary sidecar file.
+    `extra` holds additional fields (learner responses, scenario hashes,
+    performance table script; see backend.reevaluation).
+    """
     _ensure_dir()
+    if performance_table_png is None and performance_table:
+        performance_table_png = base64.b64decode(performance_table)
+
     data = {
+        **(extra or {}),
         "session_id": session_id,
         "evaluations": evaluations,
         "training_type": training_type,
         "created_at": time.time(),
         "last_accessed": time.time(),
         "chat_history": [],
-        "performance_table": performance_table,
     }
+    with session_lock(session_id):
+        data["performance_table_etag"] = (_write_table(session_id, performance_table_png)
+                                          if performance_table_png else None)
+        _write_json(_session_path(session_id), data)
+
+
+def _write_json(path: Path, data: Dict[str, Any]):
+    """Replace a session file atomically (readers never see a partial file)"""
+    tmp = path.with_suffix(f".json.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    tmp.replace(path)
+
+
+def _write_table(session_id: str, png: bytes) -> str:
+    """Write the performance table sidecar; returns its ETag"""
+    table_path = _table_path(session_id)
+    tmp = table_path.with_suffix(f".png.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(png)
+    tmp.replace(table_path)
+    return png_etag(png)
+
+
+def update_session(session_id: str, fields: Dict[str, Any], performance_table_png: Optional[bytes] = None) -> bool:
+    """Update fields of an existing session (chat history kept), and optionally its table.
+
+    Returns False when the session does not exist.
+    """
     path = _session_path(session_id)
-    path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    with session_lock(session_id):
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (json.JSONDecodeError, OSError):
+            return False
+        data.update(fields)
+        if performance_table_png:
+            data["performance_table_etag"] = _write_table(session_id, performance_table_png)
+        data["last_accessed"] = time.time()
+        _write_json(path, data)
+    return True
 
 
 def get_session(session_id: str) -> Optional[Dict[str, Any]]:
@@ -55,29 +143,45 @@ def get_session(session_id: str) -> Optional[Dict[str, Any]]:
     if not path.exists():
         return None
 
-    try:
-        data = json.loads(path.read_text(encoding="utf-8"))
-    except (json.JSONDecodeError, OSError):
-        return None
+    with session_lock(session_id):
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (json.JSONDecodeError, OSError):
+            return None
+
+        # Check TTL
+        last_accessed = data.get("last_accessed", 0)
+        if time.time() - last_accessed > SESSION_TTL_SECONDS:
+            # Session expired, clean up
+            _remove_session_files(path)
+            return None
 
-    # Check TTL
-    last_accessed = data.get("last_accessed", 0)
-    if time.time() - last_accessed > SESSION_TTL_SECONDS:
-        # Session expired, clean up
+        # Update last_accessed
+        data["last_accessed"] = time.time()
         try:
-            path.unlink()
+            _write_json(path, data)
         except OSError:
             pass
+
+    return data
+
+
+def get_performance_table_png(session_id: str) -> Optional[Tuple[bytes, str]]:
+    """Load a session's performance table as (png_bytes, etag), or None"""
+    session = get_session(session_id)
+    if session is None:
         return None
 
-    # Update last_accessed
-    data["last_accessed"] = time.time()
+    table_path = _table_path(session_id)
     try:
-        path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        png = table_path.read_bytes()
     except OSError:
-        pass
-
-    return data
+        # Sessions saved before the sidecar file kept the table as base64
+        legacy = session.get("performance_table")
+        if not legacy:
+            return None
+        png = base64.b64decode(legacy)
+    return png, session.get("performance_table_etag") or png_etag(png)
 
 
 def save_chat_history(session_id: str, history: List[Dict[str, str]]):
@@ -87,10 +191,11 @@ def save_chat_history(session_id: str, history: List[Dict[str, str]]):
         return
 
     try:
-        data = json.loads(path.read_text(encoding="utf-8"))
-        data["chat_history"] = history
-        data["last_accessed"] = time.time()
-        path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        with session_lock(session_id):
+            data = json.loads(path.read_text(encoding="utf-8"))
+            data["chat_history"] = history
+            data["last_accessed"] = time.time()
+            _write_json(path, data)
     except (json.JSONDecodeError, OSError):
         pass
 
@@ -110,10 +215,11 @@ def delete_session_chat(session_id: str):
         return
 
     try:
-        data = json.loads(path.read_text(encoding="utf-8"))
-        data["chat_history"] = []
-        data["last_accessed"] = time.time()
-        path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        with session_lock(session_id):
+            data = json.loads(path.read_text(encoding="utf-8"))
+            data["chat_history"] = []
+            data["last_accessed"] = time.time()
+            _write_json(path, data)
     except (json.JSONDecodeError, OSError):
         pass
 
@@ -127,15 +233,34 @@ def cleanup_expired_sessions():
             data = json.loads(path.read_text(encoding="utf-8"))
             last_accessed = data.get("last_accessed", 0)
             if now - last_accessed > SESSION_TTL_SECONDS:
-                path.unlink()
+                _remove_session_files(path)
         except (json.JSONDecodeError, OSError):
             # Remove corrupted files
+            _remove_session_files(path)
+    # PNG sidecars whose session is gone
+    for path in SESSIONS_DIR.glob("*.png"):
+        if not path.with_suffix(".json").exists():
             try:
                 path.unlink()
             except OSError:
                 pass
 
 
+def count_active_sessions() -> int:
+    """Number of sessions accessed within the TTL (by file modification time)"""
+    if not SESSIONS_DIR.exists():
+        return 0
+    cutoff = time.time() - SESSION_TTL_SECONDS
+    count = 0
+    for path in SESSIONS_DIR.glob("*.json"):
+        try:
+            if path.stat().st_mtime >= cutoff:
+                count += 1
+        except OSError:
+            pass
+    return count
+
+
 def generate_session_id() -> str:
     """Generate a unique session ID"""
     import uuid
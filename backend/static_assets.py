@@ -0,0 +1,195 @@
+"""
+Static Asset Layer
+
+Serves the frontend (HTML pages, styles.css, app.js) from memory.
+
+At startup every file is read once and prepared:
+- a content-hashed strong ETag, so repeat visits revalidate to 304s,
+- gzip (and brotli, when the `brotli` package is installed) variants,
+  kept only when smaller than the original,
+- HTML pages reference `styles.css?v=<hash>` / `app.js?v=<hash>`; those
+  versioned URLs are cached for a year as immutable, and HTML responses
+  carry `Link: rel=preload` headers for them.
+
+Unversioned requests get `Cache-Control: no-cache`: the browser keeps its
+copy and revalidates with If-None-Match.
+
+Set STATIC_ASSETS_RELOAD=1 during frontend development to pick up file
+changes without restarting the server.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+FRONTEND_DIR = Path(__file__).parent.parent / "frontend"
+VERSIONED_ASSETS = ["styles.css", "app.js"]
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+MIN_COMPRESS_BYTES = 512
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+RELOAD = os.getenv("STATIC_ASSETS_RELOAD", "").lower() in ("1", "true", "yes")
+
+_PRELOAD_AS = {".css": "style", ".js": "script"}
+
+
+class StaticAsset:
+    """One frontend file with its precomputed representations"""
+
+    def __init__(self, name: str, path: Path, body: bytes, media_type: str):
+        self.name = name
+        self.path = path
+        self.mtime = path.stat().st_mtime
+        self.media_type = media_type
+        self.version = hashlib.sha256(body).hexdigest()[:16]
+        self.variants: Dict[str, bytes] = {"identity": body}
+        self.preload: List[str] = []
+
+        if media_type.startswith(COMPRESSIBLE_TYPES) and len(body) >= MIN_COMPRESS_BYTES:
+            gz = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(gz) < len(body):
+                self.variants["gzip"] = gz
+            if brotli is not None:
+                br = brotli.compress(body, quality=11)
+                if len(br) < len(body):
+                    self.variants["br"] = br
+
+    def etag(self, encoding: str) -> str:
+        return f'"{self.version}"' if encoding == "identity" else f'"{self.version}-{encoding}"'
+
+    def etags(self) -> List[str]:
+        return [self.etag(encoding) for encoding in self.variants]
+
+
+def _accepted_encodings(header: str) -> List[str]:
+    """Encodings from Accept-Encoding, dropping those with q=0"""
+    accepted = []
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        if not token:
+            continue
+        q = params.strip()
+        if q.startswith("q=") and q[2:].strip() in ("0", "0.0", "0.00", "0.000"):
+            continue
+        accepted.append(token.strip().lower())
+    return accepted
+
+
+class StaticAssetStore:
+    """In-memory, precompressed frontend files"""
+
+    def __init__(self, root: Path = FRONTEND_DIR):
+        self.root = root
+        self._assets: Dict[str, StaticAsset] = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def load(self):
+        """Read and prepare every frontend file (versioned assets first)"""
+        assets: Dict[str, StaticAsset] = {}
+        if not self.root.exists():
+            print(f"⚠️  Frontend directory not found: {self.root}")
+        else:
+            files = sorted(p for p in self.root.iterdir() if p.is_file())
+            # Versioned assets first: HTML pages embed their hashes
+            files.sort(key=lambda p: p.name not in VERSIONED_ASSETS)
+            for path in files:
+                assets[path.name] = self._prepare(path, assets)
+        with self._lock:
+            self._assets = assets
+            self._loaded = True
+        total = sum(len(a.variants["identity"]) for a in assets.values())
+        print(f"🗂️  Static assets loaded: {len(assets)} files, {total} bytes"
+              f" (gzip{', brotli' if brotli is not None else ''})")
+
+    def _prepare(self, path: Path, assets: Dict[str, StaticAsset]) -> StaticAsset:
+        body = path.read_bytes()
+        media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        if media_type == "text/javascript":
+            media_type = "application/javascript"
+        if media_type.startswith("text/"):
+            media_type += "; charset=utf-8"
+
+        preload = []
+        if path.suffix == ".html":
+            text = body.decode("utf-8")
+            for name in VERSIONED_ASSETS:
+                versioned = assets.get(name)
+                if versioned is None:
+                    continue
+                url = f"{name}?v={versioned.version}"
+                text, count = re.subn(rf'(?<=["\'/]){re.escape(name)}(?=["\'])', url, text)
+                if count:
+                    kind = _PRELOAD_AS.get(Path(name).suffix)
+                    preload.append(f"</{url}>; rel=preload; as={kind}")
+            body = text.encode("utf-8")
+
+        asset = StaticAsset(path.name, path, body, media_type)
+        asset.preload = preload
+        return asset
+
+    def get(self, name: str) -> Optional[StaticAsset]:
+        if not self._loaded:
+            self.load()
+        asset = self._assets.get(name)
+        if RELOAD and asset is not None:
+            try:
+                changed = asset.path.stat().st_mtime != asset.mtime
+            except OSError:
+                changed = True
+            if changed:
+                self.load()
+                asset = self._assets.get(name)
+        return asset
+
+    def response(self, name: str, request: Request) -> Optional[Response]:
+        """Build the response for a frontend file, or None if it does not exist"""
+        asset = self.get(name)
+        if asset is None:
+            return None
+
+        versioned = request.query_params.get("v") == asset.version
+        headers = {
+            "Cache-Control": IMMUTABLE_CACHE_CONTROL if versioned else REVALIDATE_CACHE_CONTROL,
+            "Vary": "Accept-Encoding",
+        }
+        if asset.preload:
+            headers["Link"] = ", ".join(asset.preload)
+
+        accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+        encoding = next((e for e in ("br", "gzip") if e in accepted and e in asset.variants), "identity")
+        headers["ETag"] = asset.etag(encoding)
+
+        if_none_match = request.headers.get("if-none-match", "")
+        if if_none_match:
+            tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            if "*" in tags or tags.intersection(asset.etags()):
+                return Response(status_code=304, headers=headers)
+
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(content=asset.variants[encoding], media_type=asset.media_type, headers=headers)
+
+
+_store_instance: Optional[StaticAssetStore] = None
+
+
+def get_static_assets() -> StaticAssetStore:
+    """Process-wide static asset store"""
+    global _store_instance
+    if _store_instance is None:
+        _store_instance = StaticAssetStore()
+    return _store_instance
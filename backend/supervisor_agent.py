@@ -5,11 +5,9 @@ The supervisor agent decides which tools to call based on the user's query.
 It uses Claude with tool binding to handle tool calling automatically.
 """
 
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_anthropic import ChatAnthropic
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage
-import os
 import json
 
 from backend.supervisor_tools import (
@@ -21,6 +19,9 @@ from backend.supervisor_tools import (
     search_knowledge_base
 )
 from backend.llm_retry import invoke_with_retry
+from backend.model_registry import get_chat_model
+from backend.usage_ledger import budget_degraded, DEGRADED_HISTORY_MESSAGES
+from backend.timing import span
 
 
 SUPERVISOR_SYSTEM_PROMPT = """You are a supervisor agent that decides which tools to call to help answer the user's question.
@@ -68,6 +69,13 @@ you must instruct the chat agent to inform the user that this information is not
      - Describe what type of visualization to create
      - Include any styling preferences mentioned by the user
 
+  4. `chart_type` parameter (pre-built charts, rendered instantly — prefer them when they match):
+     - "scenario_comparison": comparison table of the learner's responses vs. the experts, per scenario
+     - "coverage_distribution": distribution of scenarios by level of alignment with expert key elements
+     - "skills_by_objective": learning objectives, convergence with experts vs. points for reflection
+     - "key_elements_vs_themes": expert key elements vs. themes addressed by the learner
+     - Leave empty for anything else (custom code will be generated)
+
 - **search_web**: Call when user asks about latest/recent/current information, OR when other tools
   cannot provide the needed information
   - Keywords: "dernière", "récent", "actuel", "nouveau"
@@ -75,6 +83,8 @@ you must instruct the chat agent to inform the user that this information is not
 
 - **get_training_content**: Call when user asks about specific training scenarios or what experts said
   - Keywords: "scénario", "situation", "module", "experts disent", "formation"
+  - Pass the situation / scenario numbers the user mentions (and section="experts" for what experts said)
+    so only that slice is retrieved
 
 - **search_knowledge_base**: Call for ANY question that goes beyond the learner's evaluation data
   and training content. This includes:
@@ -105,6 +115,41 @@ you must instruct the chat agent to inform the user that this information is not
 """
 
 
+def execute_tool_call(tool_call: Dict[str, Any]) -> Tuple[bool, Optional[Dict[str, Any]]]:
+    """
+    Execute a single tool call emitted by a tool-bound LLM.
+
+    Returns:
+        (succeeded, result) where result is the parsed tool output, an error
+        dict if the tool raised, or None if no tool matches the name.
+    """
+    tool_name = tool_call['name']
+    tool_args = tool_call['args']
+
+    print(f"\n📞 Calling tool: {tool_name}")
+    print(f"   Args: {tool_args}")
+
+    # Find and execute the tool
+    tool_func = None
+    for tool in ALL_TOOLS:
+        if tool.name == tool_name:
+            tool_func = tool
+            break
+
+    if tool_func is None:
+        print(f"   ⚠️  Tool not found: {tool_name}")
+        return False, None
+
+    try:
+        with span(f"tool.{tool_name}"):
+            result = tool_func.invoke(tool_args)
+        print(f"   ✅ Success: {tool_name}")
+        return True, json.loads(result) if isinstance(result, str) else result
+    except Exception as e:
+        print(f"   ❌ Error in {tool_name}: {e}")
+        return False, {"status": "error", "error": str(e)}
+
+
 class SupervisorAgent:
     """Supervisor agent that decides which tools to call"""
 
@@ -116,11 +161,8 @@ class SupervisorAgent:
         initialize_tools(evaluations, training_type)
 
         # Create LLM for supervisor with tool binding
-        self.llm = ChatAnthropic(
-            model="claude-sonnet-4-6",
-            temperature=0.3,  # Lower temperature for more consistent decisions
-            anthropic_api_key=os.getenv("ANTHROPIC_API_KEY")
-        )
+        # Routing is a classification task: small fast model by default
+        self.llm = get_chat_model("supervisor")
 
         # Bind tools to the LLM
         self.llm_with_tools = self.llm.bind_tools(ALL_TOOLS)
@@ -170,7 +212,8 @@ Analyze the request and call appropriate tools. If no tools are needed, just res
             ]
 
             # Get initial response with tool calls
-            response = invoke_with_retry(self.llm_with_tools.invoke, messages)
+            with span("supervisor.llm"):
+                response = invoke_with_retry(self.llm_with_tools.invoke, messages, component="supervisor")
 
             # Track token usage from supervisor LLM call
             turn_tokens = 0
@@ -187,29 +230,12 @@ Analyze the request and call appropriate tools. If no tools are needed, just res
 
                 for tool_call in response.tool_calls:
                     tool_name = tool_call['name']
-                    tool_args = tool_call['args']
-
-                    print(f"\n📞 Calling tool: {tool_name}")
-                    print(f"   Args: {tool_args}")
-
-                    # Find and execute the tool
-                    tool_func = None
-                    for tool in ALL_TOOLS:
-                        if tool.name == tool_name:
-                            tool_func = tool
-                            break
-
-                    if tool_func:
-                        try:
-                            result = tool_func.invoke(tool_args)
-                            tools_called.append(tool_name)
-                            tool_results[tool_name] = json.loads(result) if isinstance(result, str) else result
-                            print(f"   ✅ Success: {tool_name}")
-                        except Exception as e:
-                            print(f"   ❌ Error in {tool_name}: {e}")
-                            tool_results[tool_name] = {"status": "error", "error": str(e)}
-                    else:
-                        print(f"   ⚠️  Tool not found: {tool_name}")
+                    succeeded, result = execute_tool_call(tool_call)
+                    if result is None:
+                        continue
+                    if succeeded:
+                        tools_called.append(tool_name)
+                    tool_results[tool_name] = result
             else:
                 print(f"\n✅ No tools needed for this query")
 
@@ -241,8 +267,10 @@ Analyze the request and call appropriate tools. If no tools are needed, just res
     def _format_conversation_history(self, messages: List[BaseMessage]) -> str:
         """Format conversation history for the supervisor"""
         formatted = []
-        # Include more messages (last 10) to have enough context for visualization requests
-        for msg in messages[-10:]:
+        # Include more messages (last 10) to have enough context for visualization requests,
+        # fewer once the token budget runs low
+        limit = DEGRADED_HISTORY_MESSAGES if budget_degraded() else 10
+        for msg in messages[-limit:]:
             if isinstance(msg, HumanMessage):
                 formatted.append({"type": "human", "content": msg.content})
             elif isinstance(msg, AIMessage):
@@ -8,7 +8,7 @@ NOTE: All heavy imports (CodeGenerationTool, WebSearchTool, RAG) are lazy-loaded
 to speed up application startup and pass health checks.
 """
 
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from langchain.tools import tool
 from langchain_core.messages import BaseMessage
 import json
@@ -19,45 +19,22 @@ _code_tool_instance = None
 _web_search_tool_instance = None
 _rag_module_instance = None
 
-# Lazy import cache
-_training_data_cache = None
-
 # Current training type (set during initialization)
 _current_training_type = "migraine"
 
 
-def _get_training_data():
-    """Lazy load training data based on current training type"""
-    global _training_data_cache
-    if _training_data_cache is None:
-        if _current_training_type == "migraine":
-            from trainings_2_experts import training_1, training_2, training_3
-            _training_data_cache = {"training_1": training_1, "training_2": training_2, "training_3": training_3}
-        elif _current_training_type == "nursing_1st":
-            from trainings_nursing_1stLearner import training_1
-            _training_data_cache = {"training_1": training_1}
-        elif _current_training_type == "nursing_2nd":
-            from trainings_nursing_2ndLearner import training_1
-            _training_data_cache = {"training_1": training_1}
-        elif _current_training_type == "leadership_1st":
-            from trainings_leadership_1srLearner import training_1
-            _training_data_cache = {"training_1": training_1}
-        elif _current_training_type == "leadership_2nd":
-            from trainings_leadership_2ndLearner import training_1
-            _training_data_cache = {"training_1": training_1}
-        elif _current_training_type == "leadership_3rd":
-            from trainings_leadership_3rdLearner import training_1
-            _training_data_cache = {"training_1": training_1}
-    return _training_data_cache
+def _get_training():
+    """Catalog entry of the current training type (texts and index are loaded once)"""
+    from backend.training_catalog import get_training
+    return get_training(_current_training_type)
 
 
 def initialize_tools(evaluations: Dict[str, Any], training_type: str = "migraine"):
     """Initialize tool instances with evaluation data and training type"""
     global _code_tool_instance, _web_search_tool_instance, _rag_module_instance
-    global _current_training_type, _training_data_cache
+    global _current_training_type
 
     _current_training_type = training_type
-    _training_data_cache = None  # Reset cache when training type changes
 
     # Lazy import CodeGenerationTool
     from backend.code_tool import CodeGenerationTool
@@ -73,7 +50,7 @@ def initialize_tools(evaluations: Dict[str, Any], training_type: str = "migraine
 
 
 @tool
-def generate_visualization(user_request: str, conversation_history: str, data_context: str = "", include_evaluation_data: bool = False) -> str:
+def generate_visualization(user_request: str, conversation_history: str, data_context: str = "", include_evaluation_data: bool = False, chart_type: str = "", module_number: int = 0) -> str:
     """
     Generate a visualization (chart, table, graph) based on the user's request.
 
@@ -95,6 +72,19 @@ def generate_visualization(user_request: str, conversation_history: str, data_co
                                  performance, evaluation scores, or training results.
                                  Set to False if visualizing other data (diagnostic criteria,
                                  guidelines, knowledge base content, etc.)
+        chart_type: Optional pre-built chart about the learner's evaluation. When the request
+                    matches one of these, set it (and include_evaluation_data=True) — it renders
+                    instantly without code generation:
+                    - "scenario_comparison": per-scenario table comparing the learner's
+                      responses with the experts (themes addressed vs. themes to explore)
+                    - "coverage_distribution": how many scenarios fall in each level of
+                      alignment with the expert key elements
+                    - "skills_by_objective": learning objectives, convergence with experts
+                      vs. points for reflection
+                    - "key_elements_vs_themes": expert key elements next to the themes the
+                      learner addressed
+                    Leave empty for any other visualization.
+        module_number: With chart_type, restrict the chart to one module (0 = all modules)
 
     Returns:
         JSON string containing:
@@ -109,10 +99,27 @@ def generate_visualization(user_request: str, conversation_history: str, data_co
 
         2. User asks to visualize diagnostic criteria from knowledge base:
            -> include_evaluation_data=False, data_context="Les critères: 1)..., 2)..."
+
+        3. User asks for "un tableau comparatif de mes réponses avec celles des experts":
+           -> include_evaluation_data=True, chart_type="scenario_comparison"
     """
     if _code_tool_instance is None:
         return json.dumps({"status": "error", "error": "Code tool not initialized"})
 
+    # Canonical charts skip code generation entirely
+    from backend.canonical_charts import CANONICAL_CHARTS, render_canonical_chart
+    if chart_type in CANONICAL_CHARTS:
+        try:
+            output_data = render_canonical_chart(chart_type, _code_tool_instance.evaluations, module_number)
+            return json.dumps({
+                "status": "success",
+                "code": "",
+                "chart_type": chart_type,
+                "output": output_data
+            }, ensure_ascii=False)
+        except Exception as e:
+            print(f"⚠️  Canonical chart {chart_type} failed, falling back to code generation: {e}")
+
     try:
         # Parse conversation history
         history = json.loads(conversation_history) if conversation_history else []
@@ -161,7 +168,7 @@ def generate_visualization(user_request: str, conversation_history: str, data_co
 
 
 @tool
-def search_web(query: str) -> str:
+def search_web(query: str, alternative_queries: Optional[List[str]] = None) -> str:
     """
     Search the web for current medical information, guidelines, or recent research.
 
@@ -174,6 +181,9 @@ def search_web(query: str) -> str:
 
     Args:
         query: The search query (can be in French or English)
+        alternative_queries: Up to 2 other phrasings of the same question (e.g. the
+            English translation, or medical terms instead of lay terms), searched in
+            parallel with the query; results are merged
 
     Returns:
         JSON string containing:
@@ -184,15 +194,16 @@ def search_web(query: str) -> str:
 
     Example:
         User: "Quelles sont les dernières recommandations pour la migraine?"
-        -> Call this tool with query="latest migraine treatment guidelines"
+        -> Call this tool with query="latest migraine treatment guidelines",
+           alternative_queries=["recommandations traitement migraine 2025"]
         -> Returns search results with citations
     """
     if _web_search_tool_instance is None:
         return json.dumps({"status": "error", "error": "Web search tool not initialized"})
 
     try:
-        # Perform search
-        results = _web_search_tool_instance.search(query, max_results=5)
+        # Search the query and its reformulations in parallel
+        results = _web_search_tool_instance.multi_search(query, alternative_queries, max_results=5)
 
         # Format results
         formatted = _web_search_tool_instance.format_results_for_llm(results)
@@ -210,9 +221,12 @@ def search_web(query: str) -> str:
 
 
 @tool
-def get_training_content(module_number: int, section: str = "all") -> str:
+def get_training_content(module_number: int, section: str = "all", situation: int = 0, scenario: int = 0) -> str:
     """
-    Retrieve the full content of a training module when the user asks about specific training scenarios, or expert panel responses that are not in the evaluation summary.
+    Retrieve training module content when the user asks about specific training scenarios, or expert panel responses that are not in the evaluation summary.
+
+    Select the situation and/or scenario the user asks about whenever possible: only
+    that slice is returned, instead of the whole module.
 
     Use this tool when:
     - User asks about specific scenarios/situations in a training module
@@ -222,37 +236,32 @@ def get_training_content(module_number: int, section: str = "all") -> str:
 
     Args:
         module_number: The training module number (available modules depend on training type)
-        section: Which section to retrieve ("all", "scenarios", "objectives")
+        section: Which part to retrieve:
+                 "all" (scenario text with expert and learner responses),
+                 "experts" (scenario text with expert responses only),
+                 "learner" (scenario text with the learner's response only),
+                 "scenarios" (scenario text only), "objectives" (training objectives)
+        situation: Situation number (0 = all situations)
+        scenario: Scenario number (0 = all scenarios). Scenario numbers run through the
+                  module; with a situation, scenario=1 also means its first scenario.
 
     Returns:
         JSON string containing:
         - "status": "success" or "error"
         - "module_name": Name of the module
-        - "content": The full training content
-        - "section": Which section was retrieved
+        - "content": The selected training content
+        - "section", "situation", "scenario": What was retrieved
+        - "outline": {situation: [scenario numbers]} of the module
 
     Example:
-        User: "Que disent les experts dans le scénario 2 du module 1?"
-        -> Call this tool with module_number=1, section="all"
-        -> Returns full module 1 content so the chat agent can answer
+        User: "Que disent les experts dans le scénario 2 de la situation 1 du module 1?"
+        -> Call this tool with module_number=1, situation=1, scenario=2, section="experts"
+        -> Returns only that scenario and its expert responses
     """
     try:
-        training_data = _get_training_data()
-
-        if _current_training_type == "migraine":
-            names = {
-                "training_1": "Module 1: Diagnostic et suivi de la migraine",
-                "training_2": "Module 2: Traitement aigu et gestion des habitudes de vie",
-                "training_3": "Module 3: Traitement préventif de la migraine"
-            }
-        elif _current_training_type in ("leadership_1st", "leadership_2nd", "leadership_3rd"):
-            names = {
-                "training_1": "Module 1: Leadership et prise de decision"
-            }
-        else:
-            names = {
-                "training_1": "Module 1: Leadership et collaboration en soins infirmiers"
-            }
+        training = _get_training()
+        training_data = training.trainings
+        names = training.module_names
 
         key = f"training_{module_number}"
         if key not in training_data:
@@ -262,11 +271,20 @@ def get_training_content(module_number: int, section: str = "all") -> str:
                 "error": f"Invalid module number: {module_number}. Available: {available}"
             })
 
+        index = training.index
+        try:
+            content = index.content(module_number, situation=situation, scenario=scenario, section=section)
+        except (KeyError, ValueError) as e:
+            return json.dumps({"status": "error", "error": e.args[0], "outline": index.outline(module_number)})
+
         return json.dumps({
             "status": "success",
             "module_name": names.get(key, key),
-            "content": training_data[key],
-            "section": section
+            "content": content,
+            "section": section,
+            "situation": situation,
+            "scenario": scenario,
+            "outline": index.outline(module_number)
         })
 
     except Exception as e:
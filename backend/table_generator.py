@@ -2,23 +2,27 @@
 Performance table generator.
 
 Calls Claude with the TABLE_GENERATOR_PROMPT to produce a Python matplotlib
-script tailored to the evaluation JSON, executes it in-process, and returns
-the resulting PNG as a base64-encoded string.
+script tailored to the evaluation JSON, executes it on the rendering backend
+(see backend/rendering.py), and returns the resulting PNG as raw bytes (or
+as a base64-encoded string).
+
+The script is kept with the session so that, after an incremental
+re-evaluation, only the rows of the re-evaluated scenarios are asked of the
+model (TABLE_ROWS_PROMPT) and spliced into its `data` list.
 """
 
-import io
+import ast
 import json
 import base64
-import os
 import re
-from typing import Dict, Any
+from typing import Any, Dict, List, Optional, Tuple
 
 from langchain_core.messages import SystemMessage, HumanMessage
-from langchain_anthropic import ChatAnthropic
 from dotenv import load_dotenv
 
-from backend.example_table import TABLE_GENERATOR_PROMPT
+from backend.example_table import TABLE_GENERATOR_PROMPT, TABLE_ROWS_PROMPT
 from backend.llm_retry import invoke_with_retry
+from backend.model_registry import get_chat_model
 
 load_dotenv()
 
@@ -46,55 +50,103 @@ def _patch_savefig_to_buffer(script: str) -> str:
 
 
 def _exec_table_script(script: str) -> bytes:
-    import matplotlib
-    matplotlib.use("Agg")
-    import matplotlib.pyplot as plt
-    import matplotlib.patches as mpatches
-    from matplotlib.gridspec import GridSpec
-    import numpy as np
-
-    buf = io.BytesIO()
-    exec_globals: Dict[str, Any] = {
-        "__builtins__": __builtins__,
-        "matplotlib": matplotlib,
-        "plt": plt,
-        "mpatches": mpatches,
-        "GridSpec": GridSpec,
-        "np": np,
-        "io": io,
-        "base64": base64,
-        "_buf": buf,
-    }
-    try:
-        exec(compile(script, "<table_generator>", "exec"), exec_globals)
-    finally:
-        plt.close("all")
+    from backend.rendering import render_table_script
 
-    data = buf.getvalue()
-    if not data:
-        raise RuntimeError("Table script produced no PNG bytes")
-    return data
+    return render_table_script(script)
 
 
-def generate_performance_table(evaluations: Dict[str, Any]) -> str:
-    """Generate the performance table PNG and return it as a base64 string."""
+def render_performance_table(evaluations: Dict[str, Any]) -> Tuple[bytes, str]:
+    """Generate the performance table; returns the PNG bytes and the script that drew it."""
     print("\n🖼️  Generating performance table...")
 
-    llm = ChatAnthropic(
-        model="claude-sonnet-4-6",
-        temperature=0,
-        anthropic_api_key=os.getenv("ANTHROPIC_API_KEY"),
-    )
+    llm = get_chat_model("table")
 
     messages = [
         SystemMessage(content=TABLE_GENERATOR_PROMPT),
         HumanMessage(content=json.dumps(evaluations, ensure_ascii=False)),
     ]
-    response = invoke_with_retry(llm.invoke, messages)
+    response = invoke_with_retry(llm.invoke, messages, component="table")
     script = _strip_code_fences(response.content)
     script = _patch_savefig_to_buffer(script)
 
     png_bytes = _exec_table_script(script)
-    b64 = base64.b64encode(png_bytes).decode("ascii")
-    print(f"✅ Performance table generated ({len(b64)} base64 chars)")
-    return b64
+    print(f"✅ Performance table generated ({len(png_bytes)} bytes)")
+    return png_bytes, script
+
+
+def generate_performance_table_png(evaluations: Dict[str, Any]) -> bytes:
+    """Generate the performance table and return the raw PNG bytes."""
+    return render_performance_table(evaluations)[0]
+
+
+def table_row_keys(evaluations: Dict[str, Any]) -> List[Tuple[str, str, str]]:
+    """(module, situation key, scenario key) of each table row, in row order"""
+    return [(module, sit_key, scen_key)
+            for module, training in evaluations.items()
+            for sit_key, situation in (training or {}).get("situations", {}).items()
+            for scen_key in (situation or {}).get("scenarios", {})]
+
+
+def _data_rows(script: str) -> Optional[Tuple[ast.Assign, List[List[str]]]]:
+    """The `data = [...]` assignment of a table script and its rows, if it is a literal list"""
+    try:
+        tree = ast.parse(script)
+    except SyntaxError:
+        return None
+    for node in tree.body:
+        if (isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name)
+                and node.targets[0].id == "data" and isinstance(node.value, ast.List) and node.col_offset == 0):
+            try:
+                return node, ast.literal_eval(node.value)
+            except ValueError:
+                return None
+    return None
+
+
+def update_performance_table_rows(script: str, evaluations: Dict[str, Any],
+                                  changed: List[Tuple[str, str, str]]) -> Optional[Tuple[bytes, str]]:
+    """Redraw a stored table script with new cells for the changed scenarios only.
+
+    Returns the PNG bytes and the updated script, or None when the script
+    cannot be updated in place (no literal `data` list, or its rows do not
+    match the scenarios one to one); regenerate the whole table then.
+    """
+    found = _data_rows(script)
+    keys = table_row_keys(evaluations)
+    if found is None or len(found[1]) != len(keys):
+        return None
+    node, rows = found
+    positions = {key: i for i, key in enumerate(keys)}
+    items = [{"row": positions[key] + 1, **evaluations[key[0]]["situations"][key[1]]["scenarios"][key[2]]}
+             for key in changed]
+    if not items:
+        return None
+
+    from models import PerformanceTableRows
+
+    print(f"\n🖼️  Updating {len(items)} performance table row(s)...")
+    structured_llm = get_chat_model("table").with_structured_output(PerformanceTableRows)
+    messages = [
+        SystemMessage(content=TABLE_ROWS_PROMPT),
+        HumanMessage(content=json.dumps(items, ensure_ascii=False)),
+    ]
+    result = invoke_with_retry(structured_llm.invoke, messages, component="table")
+    updates = {row.row: row for row in result.rows}
+    if set(updates) != {item["row"] for item in items}:
+        return None
+    for number, row in updates.items():
+        # Scenario label and situation title stay as drawn
+        rows[number - 1][2:] = [row.coverage, row.logical_reasoning, row.communication,
+                                row.themes_addressed, row.themes_missing]
+
+    lines = script.split("\n")
+    data = "data = [\n" + "".join(f"    {row!r},\n" for row in rows) + "]"
+    script = "\n".join(lines[:node.lineno - 1] + [data] + lines[node.end_lineno:])
+    png_bytes = _exec_table_script(script)
+    print(f"✅ Performance table updated ({len(png_bytes)} bytes)")
+    return png_bytes, script
+
+
+def generate_performance_table(evaluations: Dict[str, Any]) -> str:
+    """Generate the performance table PNG and return it as a base64 string."""
+    return base64.b64encode(generate_performance_table_png(evaluations)).decode("ascii")
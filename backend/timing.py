@@ -0,0 +1,122 @@
+"""
+Stage Timing
+
+Lightweight spans for measuring where a chat turn spends its time.
+
+    with start_trace("chat") as trace:
+        with span("supervisor.llm"):
+            ...
+        trace.summary()   # {"total_ms": ..., "spans": [...]}
+
+Spans nest through contextvars, so the current trace follows the request
+into LangGraph nodes and worker threads started with a copied context.
+Outside of a trace, spans still time their block and log it.
+
+Every finished span is printed as one JSON line (disable with TIMING_LOGS=0):
+
+    {"event": "span", "name": "rag.rank", "ms": 812.4, "trace": "chat", ...}
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional, Iterator
+
+TIMING_LOGS = os.getenv("TIMING_LOGS", "1").lower() not in ("0", "false", "no")
+
+
+class Trace:
+    """Spans recorded during one unit of work (e.g. one chat turn)"""
+
+    def __init__(self, name: str, **attrs):
+        self.name = name
+        self.trace_id = uuid.uuid4().hex[:12]
+        self.attrs = attrs
+        self.started = time.perf_counter()
+        self.ended: Optional[float] = None
+        self.spans: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add(self, record: Dict[str, Any]):
+        with self._lock:
+            self.spans.append(record)
+
+    @property
+    def total_ms(self) -> float:
+        end = self.ended if self.ended is not None else time.perf_counter()
+        return round((end - self.started) * 1000, 1)
+
+    def summary(self) -> Dict[str, Any]:
+        """Per-span breakdown plus totals per stage name"""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s["start_ms"])
+        by_stage: Dict[str, Dict[str, float]] = {}
+        for record in spans:
+            stage = by_stage.setdefault(record["name"], {"count": 0, "total_ms": 0.0})
+            stage["count"] += 1
+            stage["total_ms"] = round(stage["total_ms"] + record["ms"], 1)
+        return {"trace_id": self.trace_id, "total_ms": self.total_ms, "stages": by_stage, "spans": spans}
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("timing_trace", default=None)
+_current_span: ContextVar[Optional[str]] = ContextVar("timing_span", default=None)
+
+
+def _emit(record: Dict[str, Any]):
+    if TIMING_LOGS:
+        print(json.dumps(record, ensure_ascii=False, default=str), flush=True)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def start_trace(name: str, **attrs) -> Iterator[Trace]:
+    """Open a trace for the enclosed block and make it current"""
+    trace = Trace(name, **attrs)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        trace.ended = time.perf_counter()
+        _current_trace.reset(token)
+        _emit({"event": "trace", "name": name, "trace_id": trace.trace_id,
+               "ms": trace.total_ms, **attrs})
+
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[Dict[str, Any]]:
+    """Time the enclosed block; yields a dict for attributes known only at the end"""
+    trace = _current_trace.get()
+    parent = _current_span.get()
+    token = _current_span.set(name)
+    extra: Dict[str, Any] = {}
+    start = time.perf_counter()
+    error = None
+    try:
+        yield extra
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+        _current_span.reset(token)
+        record: Dict[str, Any] = {"name": name, "ms": elapsed_ms}
+        if parent:
+            record["parent"] = parent
+        record.update(attrs)
+        record.update(extra)
+        if error:
+            record["error"] = error
+        if trace is not None:
+            record["start_ms"] = round((start - trace.started) * 1000, 1)
+            trace.add(record)
+        _emit({"event": "span", **record,
+               "trace": trace.name if trace else None,
+               "trace_id": trace.trace_id if trace else None})
+
@@ -0,0 +1,225 @@
+"""
+Training Catalog
+
+Single source of truth for the trainings: per training type, the module
+names, the training texts and objectives, the reference documents folder
+and the Chroma collection of the knowledge base. The evaluator, the chat
+agent, the supervisor tools, the RAG module and the /trainings endpoint all
+read it instead of importing the trainings_*.py modules themselves.
+
+- Built-in trainings (BUILTIN_TRAININGS) are declared here; their texts are
+  imported lazily from the trainings_*.py modules on first use.
+- More trainings can be dropped in TRAINING_DATA_DIR as <training_type>.json:
+
+      {
+        "name": "Soins palliatifs",
+        "objectives": "Training Objectives:\\n- ...",
+        "modules": {
+          "training_1": {"name": "Module 1: ...", "path": "palliatifs_1.txt"},
+          "training_2": {"name": "Module 2: ...", "content": "<Situation 1> ..."}
+        },
+        "docs": "Docs_palliatifs",
+        "collection": "knowledge_base_palliatifs"
+      }
+
+  "path" is relative to the JSON file, "docs" to the project root. A data
+  file with the name of a built-in training replaces it.
+- The data directory is rescanned at most every
+  TRAINING_CATALOG_RELOAD_SECONDS: new, changed or deleted files take effect
+  on the next request, without restarting the workers.
+
+Texts and their parsed index (backend.training_index) are loaded once per
+training and version.
+"""
+
+import importlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+ROOT_DIR = Path(__file__).parent.parent
+TRAINING_DATA_DIR = Path(os.getenv("TRAINING_DATA_DIR", str(ROOT_DIR / "training_data")))
+TRAINING_CATALOG_RELOAD_SECONDS = float(os.getenv("TRAINING_CATALOG_RELOAD_SECONDS", "10"))
+
+_MIGRAINE_MODULES = {
+    "training_1": "Module 1: Diagnostic et suivi de la migraine",
+    "training_2": "Module 2: Traitement aigu et gestion des habitudes de vie de la migraine",
+    "training_3": "Module 3: Traitement préventif de la migraine",
+}
+_NURSING_MODULES = {"training_1": "Module 1: Leadership et collaboration en soins infirmiers"}
+_LEADERSHIP_MODULES = {"training_1": "Module 1: Leadership et prise de decision"}
+
+# training_type -> {"name", "source" (Python module with training_<n> and
+# training_objectives), "modules" ({key: name}), "docs", "collection"}
+BUILTIN_TRAININGS: Dict[str, Dict[str, Any]] = {
+    "migraine": {"name": "Migraine", "source": "trainings_2_experts", "modules": _MIGRAINE_MODULES,
+                 "docs": "Docs_migraine", "collection": "knowledge_base_migraine"},
+    # Both nursing learners share the same reference documents and collection
+    "nursing_1st": {"name": "Nursing Leadership (1st Learner)", "source": "trainings_nursing_1stLearner",
+                    "modules": _NURSING_MODULES, "docs": "Docs_nursing", "collection": "knowledge_base_nursing"},
+    "nursing_2nd": {"name": "Nursing Leadership (2nd Learner)", "source": "trainings_nursing_2ndLearner",
+                    "modules": _NURSING_MODULES, "docs": "Docs_nursing", "collection": "knowledge_base_nursing"},
+    "leadership_1st": {"name": "Leadership (1st Learner)", "source": "trainings_leadership_1srLearner",
+                       "modules": _LEADERSHIP_MODULES, "docs": None, "collection": "knowledge_base_leadership_1st"},
+    "leadership_2nd": {"name": "Leadership (2nd Learner)", "source": "trainings_leadership_2ndLearner",
+                       "modules": _LEADERSHIP_MODULES, "docs": None, "collection": "knowledge_base_leadership_2nd"},
+    "leadership_3rd": {"name": "Leadership (3rd Learner)", "source": "trainings_leadership_3rdLearner",
+                       "modules": _LEADERSHIP_MODULES, "docs": None, "collection": "knowledge_base_leadership_3rd"},
+}
+
+
+class Training:
+    """One training type: module names, lazily loaded texts and their index"""
+
+    def __init__(self, training_type: str, spec: Dict[str, Any], path: Optional[Path] = None):
+        self.training_type = training_type
+        self.spec = spec
+        self.path = path  # data file, None for built-in trainings
+        self.name: str = spec.get("name", training_type)
+        modules = spec.get("modules", {})
+        self.module_names: Dict[str, str] = {
+            key: module.get("name", key) if isinstance(module, dict) else module for key, module in modules.items()
+        }
+        self.docs_path: Optional[Path] = ROOT_DIR / spec["docs"] if spec.get("docs") else None
+        self.collection: str = spec.get("collection") or f"knowledge_base_{training_type}"
+        self._texts: Optional[Dict[str, Any]] = None
+        self._index = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Any]:
+        with self._lock:
+            if self._texts is None:
+                if "source" in self.spec:
+                    source = importlib.import_module(self.spec["source"])
+                    trainings = {key: getattr(source, key) for key in self.module_names}
+                    objectives = getattr(source, "training_objectives", "")
+                else:
+                    trainings = {}
+                    for key, module in self.spec.get("modules", {}).items():
+                        if "path" in module:
+                            trainings[key] = (self.path.parent / module["path"]).read_text(encoding="utf-8")
+                        else:
+                            trainings[key] = module.get("content", "")
+                    objectives = self.spec.get("objectives", "")
+                self._texts = {"trainings": trainings, "objectives": objectives}
+                print(f"📚 Training '{self.training_type}' loaded ({len(trainings)} modules)")
+        return self._texts
+
+    @property
+    def trainings(self) -> Dict[str, str]:
+        """{"training_1": module text, ...}"""
+        return self._load()["trainings"]
+
+    @property
+    def objectives(self) -> str:
+        return self._load()["objectives"]
+
+    @property
+    def index(self):
+        """backend.training_index.TrainingIndex of the module texts, built once"""
+        if self._index is None:
+            from backend.training_index import TrainingIndex
+            self._index = TrainingIndex(self.trainings)
+        return self._index
+
+    def has_documents(self) -> bool:
+        return self.docs_path is not None and self.docs_path.exists() and any(self.docs_path.glob("*.pdf"))
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "training_type": self.training_type,
+            "name": self.name,
+            "modules": self.module_names,
+            "has_documents": self.has_documents(),
+            "source": str(self.path.name) if self.path else "builtin",
+        }
+
+
+class TrainingCatalog:
+    """Built-in trainings plus the JSON trainings of a data directory, reloaded on change"""
+
+    def __init__(self, data_dir: Path = TRAINING_DATA_DIR, builtin: Optional[Dict[str, Dict[str, Any]]] = None,
+                 reload_seconds: float = TRAINING_CATALOG_RELOAD_SECONDS):
+        self.data_dir = data_dir
+        self.reload_seconds = reload_seconds
+        self._builtin = {t: Training(t, spec) for t, spec in (BUILTIN_TRAININGS if builtin is None else builtin).items()}
+        self._files: Dict[Path, float] = {}         # data file -> mtime when loaded
+        self._data: Dict[str, Training] = {}        # trainings from data files
+        self._lock = threading.Lock()
+        self._scanned_at: Optional[float] = None
+
+    def _read(self, path: Path) -> Optional[Training]:
+        try:
+            spec = json.loads(path.read_text(encoding="utf-8"))
+            if not isinstance(spec.get("modules"), dict) or not spec["modules"]:
+                raise ValueError("'modules' must be a non-empty object")
+            return Training(path.stem, spec, path)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Skipping training file {path.name}: {e}")
+            return None
+
+    def refresh(self, force: bool = False):
+        """Rescan the data directory (at most every reload_seconds unless forced)"""
+        now = time.monotonic()
+        with self._lock:
+            if not force and self._scanned_at is not None and (
+                    self.reload_seconds <= 0 or now - self._scanned_at < self.reload_seconds):
+                return
+            self._scanned_at = now
+            paths = sorted(self.data_dir.glob("*.json")) if self.data_dir.is_dir() else []
+            mtimes = {}
+            for path in paths:
+                try:
+                    mtimes[path] = path.stat().st_mtime
+                except OSError:
+                    continue
+            if mtimes == self._files:
+                return
+            data = {}
+            for path, mtime in mtimes.items():
+                unchanged = self._files.get(path) == mtime and path.stem in self._data
+                training = self._data[path.stem] if unchanged else self._read(path)
+                if training is not None:
+                    data[path.stem] = training
+            added = set(data) - set(self._data)
+            removed = set(self._data) - set(data)
+            changed = {t for t in set(data) & set(self._data) if data[t] is not self._data[t]}
+            self._data, self._files = data, mtimes
+        for label, types in (("added", added), ("reloaded", changed), ("removed", removed)):
+            if types:
+                print(f"🔄 Training catalog: {label} {', '.join(sorted(types))}")
+
+    def get(self, training_type: str) -> Training:
+        self.refresh()
+        training = self._data.get(training_type) or self._builtin.get(training_type)
+        if training is None:
+            raise ValueError(f"Unknown training type: {training_type}")
+        return training
+
+    def types(self) -> List[str]:
+        self.refresh()
+        return list(self._builtin) + [t for t in self._data if t not in self._builtin]
+
+    def describe(self) -> List[Dict[str, Any]]:
+        return [self.get(t).describe() for t in self.types()]
+
+
+_catalog_instance: Optional[TrainingCatalog] = None
+_catalog_lock = threading.Lock()
+
+
+def get_training_catalog() -> TrainingCatalog:
+    """Process-wide training catalog"""
+    global _catalog_instance
+    with _catalog_lock:
+        if _catalog_instance is None:
+            _catalog_instance = TrainingCatalog()
+    return _catalog_instance
+
+
+def get_training(training_type: str) -> Training:
+    """Shortcut for get_training_catalog().get(training_type)"""
+    return get_training_catalog().get(training_type)
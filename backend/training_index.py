@@ -0,0 +1,167 @@
+"""
+Training Content Index
+
+Parses the training texts (trainings_*.py) once into
+modules → situations → scenarios → expert / learner responses, so
+get_training_content can return only the slice a learner asks about
+instead of the whole module.
+
+The texts mark their structure with tags:
+
+    <Situation 1> Situation 1: description
+      <Scenario 1> Scenario 1: Si vous pensiez ... Et qu'alors ...
+        Experts' Responses:  Expert 2: Reponse: ... Justification: ...
+        Learner's Response:  Reponse: ... Justification: ...
+      </Scenario 1>
+    </Situation 1>
+
+Scenario numbers run through a module (situation 2 may start at scenario
+4); a scenario selector that does not match a number of the selected
+situation is read as a position within it ("scénario 1 de la situation 2").
+"""
+
+import re
+from typing import Any, Dict, List
+
+SECTIONS = ("all", "objectives", "scenarios", "experts", "learner")
+
+# Some texts never close their last situation
+_SITUATION_RE = re.compile(r"<Situation\s+(\d+)>(.*?)(?:</Situation\s+\1>|(?=<Situation\s+\d+>)|\Z)", re.S)
+_SCENARIO_RE = re.compile(r"<Scenario\s+(\d+)>(.*?)</Scenario\s+\1>", re.S)
+_EXPERT_RE = re.compile(r"^\s*Expert\s+(\d+)\s*:?", re.M)
+_RESPONSE_RE = re.compile(r"R[ée]ponse\s*:\s*(.*)")
+_JUSTIFICATION_RE = re.compile(r"Justification\s*:\s*(.*)", re.S)
+_EXPERTS_HEADER = "Experts' Responses:"
+_LEARNER_HEADER = "Learner's Response:"
+
+
+def _strip_label(text: str, label: str) -> str:
+    """'Scenario 2: Si vous pensiez...' -> 'Si vous pensiez...'"""
+    return re.sub(rf"^\s*{label}\s+\d+\s*:\s*", "", text.strip()).strip()
+
+
+def _parse_response(text: str) -> Dict[str, str]:
+    response = _RESPONSE_RE.search(text)
+    justification = _JUSTIFICATION_RE.search(text)
+    return {
+        "response": response.group(1).strip() if response else "",
+        "justification": " ".join(justification.group(1).split()) if justification else "",
+    }
+
+
+def _parse_experts(text: str) -> List[Dict[str, str]]:
+    matches = list(_EXPERT_RE.finditer(text))
+    experts = []
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        experts.append({"expert": f"Expert {match.group(1)}", **_parse_response(text[match.end():end])})
+    return experts
+
+
+def _parse_scenario(number: int, body: str) -> Dict[str, Any]:
+    prompt, _, rest = body.partition(_EXPERTS_HEADER)
+    experts, _, learner = rest.partition(_LEARNER_HEADER)
+    return {
+        "number": number,
+        "prompt": _strip_label(prompt, "Scenario"),
+        "experts": _parse_experts(experts),
+        "learner": _parse_response(learner) if learner.strip() else None,
+    }
+
+
+def parse_training(text: str) -> Dict[str, Any]:
+    """Parse one training module text into objectives, title and situations"""
+    header, _, content = text.partition("Trainings Content:")
+    objectives = header.partition("Training Objectives:")[2].strip()
+    title = re.search(r"^\s*(Module\s+\d+\s*:.*)$", content.split("<Situation")[0], re.M)
+    situations = []
+    for match in _SITUATION_RE.finditer(content):
+        body = match.group(2)
+        situations.append({
+            "number": int(match.group(1)),
+            "description": _strip_label(body.split("<Scenario")[0], "Situation"),
+            "scenarios": [_parse_scenario(int(s.group(1)), s.group(2)) for s in _SCENARIO_RE.finditer(body)],
+        })
+    return {
+        "title": title.group(1).strip() if title else "",
+        "objectives": objectives,
+        "situations": situations,
+        "text": text,
+    }
+
+
+def _format_scenario(scenario: Dict[str, Any], section: str) -> str:
+    lines = [f"Scenario {scenario['number']}:", scenario["prompt"]]
+    if section in ("all", "experts"):
+        lines.append("\nExperts' Responses:")
+        for expert in scenario["experts"]:
+            lines.append(f"- {expert['expert']}: {expert['response']}"
+                         + (f" | Justification: {expert['justification']}" if expert["justification"] else ""))
+    if section in ("all", "learner") and scenario["learner"]:
+        learner = scenario["learner"]
+        lines.append(f"\nLearner's Response: {learner['response']}"
+                     + (f" | Justification: {learner['justification']}" if learner["justification"] else ""))
+    return "\n".join(lines)
+
+
+def format_situations(situations: List[Dict[str, Any]], section: str = "all") -> str:
+    """Text of parsed situations and their scenarios, limited to a section"""
+    parts = []
+    for s in situations:
+        parts.append(f"Situation {s['number']}: {s['description']}")
+        parts.extend(_format_scenario(sc, section) for sc in s["scenarios"])
+    return "\n\n".join(parts)
+
+
+class TrainingIndex:
+    """Parsed training modules of one training type, keyed like the texts ("training_1")"""
+
+    def __init__(self, training_data: Dict[str, str]):
+        self.modules = {key: parse_training(text) for key, text in training_data.items()}
+
+    def module(self, module_number: int) -> Dict[str, Any]:
+        key = f"training_{module_number}"
+        if key not in self.modules:
+            raise KeyError(f"Invalid module number: {module_number}. Available: {list(self.modules)}")
+        return self.modules[key]
+
+    def select(self, module_number: int, situation: int = 0, scenario: int = 0) -> List[Dict[str, Any]]:
+        """Situations of a module, each with only the selected scenarios (0 = all)"""
+        module = self.module(module_number)
+        situations = module["situations"]
+        if situation:
+            situations = [s for s in situations if s["number"] == situation]
+            if not situations:
+                available = [s["number"] for s in module["situations"]]
+                raise KeyError(f"Invalid situation: {situation}. Available in module {module_number}: {available}")
+        if not scenario:
+            return situations
+
+        selected = []
+        for s in situations:
+            scenarios = [sc for sc in s["scenarios"] if sc["number"] == scenario]
+            if not scenarios and situation and 0 < scenario <= len(s["scenarios"]):
+                scenarios = [s["scenarios"][scenario - 1]]
+            if scenarios:
+                selected.append({**s, "scenarios": scenarios})
+        if not selected:
+            available = [sc["number"] for s in situations for sc in s["scenarios"]]
+            raise KeyError(f"Invalid scenario: {scenario}. Available: {available}")
+        return selected
+
+    def content(self, module_number: int, situation: int = 0, scenario: int = 0, section: str = "all") -> str:
+        """Text of the selected slice; the whole module text when nothing is selected"""
+        if section not in SECTIONS:
+            raise ValueError(f"Invalid section: {section}. Available: {list(SECTIONS)}")
+        module = self.module(module_number)
+        if section == "objectives":
+            return f"Training Objectives:\n{module['objectives']}"
+        if section == "all" and not situation and not scenario:
+            return module["text"]
+
+        return format_situations(self.select(module_number, situation, scenario), section)
+
+    def outline(self, module_number: int) -> Dict[int, List[int]]:
+        """{situation number: [scenario numbers]}"""
+        return {s["number"]: [sc["number"] for sc in s["scenarios"]]
+                for s in self.module(module_number)["situations"]}
@@ -0,0 +1,273 @@
+"""
+Usage Ledger
+
+Every LLM call made through invoke_with_retry (plus the Agent SDK code
+generation) is recorded here with its session, component, model and tokens.
+
+- Aggregated in memory by session, component and model (GET /usage)
+- Persisted as JSON lines, one per call, in .usage/usage-YYYY-MM-DD.jsonl
+  for capacity planning; replayed at startup so session budgets survive
+  restarts
+- Budgets, 0 = unlimited:
+    SESSION_TOKEN_BUDGET          tokens per learner session
+    DEPLOYMENT_TOKENS_PER_MINUTE  tokens per rolling minute, all sessions
+  Past USAGE_DEGRADE_AT (fraction of a budget, default 0.8) callers degrade
+  gracefully: the RAG search skips its ranking / rewrite agents and the chat
+  keeps only the last DEGRADED_HISTORY_MESSAGES messages of history. Once a
+  budget is spent, new requests are refused (HTTP 429); a turn that already
+  started is allowed to finish.
+
+The session is taken from usage_scope(session_id), a context variable the
+API sets for the duration of a request.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterator, Optional, Tuple
+
+USAGE_DIR = Path(__file__).parent.parent / ".usage"
+SESSION_TOKEN_BUDGET = int(os.getenv("SESSION_TOKEN_BUDGET", "0"))
+DEPLOYMENT_TOKENS_PER_MINUTE = int(os.getenv("DEPLOYMENT_TOKENS_PER_MINUTE", "0"))
+USAGE_DEGRADE_AT = float(os.getenv("USAGE_DEGRADE_AT", "0.8"))
+DEGRADED_HISTORY_MESSAGES = int(os.getenv("DEGRADED_HISTORY_MESSAGES", "4"))
+
+SESSION_RETENTION_SECONDS = 24 * 60 * 60  # in-memory per-session aggregates
+WINDOW_SECONDS = 60
+NO_SESSION = "-"
+TOKEN_TYPES = ("input", "output", "cache_read", "cache_creation")
+
+_current_session: ContextVar[Optional[str]] = ContextVar("usage_session", default=None)
+
+
+class BudgetExceeded(Exception):
+    """A session or deployment token budget is spent"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@contextmanager
+def usage_scope(session_id: Optional[str]) -> Iterator[None]:
+    """Attribute LLM calls in the enclosed block to a session"""
+    token = _current_session.set(session_id)
+    try:
+        yield
+    finally:
+        _current_session.reset(token)
+
+
+def current_session() -> Optional[str]:
+    return _current_session.get()
+
+
+def total_tokens(usage: Dict[str, int]) -> int:
+    """Tokens counted against budgets; input already includes cached input"""
+    return int(usage.get("input", 0)) + int(usage.get("output", 0))
+
+
+class UsageLedger:
+    def __init__(self, usage_dir: Path = USAGE_DIR, session_budget: int = SESSION_TOKEN_BUDGET,
+                 minute_budget: int = DEPLOYMENT_TOKENS_PER_MINUTE, degrade_at: float = USAGE_DEGRADE_AT):
+        self.usage_dir = usage_dir
+        self.session_budget = session_budget
+        self.minute_budget = minute_budget
+        self.degrade_at = degrade_at
+        self._lock = threading.Lock()
+        self._file_lock = threading.Lock()
+        # (session, component, model) -> {"calls", "errors", "seconds", <token types>}
+        self._totals: Dict[Tuple[str, str, str], Dict[str, float]] = {}
+        # session -> [tokens, last_seen]
+        self._sessions: Dict[str, list] = {}
+        self._window: Deque[Tuple[float, int]] = deque()
+        self._window_tokens = 0
+        self._records_since_prune = 0
+
+    # ----- recording -----
+
+    def record(self, component: str, model: str, usage: Optional[Dict[str, int]], seconds: float = 0.0,
+               outcome: str = "success", session_id: Optional[str] = None):
+        entry = {
+            "ts": round(time.time(), 3),
+            "session": session_id or current_session() or NO_SESSION,
+            "component": component,
+            "model": model or "unknown",
+            "outcome": outcome,
+            "seconds": round(seconds, 3),
+            **{t: int((usage or {}).get(t, 0)) for t in TOKEN_TYPES},
+        }
+        self._aggregate(entry, live=True)
+        self._append(entry)
+
+    def _aggregate(self, entry: Dict[str, Any], live: bool):
+        tokens = total_tokens(entry)
+        key = (entry["session"], entry["component"], entry["model"])
+        with self._lock:
+            totals = self._totals.setdefault(key, {"calls": 0, "errors": 0, "seconds": 0.0,
+                                                   **{t: 0 for t in TOKEN_TYPES}})
+            totals["calls"] += 1
+            totals["errors"] += entry["outcome"] != "success"
+            totals["seconds"] = round(totals["seconds"] + entry.get("seconds", 0), 3)
+            for t in TOKEN_TYPES:
+                totals[t] += entry.get(t, 0)
+
+            session = self._sessions.setdefault(entry["session"], [0, 0.0])
+            session[0] += tokens
+            session[1] = max(session[1], entry["ts"])
+
+            if live or time.time() - entry["ts"] < WINDOW_SECONDS:
+                self._window.append((entry["ts"], tokens))
+                self._window_tokens += tokens
+
+            self._records_since_prune += 1
+            if self._records_since_prune >= 1000:
+                self._prune_locked()
+
+    def _prune_locked(self):
+        cutoff = time.time() - SESSION_RETENTION_SECONDS
+        stale = {s for s, (_, last_seen) in self._sessions.items() if last_seen < cutoff and s != NO_SESSION}
+        for session in stale:
+            del self._sessions[session]
+        for key in [k for k in self._totals if k[0] in stale]:
+            del self._totals[key]
+        self._records_since_prune = 0
+
+    def _path_for(self, ts: float) -> Path:
+        day = datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%Y-%m-%d")
+        return self.usage_dir / f"usage-{day}.jsonl"
+
+    def _append(self, entry: Dict[str, Any]):
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        try:
+            with self._file_lock:
+                self.usage_dir.mkdir(parents=True, exist_ok=True)
+                with open(self._path_for(entry["ts"]), "a", encoding="utf-8") as f:
+                    f.write(line)
+        except OSError as e:
+            print(f"⚠️  Usage ledger write failed: {e}")
+
+    def load(self, max_age_seconds: int = SESSION_RETENTION_SECONDS):
+        """Rebuild the aggregates from the persisted calls of the last day"""
+        if not self.usage_dir.exists():
+            return
+        now = time.time()
+        days = {self._path_for(now - max_age_seconds), self._path_for(now)}
+        loaded = 0
+        for path in sorted(days):
+            if not path.exists():
+                continue
+            for line in path.read_text(encoding="utf-8").splitlines():
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if now - entry.get("ts", 0) <= max_age_seconds:
+                    self._aggregate(entry, live=False)
+                    loaded += 1
+        if loaded:
+            print(f"📒 Usage ledger: replayed {loaded} LLM calls")
+
+    # ----- budgets -----
+
+    def session_tokens(self, session_id: Optional[str]) -> int:
+        with self._lock:
+            return int(self._sessions.get(session_id or NO_SESSION, [0])[0])
+
+    def minute_tokens(self) -> int:
+        cutoff = time.time() - WINDOW_SECONDS
+        with self._lock:
+            while self._window and self._window[0][0] < cutoff:
+                self._window_tokens -= self._window.popleft()[1]
+            return self._window_tokens
+
+    def _budget_use(self, session_id: Optional[str]) -> float:
+        """Largest fraction used of the budgets that apply"""
+        used = 0.0
+        if self.session_budget and session_id:
+            used = self.session_tokens(session_id) / self.session_budget
+        if self.minute_budget:
+            used = max(used, self.minute_tokens() / self.minute_budget)
+        return used
+
+    def state(self, session_id: Optional[str] = None) -> str:
+        """ok | degraded | exhausted"""
+        used = self._budget_use(session_id or current_session())
+        if used >= 1:
+            return "exhausted"
+        if used >= self.degrade_at:
+            return "degraded"
+        return "ok"
+
+    def degraded(self, session_id: Optional[str] = None) -> bool:
+        return self.state(session_id) != "ok"
+
+    def check(self, session_id: Optional[str] = None):
+        """Raise BudgetExceeded if a new request must not start"""
+        session_id = session_id or current_session()
+        if self.session_budget and session_id and self.session_tokens(session_id) >= self.session_budget:
+            raise BudgetExceeded(f"Token budget of this session is spent ({self.session_budget} tokens)")
+        if self.minute_budget and self.minute_tokens() >= self.minute_budget:
+            with self._lock:
+                oldest = self._window[0][0] if self._window else time.time()
+            raise BudgetExceeded("Deployment token budget per minute is spent, please retry shortly",
+                                 retry_after=max(1.0, oldest + WINDOW_SECONDS - time.time()))
+
+    # ----- reporting -----
+
+    def summary(self, session_id: Optional[str] = None) -> Dict[str, Any]:
+        """Usage by component and model, for one session or the whole deployment"""
+        with self._lock:
+            items = [(k, dict(v)) for k, v in self._totals.items() if session_id is None or k[0] == session_id]
+            sessions = len(self._sessions)
+        by_component: Dict[str, Dict[str, float]] = {}
+        by_model: Dict[str, Dict[str, float]] = {}
+        totals: Dict[str, float] = {"calls": 0, "errors": 0, **{t: 0 for t in TOKEN_TYPES}}
+        for (_, component, model), values in items:
+            for group, name in ((by_component, component), (by_model, model)):
+                agg = group.setdefault(name, {"calls": 0, "errors": 0, **{t: 0 for t in TOKEN_TYPES}})
+                for field in agg:
+                    agg[field] += values[field]
+            for field in totals:
+                totals[field] += values[field]
+        summary: Dict[str, Any] = {
+            "totals": {**totals, "tokens": total_tokens(totals)},
+            "by_component": by_component,
+            "by_model": by_model,
+            "budgets": {
+                "session_tokens": self.session_budget or None,
+                "deployment_tokens_per_minute": self.minute_budget or None,
+                "degrade_at": self.degrade_at,
+            },
+            "minute_tokens": self.minute_tokens(),
+        }
+        if session_id is None:
+            summary["sessions"] = sessions
+        else:
+            summary["session_id"] = session_id
+            summary["state"] = self.state(session_id)
+        return summary
+
+
+_ledger_instance: Optional[UsageLedger] = None
+_ledger_lock = threading.Lock()
+
+
+def get_usage_ledger() -> UsageLedger:
+    """Process-wide usage ledger"""
+    global _ledger_instance
+    with _ledger_lock:
+        if _ledger_instance is None:
+            _ledger_instance = UsageLedger()
+    return _ledger_instance
+
+
+def budget_degraded() -> bool:
+    """True when the current session (or the deployment) is close to a budget"""
+    return get_usage_ledger().degraded()
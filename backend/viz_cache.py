@@ -0,0 +1,204 @@
+"""
+Visualization Cache
+
+Caches LLM-generated visualization code and the PNGs it renders, so repeated
+requests ("tableau comparatif de vos réponses avec celles des experts") return
+instantly instead of spawning a new code-generation query.
+
+Two levels:
+- Code entries are keyed on the normalized request, the include_evaluation_data
+  flag and the *schema* of the data (or a hash of the context data). Cached
+  code is re-executed against new evaluations that share the same schema.
+- Result entries add the hash of the evaluation data itself and hold the
+  rendered PNG + summary data.
+
+Entries are kept in memory and persisted to disk, and expire after 7 days.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+from .metrics import record_cache_lookup
+
+CACHE_DIR = Path(__file__).parent.parent / ".viz_cache"
+CACHE_TTL_SECONDS = 7 * 24 * 60 * 60  # 7 days
+MEMORY_MAX_ENTRIES = 128
+
+
+def normalize_request(text: str) -> str:
+    """Lowercase, strip accents/punctuation and collapse whitespace"""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _schema_of(value: Any) -> Any:
+    """Structural skeleton of a JSON value: dict keys and leaf types, no values"""
+    if isinstance(value, dict):
+        return {k: _schema_of(v) for k, v in sorted(value.items())}
+    if isinstance(value, list):
+        return [_schema_of(value[0])] if value else []
+    return type(value).__name__
+
+
+def _digest(value: Any) -> str:
+    raw = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def schema_hash(evaluations: Dict[str, Any]) -> str:
+    """Hash of the evaluation structure; equal for learners of the same training"""
+    return _digest(_schema_of(evaluations))
+
+
+def data_hash(data: Any) -> str:
+    """Hash of the data itself"""
+    return _digest(data)
+
+
+class VisualizationCache:
+    """Two-level (code, rendered result) cache with memory + disk storage"""
+
+    def __init__(self, cache_dir: Path = CACHE_DIR, ttl_seconds: int = CACHE_TTL_SECONDS):
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # ----- keys -----
+
+    @staticmethod
+    def code_key(user_request: str, include_evaluation_data: bool, data_key: str) -> str:
+        """Key for generated code: request + flag + schema (or context) hash"""
+        return data_hash([normalize_request(user_request), bool(include_evaluation_data), data_key])
+
+    @staticmethod
+    def result_key(code_key: str, evaluation_hash: str) -> str:
+        """Key for a rendered result: code key + hash of the actual data"""
+        return data_hash([code_key, evaluation_hash])
+
+    # ----- storage -----
+
+    def _path(self, kind: str, key: str, suffix: str) -> Path:
+        return self.cache_dir / kind / f"{key}{suffix}"
+
+    def _remember(self, mem_key: str, entry: Dict[str, Any]):
+        with self._lock:
+            self._memory[mem_key] = entry
+            self._memory.move_to_end(mem_key)
+            while len(self._memory) > MEMORY_MAX_ENTRIES:
+                self._memory.popitem(last=False)
+
+    def _recall(self, mem_key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._memory.get(mem_key)
+            if entry is not None:
+                self._memory.move_to_end(mem_key)
+            return entry
+
+    def _expired(self, entry: Dict[str, Any]) -> bool:
+        return time.time() - entry.get("created_at", 0) > self.ttl_seconds
+
+    def _write_atomic(self, path: Path, data: bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + f".{os.getpid()}.tmp")
+        tmp.write_bytes(data)
+        tmp.replace(path)
+
+    def get_code(self, key: str) -> Optional[str]:
+        """Return cached code for a code key, or None"""
+        code = self._load_code(key)
+        record_cache_lookup("viz_code", code is not None)
+        return code
+
+    def _load_code(self, key: str) -> Optional[str]:
+        entry = self._recall(f"code:{key}")
+        if entry is None:
+            path = self._path("code", key, ".json")
+            if not path.exists():
+                return None
+            try:
+                entry = json.loads(path.read_text(encoding="utf-8"))
+            except (json.JSONDecodeError, OSError):
+                return None
+            self._remember(f"code:{key}", entry)
+        if self._expired(entry):
+            return None
+        return entry.get("code")
+
+    def put_code(self, key: str, code: str):
+        entry = {"code": code, "created_at": time.time()}
+        self._remember(f"code:{key}", entry)
+        try:
+            self._write_atomic(self._path("code", key, ".json"),
+                               json.dumps(entry, ensure_ascii=False).encode("utf-8"))
+        except OSError as e:
+            print(f"⚠️  Visualization cache write failed: {e}")
+
+    def get_result(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a cached {"code", "output"} result, or None"""
+        result = self._load_result(key)
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        record_cache_lookup("viz_result", result is not None)
+        return result
+
+    def _load_result(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._recall(f"result:{key}")
+        if entry is None:
+            meta_path = self._path("results", key, ".json")
+            png_path = self._path("results", key, ".png")
+            if not meta_path.exists():
+                return None
+            try:
+                entry = json.loads(meta_path.read_text(encoding="utf-8"))
+                if png_path.exists():
+                    entry["output"]["image_base64"] = base64.b64encode(png_path.read_bytes()).decode()
+            except (json.JSONDecodeError, OSError, KeyError, TypeError):
+                return None
+            self._remember(f"result:{key}", entry)
+        if self._expired(entry):
+            return None
+        return {"code": entry.get("code", ""), "output": dict(entry["output"])}
+
+    def put_result(self, key: str, code: str, output: Dict[str, Any]):
+        """Store a successful render; the PNG is kept as raw bytes on disk"""
+        entry = {"code": code, "output": dict(output), "created_at": time.time()}
+        self._remember(f"result:{key}", entry)
+
+        meta = {"code": code, "created_at": entry["created_at"],
+                "output": {k: v for k, v in output.items() if k != "image_base64"}}
+        try:
+            image_b64 = output.get("image_base64")
+            if image_b64:
+                self._write_atomic(self._path("results", key, ".png"), base64.b64decode(image_b64))
+            self._write_atomic(self._path("results", key, ".json"),
+                               json.dumps(meta, ensure_ascii=False, default=str).encode("utf-8"))
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Visualization cache write failed: {e}")
+
+
+_cache_instance: Optional[VisualizationCache] = None
+
+
+def get_viz_cache() -> VisualizationCache:
+    """Process-wide visualization cache"""
+    global _cache_instance
+    if _cache_instance is None:
+        _cache_instance = VisualizationCache()
+    return _cache_instance
@@ -1,22 +1,82 @@
-from typing import List, Dict, Any
-from tavily import TavilyClient
+from typing import List, Dict, Any, Optional
+from tavily import TavilyClient, AsyncTavilyClient
+import asyncio
 import os
+import threading
+import weakref
 from dotenv import load_dotenv
 
+from backend.codegen_loop import CodegenLoop
+from backend.search_cache import get_search_cache
+from backend.viz_cache import normalize_request
+
 load_dotenv()
 
+SEARCH_DEPTH = "advanced"
+# Local stand-in for tests and benchmarks, e.g. http://127.0.0.1:8765 (bench/tavily_stub.py)
+TAVILY_API_URL = os.getenv("TAVILY_API_URL") or None
+
+# Multi-query search: every query at basic depth (1 credit) in parallel, then
+# the main query at advanced depth (2 credits) only if the results are thin
+MAX_QUERY_VARIANTS = 3
+WEB_SEARCH_MIN_RESULTS = int(os.getenv("WEB_SEARCH_MIN_RESULTS", "3"))
+WEB_SEARCH_MIN_SCORE = float(os.getenv("WEB_SEARCH_MIN_SCORE", "0.5"))
+WEB_SEARCH_CONCURRENCY = int(os.getenv("WEB_SEARCH_CONCURRENCY", "8"))
+WEB_SEARCH_TIMEOUT_SECONDS = float(os.getenv("WEB_SEARCH_TIMEOUT_SECONDS", "30"))
+RRF_K = 60  # reciprocal rank fusion constant
+DIRECT_ANSWER_TITLE = "Direct Answer"
+
+_search_loop: Optional[CodegenLoop] = None
+_search_loop_lock = threading.Lock()
+
+
+def get_search_loop() -> CodegenLoop:
+    """Background event loop running the async searches of synchronous tools"""
+    global _search_loop
+    with _search_loop_lock:
+        if _search_loop is None:
+            _search_loop = CodegenLoop(concurrency=WEB_SEARCH_CONCURRENCY, timeout=WEB_SEARCH_TIMEOUT_SECONDS,
+                                       name="web-search")
+    return _search_loop
+
+
+def fuse_results(result_lists: List[List[Dict[str, Any]]], max_results: int) -> List[Dict[str, Any]]:
+    """Merge result lists, deduplicated by URL and ranked by reciprocal rank fusion.
+
+    A page found by several queries ranks above one found once; ties go to
+    the higher Tavily score. Each merged result keeps its best Tavily score.
+    """
+    fused: Dict[str, float] = {}
+    best: Dict[str, Dict[str, Any]] = {}
+    for results in result_lists:
+        ranked = [r for r in results if r.get("url")]
+        for rank, result in enumerate(ranked):
+            url = result["url"].rstrip("/")
+            fused[url] = fused.get(url, 0.0) + 1.0 / (RRF_K + rank + 1)
+            if url not in best or result.get("score", 0) > best[url].get("score", 0):
+                best[url] = result
+    order = sorted(fused, key=lambda url: (fused[url], best[url].get("score", 0)), reverse=True)
+    return [dict(best[url]) for url in order[:max_results]]
+
 
 class WebSearchTool:
     """Tool for performing web searches using Tavily API"""
 
     def __init__(self):
         api_key = os.getenv("TAVILY_API_KEY", "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")
-        self.client = TavilyClient(api_key=api_key)
+        self.api_key = api_key
+        self.client = TavilyClient(api_key=api_key, api_base_url=TAVILY_API_URL)
+        # The async client holds an httpx.AsyncClient, which is bound to one event loop
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncTavilyClient]" = \
+            weakref.WeakKeyDictionary()
 
     def search(self, query: str, max_results: int = 5) -> List[Dict[str, Any]]:
         """
         Perform a web search and return results with citations.
 
+        Results are cached per normalized query (see backend.search_cache),
+        and identical concurrent searches share one Tavily call.
+
         Args:
             query: The search query
             max_results: Maximum number of results to return
@@ -25,40 +85,138 @@ class WebSearchTool:
             List of search results with title, url, and content
         """
         try:
-            print(f"🔍 Searching web for: {query}")
+            return get_search_cache().get_or_search(
+                query, max_results, SEARCH_DEPTH, lambda: self._search_tavily(query, max_results)
+            )
+        except Exception as e:
+            print(f"❌ Error performing web search: {e}")
+            import traceback
+            traceback.print_exc()
+            return []
+
+    def _search_tavily(self, query: str, max_results: int) -> List[Dict[str, Any]]:
+        """Call Tavily and parse its response; raises on errors"""
+        print(f"🔍 Searching web for: {query}")
+
+        # Perform search
+        response = self.client.search(
+            query=query,
+            max_results=max_results,
+            search_depth=SEARCH_DEPTH,
+            include_answer=True
+        )
+        return self._parse_response(response)
 
-            # Perform search
-            response = self.client.search(
+    def _parse_response(self, response: Dict[str, Any]) -> List[Dict[str, Any]]:
+        results = []
+
+        # Extract results
+        for item in response.get("results", []):
+            results.append({
+                "title": item.get("title", ""),
+                "url": item.get("url", ""),
+                "content": item.get("content", ""),
+                "score": item.get("score", 0)
+            })
+
+        # Add direct answer if available
+        answer = response.get("answer")
+        if answer:
+            results.insert(0, {
+                "title": DIRECT_ANSWER_TITLE,
+                "url": "",
+                "content": answer,
+                "score": 1.0
+            })
+
+        print(f"✅ Found {len(results)} results")
+        return results
+
+    # ----- async path -----
+
+    def _async_client(self) -> AsyncTavilyClient:
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = AsyncTavilyClient(api_key=self.api_key, api_base_url=TAVILY_API_URL)
+            self._async_clients[loop] = client
+        return client
+
+    async def asearch(self, query: str, max_results: int = 5,
+                      search_depth: str = SEARCH_DEPTH) -> List[Dict[str, Any]]:
+        """Async, cached single search; raises on errors (unlike search)"""
+        async def search_tavily():
+            print(f"🔍 Searching web ({search_depth}) for: {query}")
+            response = await self._async_client().search(
                 query=query,
                 max_results=max_results,
-                search_depth="advanced",
+                search_depth=search_depth,
                 include_answer=True
             )
+            return self._parse_response(response)
 
-            results = []
+        return await get_search_cache().aget_or_search(query, max_results, search_depth, search_tavily)
 
-            # Extract results
-            for item in response.get("results", []):
-                results.append({
-                    "title": item.get("title", ""),
-                    "url": item.get("url", ""),
-                    "content": item.get("content", ""),
-                    "score": item.get("score", 0)
-                })
+    async def amulti_search(self, query: str, alternative_queries: Optional[List[str]] = None,
+                            max_results: int = 5) -> List[Dict[str, Any]]:
+        """
+        Search the query and its reformulations concurrently and merge the results.
 
-            # Add direct answer if available
-            answer = response.get("answer")
-            if answer:
-                results.insert(0, {
-                    "title": "Direct Answer",
-                    "url": "",
-                    "content": answer,
-                    "score": 1.0
-                })
+        All queries run at basic depth first; the main query is repeated at
+        advanced depth only when fewer than WEB_SEARCH_MIN_RESULTS results
+        score WEB_SEARCH_MIN_SCORE or more. Results are deduplicated by URL
+        and ranked by reciprocal rank fusion (see fuse_results); the direct
+        answer of the deepest search, if any, comes first.
 
-            print(f"✅ Found {len(results)} results")
-            return results
+        Args:
+            query: The main search query
+            alternative_queries: Reformulations of the query (e.g. in English)
+            max_results: Maximum number of results per query and merged
+
+        Returns:
+            List of search results with title, url, content and score
+        """
+        queries: List[str] = []
+        for q in [query] + list(alternative_queries or []):
+            if q and q.strip() and normalize_request(q) not in {normalize_request(x) for x in queries}:
+                queries.append(q.strip())
+        queries = queries[:MAX_QUERY_VARIANTS]
+
+        responses = await asyncio.gather(*(self.asearch(q, max_results, "basic") for q in queries),
+                                         return_exceptions=True)
+        result_lists = []
+        for q, response in zip(queries, responses):
+            if isinstance(response, BaseException):  # incl. a variant cancelled on its own
+                print(f"⚠️  Web search failed for '{q}': {response!r}")
+            else:
+                result_lists.append(response)
 
+        def merge():
+            answers = [r for results in result_lists for r in results if r.get("title") == DIRECT_ANSWER_TITLE
+                       and not r.get("url")]
+            merged = fuse_results(result_lists, max_results)
+            return ([dict(answers[-1])] if answers else []) + merged, merged
+
+        results, merged = merge()
+        relevant = [r for r in merged if r.get("score", 0) >= WEB_SEARCH_MIN_SCORE]
+        if len(relevant) < WEB_SEARCH_MIN_RESULTS:
+            print(f"🔎 Thin results ({len(relevant)} relevant), searching '{queries[0]}' at advanced depth")
+            try:
+                result_lists.append(await self.asearch(queries[0], max_results, "advanced"))
+            except Exception as e:
+                if not result_lists:
+                    raise
+                print(f"⚠️  Advanced web search failed: {e}")
+            results, merged = merge()
+
+        print(f"✅ Merged {len(merged)} results from {len(result_lists)} searches")
+        return results
+
+    def multi_search(self, query: str, alternative_queries: Optional[List[str]] = None,
+                     max_results: int = 5) -> List[Dict[str, Any]]:
+        """Blocking amulti_search for synchronous callers (the LangGraph tools); [] on errors"""
+        try:
+            return get_search_loop().run(lambda: self.amulti_search(query, alternative_queries, max_results))
         except Exception as e:
             print(f"❌ Error performing web search: {e}")
             import traceback
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Graph mode benchmark: supervisor (two LLM calls) vs single tool-using loop.
+
+Replays a fixed set of learner questions through a fresh ChatAgent per
+graph mode and reports per-question latency and token usage.
+
+Run from the project root:
+    python -m bench.graph_modes --training-type leadership_1st
+    python -m bench.graph_modes --evaluations evaluations.json --output results.json
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Any, List
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from backend.chat_agent import ChatAgent, GRAPH_MODES
+
+
+# Fixed learner questions: evaluation-only, training content, knowledge base,
+# and visualization turns, in the order a learner typically asks them.
+LEARNER_QUESTIONS: List[str] = [
+    "Dans quels scénarios mon raisonnement s'éloigne-t-il le plus de celui des experts?",
+    "Quels sont mes points forts dans cette formation?",
+    "Que disent les experts dans le scénario 2 de la situation 1?",
+    "Pourquoi est-ce important de tenir compte de l'ordonnance en vigueur?",
+    "Souhaitez-vous un tableau comparatif de mes réponses avec celles des experts?",
+    "Peux-tu résumer les thèmes que je n'ai pas encore abordés?",
+]
+
+
+def load_evaluations(args) -> Dict[str, Any]:
+    """Load evaluations from a JSON file, a stored session, or run them live"""
+    if args.evaluations:
+        return json.loads(Path(args.evaluations).read_text(encoding="utf-8"))
+    if args.session_id:
+        from backend.session_store import get_session
+        session = get_session(args.session_id)
+        if session is None:
+            raise SystemExit(f"Session not found or expired: {args.session_id}")
+        return session["evaluations"]
+    from backend.evaluator import run_evaluations
+    return run_evaluations(args.training_type)
+
+
+def run_mode(mode: str, evaluations: Dict[str, Any], training_type: str, questions: List[str]) -> Dict[str, Any]:
+    """Run every question through one graph mode and collect timings"""
+    agent = ChatAgent(evaluations=evaluations, training_type=training_type, graph_mode=mode)
+    # Initial feedback is identical in both modes; keep it out of the measurement
+    agent.chat("Bonjour")
+    tokens_before = agent.total_tokens
+
+    turns = []
+    for question in questions:
+        start_tokens = agent.total_tokens
+        start = time.perf_counter()
+        response = agent.chat(question)
+        elapsed = time.perf_counter() - start
+        turns.append({
+            "question": question,
+            "latency_s": round(elapsed, 3),
+            "tokens": agent.total_tokens - start_tokens,
+            "has_visualization": response.get("has_code", False),
+        })
+
+    latencies = [t["latency_s"] for t in turns]
+    return {
+        "mode": mode,
+        "turns": turns,
+        "mean_latency_s": round(statistics.mean(latencies), 3),
+        "median_latency_s": round(statistics.median(latencies), 3),
+        "total_latency_s": round(sum(latencies), 3),
+        "total_tokens": agent.total_tokens - tokens_before,
+        "mean_tokens_per_turn": round((agent.total_tokens - tokens_before) / len(turns), 1),
+    }
+
+
+def print_report(results: List[Dict[str, Any]]):
+    print("\n" + "=" * 70)
+    print("📊 GRAPH MODE BENCHMARK")
+    print("=" * 70)
+    header = f"{'Question':<50} " + " ".join(f"{r['mode']:>18}" for r in results)
+    print(header)
+    for i, question in enumerate(results[0]["turns"]):
+        cells = " ".join(
+            f"{r['turns'][i]['latency_s']:>8.2f}s {r['turns'][i]['tokens']:>7}t" for r in results
+        )
+        print(f"{question['question'][:48]:<50} {cells}")
+    print("-" * 70)
+    for r in results:
+        print(f"{r['mode']:<14} mean {r['mean_latency_s']:.2f}s | median {r['median_latency_s']:.2f}s | "
+              f"tokens/turn {r['mean_tokens_per_turn']:.0f} | total tokens {r['total_tokens']}")
+    print("=" * 70 + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare chat graph modes on fixed learner questions")
+    parser.add_argument("--training-type", default="migraine")
+    parser.add_argument("--evaluations", help="Path to an evaluations JSON file (skips live evaluation)")
+    parser.add_argument("--session-id", help="Reuse the evaluations of a stored session")
+    parser.add_argument("--modes", nargs="+", default=list(GRAPH_MODES), choices=list(GRAPH_MODES))
+    parser.add_argument("--output", help="Write the raw results as JSON to this path")
+    args = parser.parse_args()
+
+    evaluations = load_evaluations(args)
+    results = [run_mode(mode, evaluations, args.training_type, LEARNER_QUESTIONS) for mode in args.modes]
+    print_report(results)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
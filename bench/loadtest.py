@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Load test: concurrent simulated learners against the FastAPI app.
+
+Starts the app in a subprocess with replayed LLM, embedding and search
+services (bench.replay_server), then ramps the number of concurrent
+learners in stages. Each learner repeats the journey of the frontend:
+
+    GET  /trainings
+    POST /evaluate?view=none
+    GET  /performance/{session_id}.png
+    POST /chat  x (1 + --chat-turns): initial feedback, then a mix of
+                evaluation, knowledge base, visualization and web search
+                questions
+
+Per stage it reports throughput, p50/p95/p99 latency per step, error rate
+and the server's resident memory (process tree, sampled from /proc), then
+names the first stage where adding learners stopped adding throughput.
+
+Run from the project root:
+    python -m bench.loadtest
+    python -m bench.loadtest --stages 1 2 4 8 16 --stage-seconds 60 --latency-scale 1.0
+    python -m bench.loadtest --url http://127.0.0.1:8000   # an already running server
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from bench.offline import percentile
+
+ROOT_DIR = Path(__file__).parent.parent
+DEFAULT_WORKDIR = ROOT_DIR / ".bench_cache"
+
+# (kind, message, web_search_enabled)
+QUESTION_MIX = [
+    ("evaluation", "Quels sont mes points forts dans cette formation?", False),
+    ("evaluation", "Dans quels scénarios mon raisonnement s'éloigne-t-il le plus de celui des experts?", False),
+    ("training", "Que disent les experts dans le scénario 2 de la situation 1?", False),
+    ("rag", "Pourquoi est-ce important de tenir compte de l'ordonnance en vigueur?", False),
+    ("visualization", "Peux-tu me montrer un graphique de la couverture des thèmes?", False),
+    ("web", "Quelles sont les dernières recommandations sur le traitement de la migraine?", True),
+]
+
+# Throughput gain below which the next stage counts as saturated
+SATURATION_GAIN = 0.10
+
+
+# =============================================================================
+# Server process
+# =============================================================================
+
+def _rss_kb(pid: int) -> int:
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def _descendants(pid: int) -> List[int]:
+    children = []
+    try:
+        for task in Path(f"/proc/{pid}/task").iterdir():
+            raw = (task / "children").read_text().split()
+            children.extend(int(c) for c in raw)
+    except OSError:
+        return []
+    result = list(children)
+    for child in children:
+        result.extend(_descendants(child))
+    return result
+
+
+def tree_rss_mb(pid: int) -> float:
+    """RSS of a process and its descendants (render workers included)"""
+    return round(sum(_rss_kb(p) for p in [pid] + _descendants(pid)) / 1024, 1)
+
+
+class ReplayServer:
+    """bench.replay_server in a subprocess; output goes to <workdir>/server.log"""
+
+    def __init__(self, port: int, latency_scale: float, workdir: Path, cassette: Optional[str] = None):
+        self.port = port
+        self.url = f"http://127.0.0.1:{port}"
+        self.workdir = workdir
+        self.args = [sys.executable, "-m", "bench.replay_server", "--port", str(port),
+                     "--latency-scale", str(latency_scale), "--workdir", str(workdir)]
+        if cassette:
+            self.args += ["--cassette", cassette]
+        self.process: Optional[subprocess.Popen] = None
+        self._log = None
+
+    def start(self, timeout: float = 300.0):
+        self.workdir.mkdir(parents=True, exist_ok=True)
+        self._log = open(self.workdir / "server.log", "w")
+        env = {**os.environ, "TIMING_LOGS": "0", "PYTHONUNBUFFERED": "1"}
+        self.process = subprocess.Popen(self.args, cwd=ROOT_DIR, stdout=self._log, stderr=subprocess.STDOUT, env=env)
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Server exited with {self.process.returncode}, see {self.workdir / 'server.log'}")
+            try:
+                if httpx.get(f"{self.url}/health", timeout=2).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.5)
+        raise RuntimeError(f"Server did not become healthy within {timeout}s")
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=20)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        if self._log:
+            self._log.close()
+
+
+# =============================================================================
+# Learners
+# =============================================================================
+
+class StageStats:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.error_samples: List[str] = []
+        self.journeys = 0
+
+    def record(self, step: str, seconds: float, error: Optional[str] = None):
+        self.latencies.setdefault(step, []).append(seconds)
+        if error:
+            self.errors[step] = self.errors.get(step, 0) + 1
+            if len(self.error_samples) < 5:
+                self.error_samples.append(f"{step}: {error}")
+
+
+async def _call(client: httpx.AsyncClient, stats: StageStats, step: str, method: str, path: str,
+                **kwargs) -> Optional[httpx.Response]:
+    start = time.perf_counter()
+    try:
+        response = await client.request(method, path, **kwargs)
+    except httpx.HTTPError as e:
+        stats.record(step, time.perf_counter() - start, type(e).__name__)
+        return None
+    error = None if response.status_code < 400 else f"HTTP {response.status_code}"
+    stats.record(step, time.perf_counter() - start, error)
+    return response if error is None else None
+
+
+async def journey(client: httpx.AsyncClient, stats: StageStats, training_type: str,
+                  chat_turns: int, rng: random.Random):
+    """One learner from the training page to the end of the chat"""
+    await _call(client, stats, "GET /trainings", "GET", "/trainings", params={"training_type": training_type})
+    response = await _call(client, stats, "POST /evaluate", "POST", "/evaluate",
+                           params={"view": "none"}, json={"training_type": training_type})
+    if response is None:
+        return
+    data = response.json()
+    session_id = data["session_id"]
+    if data.get("performance_table_url"):
+        await _call(client, stats, "GET /performance/{id}.png", "GET", data["performance_table_url"])
+
+    turns = [("initial", "Bonjour", False)] + [rng.choice(QUESTION_MIX) for _ in range(chat_turns)]
+    for kind, message, web in turns:
+        await _call(client, stats, f"POST /chat [{kind}]", "POST", "/chat",
+                    json={"session_id": session_id, "message": message, "web_search_enabled": web})
+    stats.journeys += 1
+
+
+async def learner(client: httpx.AsyncClient, stats: StageStats, deadline: float, training_type: str,
+                  chat_turns: int, seed: int):
+    rng = random.Random(seed)
+    while time.perf_counter() < deadline:
+        await journey(client, stats, training_type, chat_turns, rng)
+
+
+async def run_stage(url: str, concurrency: int, seconds: float, training_type: str, chat_turns: int,
+                    request_timeout: float, server_pid: Optional[int], seed: int) -> Dict[str, Any]:
+    stats = StageStats()
+    rss_samples: List[float] = []
+
+    async def sample_rss():
+        while True:
+            if server_pid:
+                rss_samples.append(tree_rss_mb(server_pid))
+            await asyncio.sleep(1.0)
+
+    limits = httpx.Limits(max_connections=concurrency * 2, max_keepalive_connections=concurrency * 2)
+    async with httpx.AsyncClient(base_url=url, timeout=request_timeout, limits=limits) as client:
+        sampler = asyncio.create_task(sample_rss())
+        start = time.perf_counter()
+        # Learners start a new journey only before the deadline; running ones finish
+        await asyncio.gather(*[
+            learner(client, stats, start + seconds, training_type, chat_turns, seed * 1000 + i)
+            for i in range(concurrency)
+        ])
+        wall = time.perf_counter() - start
+        sampler.cancel()
+
+    all_latencies = [lat for values in stats.latencies.values() for lat in values]
+    requests = len(all_latencies)
+    errors = sum(stats.errors.values())
+    steps = {
+        step: {
+            "n": len(values),
+            "errors": stats.errors.get(step, 0),
+            "p50_s": round(percentile(values, 50), 3),
+            "p95_s": round(percentile(values, 95), 3),
+            "p99_s": round(percentile(values, 99), 3),
+        }
+        for step, values in sorted(stats.latencies.items())
+    }
+    return {
+        "concurrency": concurrency,
+        "wall_s": round(wall, 1),
+        "journeys": stats.journeys,
+        "requests": requests,
+        "throughput_rps": round(requests / wall, 3) if wall else 0.0,
+        "journeys_per_min": round(stats.journeys / wall * 60, 2) if wall else 0.0,
+        "error_rate": round(errors / requests, 4) if requests else 0.0,
+        "p50_s": round(percentile(all_latencies, 50), 3),
+        "p95_s": round(percentile(all_latencies, 95), 3),
+        "p99_s": round(percentile(all_latencies, 99), 3),
+        "server_rss_mb": max(rss_samples) if rss_samples else None,
+        "steps": steps,
+        "error_samples": stats.error_samples,
+    }
+
+
+def find_saturation(stages: List[Dict[str, Any]]) -> Optional[int]:
+    """First concurrency whose throughput gain over the previous stage is below SATURATION_GAIN"""
+    for previous, current in zip(stages, stages[1:]):
+        if previous["throughput_rps"] and \
+                current["throughput_rps"] < previous["throughput_rps"] * (1 + SATURATION_GAIN):
+            return current["concurrency"]
+    return None
+
+
+def print_report(report: Dict[str, Any]):
+    print("\n" + "=" * 100)
+    print(f"📈 LOAD TEST ({report['training_type']}, latency x{report['latency_scale']}, "
+          f"{report['chat_turns']} chat turns per journey)")
+    print("=" * 100)
+    print(f"{'Learners':>8} {'req/s':>8} {'journeys/min':>13} {'p50':>8} {'p95':>8} {'p99':>8} "
+          f"{'errors':>8} {'RSS MB':>8}")
+    for s in report["stages"]:
+        rss = f"{s['server_rss_mb']:.0f}" if s["server_rss_mb"] is not None else "-"
+        print(f"{s['concurrency']:>8} {s['throughput_rps']:>8.2f} {s['journeys_per_min']:>13.2f} "
+              f"{s['p50_s']:>7.2f}s {s['p95_s']:>7.2f}s {s['p99_s']:>7.2f}s "
+              f"{s['error_rate'] * 100:>7.1f}% {rss:>8}")
+    last = report["stages"][-1]
+    print("-" * 100)
+    print(f"Per step at {last['concurrency']} learners:")
+    for step, s in last["steps"].items():
+        print(f"   {step:<30} n={s['n']:<5} p50 {s['p50_s']:>6.2f}s  p95 {s['p95_s']:>6.2f}s  "
+              f"p99 {s['p99_s']:>6.2f}s  errors {s['errors']}")
+    for sample in last["error_samples"]:
+        print(f"   ❌ {sample}")
+    saturation = report["saturation_concurrency"]
+    print("-" * 100)
+    print(f"Saturation: {'at ' + str(saturation) + ' learners' if saturation else 'not reached'}")
+    print("=" * 100 + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ramp concurrent simulated learners against the app")
+    parser.add_argument("--stages", type=int, nargs="+", default=[1, 2, 4, 8],
+                        help="Concurrent learners per stage")
+    parser.add_argument("--stage-seconds", type=float, default=60.0)
+    parser.add_argument("--chat-turns", type=int, default=4, help="Questions per journey after the greeting")
+    parser.add_argument("--training-type", default="migraine")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Simulated service latency multiplier")
+    parser.add_argument("--cassette", help="Recorded responses for the replay server")
+    parser.add_argument("--request-timeout", type=float, default=300.0)
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--url", help="Target an already running server instead of starting one")
+    parser.add_argument("--workdir", default=str(DEFAULT_WORKDIR))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the raw results as JSON to this path")
+    args = parser.parse_args()
+
+    server = None
+    url, pid = args.url, None
+    if not url:
+        server = ReplayServer(args.port, args.latency_scale, Path(args.workdir), args.cassette)
+        print(f"🚀 Starting replay server on port {args.port}...")
+        server.start()
+        url, pid = server.url, server.process.pid
+
+    stages = []
+    try:
+        for concurrency in args.stages:
+            print(f"⏱️  Stage: {concurrency} learners for {args.stage_seconds:.0f}s")
+            stage = asyncio.run(run_stage(url, concurrency, args.stage_seconds, args.training_type,
+                                          args.chat_turns, args.request_timeout, pid, args.seed))
+            print(f"   {stage['throughput_rps']:.2f} req/s | p95 {stage['p95_s']:.2f}s | "
+                  f"errors {stage['error_rate'] * 100:.1f}%")
+            stages.append(stage)
+    finally:
+        if server:
+            server.stop()
+
+    report = {
+        "training_type": args.training_type,
+        "latency_scale": args.latency_scale,
+        "chat_turns": args.chat_turns,
+        "stages": stages,
+        "saturation_concurrency": find_saturation(stages),
+    }
+    print_report(report)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
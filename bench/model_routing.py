@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Model routing benchmark: every component on the large model vs the
+per-component models of backend.model_registry (small model for the
+supervisor, ranking and rewrite calls).
+
+Replays the learner questions of bench.graph_modes through a fresh
+ChatAgent per configuration and reports per-turn latency, the delta between
+the two, and the LLM calls per component and model.
+
+By default the external services are replayed (bench.replay; small models
+get the faster "chat_small" latency profile). With --live the real APIs
+are called, which needs the API keys.
+
+Run from the project root:
+    python -m bench.model_routing
+    python -m bench.model_routing --latency-scale 0.5 --repeat 3
+    python -m bench.model_routing --live --evaluations evaluations.json
+"""
+
+import argparse
+import contextlib
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from bench.graph_modes import LEARNER_QUESTIONS
+from bench.replay import Cassette, ReplaySession, install_replay
+
+DEFAULT_WORKDIR = Path(__file__).parent.parent / ".bench_cache"
+CONFIGS = ("single", "routed")
+
+
+def registry_for(config: str):
+    """single: every component on LARGE_MODEL, no fallbacks; routed: the defaults"""
+    from backend.model_registry import DEFAULT_SPECS, LARGE_MODEL, ModelRegistry
+    if config == "routed":
+        return ModelRegistry()
+    return ModelRegistry({component: {**spec, "model": LARGE_MODEL, "fallbacks": []}
+                          for component, spec in DEFAULT_SPECS.items()})
+
+
+def run_config(config: str, evaluations: Dict[str, Any], training_type: str, graph_mode: Optional[str],
+               questions: List[str], repeat: int, workdir: Path) -> Dict[str, Any]:
+    from backend import model_registry, rag_tool, usage_ledger, viz_cache
+    from backend.chat_agent import ChatAgent
+
+    registry = registry_for(config)
+    ledger = usage_ledger.UsageLedger(usage_dir=workdir / "usage" / config)
+    # A fresh visualization cache per configuration, so both generate the chart
+    cache = viz_cache.VisualizationCache(cache_dir=workdir / "viz_cache" / f"routing-{config}-{time.time_ns()}")
+    previous = model_registry._registry_instance, usage_ledger._ledger_instance, viz_cache._cache_instance
+    model_registry._registry_instance, usage_ledger._ledger_instance, viz_cache._cache_instance = \
+        registry, ledger, cache
+    # Cached RAG modules hold the ranking / rewrite models of the previous configuration
+    rag_tool._rag_module_instances.clear()
+    try:
+        per_turn: List[List[float]] = [[] for _ in questions]
+        for _ in range(repeat):
+            agent = ChatAgent(evaluations=evaluations, training_type=training_type, graph_mode=graph_mode)
+            agent.chat("Bonjour")  # same in both configurations; not measured
+            for i, question in enumerate(questions):
+                start = time.perf_counter()
+                agent.chat(question)
+                per_turn[i].append(time.perf_counter() - start)
+        summary = ledger.summary()
+    finally:
+        model_registry._registry_instance, usage_ledger._ledger_instance, viz_cache._cache_instance = previous
+        rag_tool._rag_module_instances.clear()
+
+    turns = [{"question": q, "latency_s": round(statistics.median(lat), 3)} for q, lat in zip(questions, per_turn)]
+    return {
+        "config": config,
+        "models": {c: s["model"] for c, s in registry.describe().items()},
+        "turns": turns,
+        "mean_latency_s": round(statistics.mean(t["latency_s"] for t in turns), 3),
+        "by_component": {c: {"calls": v["calls"], "tokens": v["input"] + v["output"]}
+                         for c, v in summary["by_component"].items()},
+        "by_model": {m: v["calls"] for m, v in summary["by_model"].items()},
+    }
+
+
+def print_report(results: List[Dict[str, Any]]):
+    base, routed = results[0], results[-1]
+    print("\n" + "=" * 90)
+    print("📊 MODEL ROUTING BENCHMARK")
+    print("=" * 90)
+    print(f"{'Question':<50} " + " ".join(f"{r['config']:>10}" for r in results) + f" {'delta':>10}")
+    for i, turn in enumerate(base["turns"]):
+        cells = " ".join(f"{r['turns'][i]['latency_s']:>9.2f}s" for r in results)
+        delta = routed["turns"][i]["latency_s"] - turn["latency_s"]
+        print(f"{turn['question'][:48]:<50} {cells} {delta:>+9.2f}s")
+    print("-" * 90)
+    for r in results:
+        calls = ", ".join(f"{c} {v['calls']}" for c, v in sorted(r["by_component"].items()))
+        models = ", ".join(f"{m} {n}" for m, n in sorted(r["by_model"].items()))
+        print(f"{r['config']:<8} mean {r['mean_latency_s']:.2f}s/turn | calls: {calls}")
+        print(f"{'':<8} models: {models}")
+    delta = routed["mean_latency_s"] - base["mean_latency_s"]
+    if base["mean_latency_s"]:
+        print(f"\nΔ mean per turn: {delta:+.2f}s ({delta / base['mean_latency_s'] * 100:+.0f}%)")
+    print("=" * 90 + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare single-model and per-component model routing")
+    parser.add_argument("--training-type", default="migraine")
+    parser.add_argument("--evaluations", help="Evaluations JSON (default: a replayed or live run_evaluations)")
+    parser.add_argument("--graph-mode", help="ChatAgent graph mode (default: CHAT_GRAPH_MODE)")
+    parser.add_argument("--configs", nargs="+", default=list(CONFIGS), choices=list(CONFIGS))
+    parser.add_argument("--repeat", type=int, default=1, help="Sessions per configuration (median per turn)")
+    parser.add_argument("--live", action="store_true", help="Call the real APIs instead of the replay layer")
+    parser.add_argument("--cassette", help="Recorded responses (JSON) for the replay layer")
+    parser.add_argument("--latency-scale", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", default=str(DEFAULT_WORKDIR))
+    parser.add_argument("--output", help="Write the raw results as JSON to this path")
+    args = parser.parse_args()
+
+    workdir = Path(args.workdir)
+    if args.live:
+        replay = contextlib.nullcontext()
+    else:
+        session = ReplaySession(cassette=Cassette(args.cassette) if args.cassette else Cassette(),
+                                latency_scale=args.latency_scale, workdir=workdir, seed=args.seed)
+        replay = install_replay(session)
+
+    with replay:
+        from backend.rendering import warm_renderer, shutdown_renderer
+        warm_renderer()
+        if args.evaluations:
+            evaluations = json.loads(Path(args.evaluations).read_text(encoding="utf-8"))
+        else:
+            from backend.evaluator import run_evaluations
+            evaluations = run_evaluations(args.training_type)
+        results = [run_config(config, evaluations, args.training_type, args.graph_mode,
+                              LEARNER_QUESTIONS, args.repeat, workdir) for config in args.configs]
+        shutdown_renderer()
+
+    print_report(results)
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
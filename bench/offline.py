@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Offline end-to-end benchmark on the replay layer (no network access).
+
+Drives the real backend code with the external services replaced by
+bench.replay stand-ins:
+
+- evaluate  run_evaluations(training_type)
+- table     generate_performance_table(evaluations)
+- rag       AgenticRAGModule.search over fixed knowledge base questions
+- chat      ChatAgent.chat sessions (initial feedback + the learner questions
+            of bench.graph_modes), run with N concurrent sessions
+
+and reports p50/p95 latency, throughput and peak memory per workload
+(tracemalloc peak of Python allocations, plus process max RSS).
+
+Run from the project root:
+    python -m bench.offline
+    python -m bench.offline --workloads chat --concurrency 1 4 8 --latency-scale 0.2
+    python -m bench.offline --cassette bench/cassettes/migraine.json --output results.json
+    python -m bench.offline --record --cassette bench/cassettes/migraine.json   # needs API keys
+"""
+
+import argparse
+import json
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from bench.replay import Cassette, ReplaySession, install_replay
+from bench.graph_modes import LEARNER_QUESTIONS
+
+ROOT_DIR = Path(__file__).parent.parent
+DEFAULT_WORKDIR = ROOT_DIR / ".bench_cache"
+WORKLOADS = ("evaluate", "table", "rag", "chat")
+
+RAG_QUESTIONS: List[str] = [
+    "Quels sont les traitements de première intention de la crise migraineuse?",
+    "Quand faut-il envisager un traitement prophylactique de la migraine?",
+    "Quels signaux d'alarme doivent faire suspecter une céphalée secondaire?",
+    "Quelles mesures d'hygiène de vie réduisent la fréquence des migraines?",
+]
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Linear-interpolated percentile, q in [0, 100]"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * q / 100
+    low = int(pos)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (pos - low)
+
+
+def max_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def summarize(name: str, latencies: List[float], wall_s: float, **extra) -> Dict[str, Any]:
+    peak = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else 0
+    return {
+        "workload": name,
+        "n": len(latencies),
+        "p50_s": round(percentile(latencies, 50), 3),
+        "p95_s": round(percentile(latencies, 95), 3),
+        "mean_s": round(statistics.mean(latencies), 3) if latencies else 0.0,
+        "max_s": round(max(latencies), 3) if latencies else 0.0,
+        "wall_s": round(wall_s, 3),
+        "throughput_per_s": round(len(latencies) / wall_s, 3) if wall_s else 0.0,
+        "peak_traced_mb": round(peak / 1024 / 1024, 1),
+        "max_rss_mb": max_rss_mb(),
+        **extra,
+    }
+
+
+def measure(name: str, fn: Callable[[], Any], iterations: int, **extra) -> Dict[str, Any]:
+    """Run fn sequentially `iterations` times"""
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - t0)
+    return summarize(name, latencies, time.perf_counter() - start, **extra)
+
+
+def run_chat_session(evaluations: Dict[str, Any], training_type: str, graph_mode: Optional[str],
+                     questions: List[str]) -> List[float]:
+    """One learner session: initial feedback, then every question; per-turn latencies"""
+    from backend.chat_agent import ChatAgent
+    agent = ChatAgent(evaluations=evaluations, training_type=training_type, graph_mode=graph_mode)
+    latencies = []
+    for message in ["Bonjour"] + questions:
+        t0 = time.perf_counter()
+        agent.chat(message)
+        latencies.append(time.perf_counter() - t0)
+    return latencies
+
+
+def measure_chat(evaluations: Dict[str, Any], training_type: str, graph_mode: Optional[str],
+                 concurrency: int, sessions_per_worker: int) -> Dict[str, Any]:
+    """N concurrent sessions; throughput is chat turns per second"""
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+    sessions = concurrency * sessions_per_worker
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(run_chat_session, evaluations, training_type, graph_mode, LEARNER_QUESTIONS)
+                   for _ in range(sessions)]
+        per_session = [f.result() for f in futures]
+    wall = time.perf_counter() - start
+    latencies = [lat for session in per_session for lat in session]
+    return summarize(f"chat x{concurrency}", latencies, wall, concurrency=concurrency, sessions=sessions)
+
+
+def run(args) -> Dict[str, Any]:
+    cassette = Cassette(args.cassette) if args.cassette else Cassette()
+    mode = "record" if args.record else ("strict" if args.strict else "replay")
+    session = ReplaySession(cassette=cassette, mode=mode, latency_scale=args.latency_scale,
+                            workdir=Path(args.workdir), seed=args.seed)
+    if not args.no_tracemalloc:
+        tracemalloc.start()
+
+    results: List[Dict[str, Any]] = []
+    with install_replay(session):
+        from backend.evaluator import run_evaluations
+        from backend.rendering import warm_renderer, shutdown_renderer
+        warm_renderer()  # worker start-up is not part of any workload
+
+        if args.evaluations:
+            evaluations = json.loads(Path(args.evaluations).read_text(encoding="utf-8"))
+        else:
+            evaluations = run_evaluations(args.training_type)
+
+        if "evaluate" in args.workloads:
+            results.append(measure("evaluate", lambda: run_evaluations(args.training_type), args.iterations))
+
+        if "table" in args.workloads:
+            from backend.table_generator import generate_performance_table
+            results.append(measure("table", lambda: generate_performance_table(evaluations), args.iterations))
+
+        if "rag" in args.workloads or "chat" in args.workloads:
+            from backend.rag_tool import get_rag_module
+            t0 = time.perf_counter()
+            rag_module = get_rag_module(args.training_type)
+            index_s = round(time.perf_counter() - t0, 3)
+            if "rag" in args.workloads and rag_module is not None:
+                questions = iter(RAG_QUESTIONS * args.iterations)
+                results.append(measure("rag", lambda: rag_module.search(next(questions)),
+                                       len(RAG_QUESTIONS) * args.iterations, index_s=index_s))
+
+        if "chat" in args.workloads:
+            for concurrency in args.concurrency:
+                results.append(measure_chat(evaluations, args.training_type, args.graph_mode,
+                                            concurrency, args.sessions))
+
+        shutdown_renderer()
+
+    if mode == "record":
+        cassette.save()
+    tracemalloc.stop()
+    return {
+        "training_type": args.training_type,
+        "mode": mode,
+        "latency_scale": args.latency_scale,
+        "results": results,
+        "replay": session.stats,
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    print("\n" + "=" * 100)
+    print(f"📊 OFFLINE BENCHMARK ({report['training_type']}, {report['mode']}, "
+          f"latency x{report['latency_scale']})")
+    print("=" * 100)
+    print(f"{'Workload':<14} {'n':>5} {'p50':>8} {'p95':>8} {'mean':>8} {'max':>8} "
+          f"{'wall':>8} {'ops/s':>8} {'peak MB':>8} {'RSS MB':>8}")
+    for r in report["results"]:
+        print(f"{r['workload']:<14} {r['n']:>5} {r['p50_s']:>7.2f}s {r['p95_s']:>7.2f}s {r['mean_s']:>7.2f}s "
+              f"{r['max_s']:>7.2f}s {r['wall_s']:>7.1f}s {r['throughput_per_s']:>8.2f} "
+              f"{r['peak_traced_mb']:>8.1f} {r['max_rss_mb']:>8.1f}")
+    print("-" * 100)
+    for kind, stats in report["replay"].items():
+        print(f"{kind:<10} calls {stats['calls']:>5} | recorded {stats['recorded']:>5} | "
+              f"synthesized {stats['synthesized']:>5} | live {stats['live']:>4} | "
+              f"simulated {stats['simulated_s']:.1f}s")
+    print("=" * 100 + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark with replayed external services")
+    parser.add_argument("--training-type", default="migraine")
+    parser.add_argument("--workloads", nargs="+", default=list(WORKLOADS), choices=list(WORKLOADS))
+    parser.add_argument("--iterations", type=int, default=3, help="Sequential runs of evaluate/table/rag")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4],
+                        help="Concurrent chat sessions, one measurement per value")
+    parser.add_argument("--sessions", type=int, default=1, help="Chat sessions per concurrent worker")
+    parser.add_argument("--graph-mode", help="ChatAgent graph mode (default: CHAT_GRAPH_MODE)")
+    parser.add_argument("--evaluations", help="Evaluations JSON to use instead of a replayed run_evaluations")
+    parser.add_argument("--cassette", help="Recorded responses (JSON); misses are synthesized")
+    parser.add_argument("--strict", action="store_true", help="Fail on requests missing from the cassette")
+    parser.add_argument("--record", action="store_true", help="Call the live APIs and record into --cassette")
+    parser.add_argument("--latency-scale", type=float, default=1.0,
+                        help="Multiplier on simulated latencies (0 = CPU cost only)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", default=str(DEFAULT_WORKDIR),
+                        help="Replay Chroma index and caches (reused across runs)")
+    parser.add_argument("--no-tracemalloc", action="store_true", help="Skip allocation tracing (faster)")
+    parser.add_argument("--output", help="Write the raw results as JSON to this path")
+    args = parser.parse_args()
+
+    if args.record and not args.cassette:
+        parser.error("--record needs --cassette")
+
+    report = run(args)
+    print_report(report)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,821 @@
+"""
+Replay Layer
+
+Offline stand-ins for the external services the backend calls:
+
+- ReplayChatAnthropic  -> langchain_anthropic.ChatAnthropic (and the ChatOpenAI /
+                          ChatGoogleGenerativeAI secondaries of the model registry)
+- ReplayEmbeddings     -> langchain_openai.OpenAIEmbeddings
+- ReplayTavilyClient   -> tavily.TavilyClient (ReplayAsyncTavilyClient -> AsyncTavilyClient)
+- replay_generate_code -> code_tool._generate_code_via_claude_agent (Agent SDK)
+
+Responses come from a cassette (a JSON file of recorded responses keyed on a
+hash of the request). A request missing from the cassette gets a
+deterministic synthesized response instead: schema-valid structured output,
+keyword-routed tool calls, a filled-in performance table script, etc.
+Every response is delayed by a simulated latency (recorded latency when the
+cassette has one, otherwise base + per-output-token time, lower for small
+models), scaled by `latency_scale` (0 = no sleeping, CPU cost only).
+
+ReplayChatAnthropic is a real LangChain chat model, so bind_tools,
+with_structured_output and callbacks (token usage metrics) go through the
+same code paths as in production.
+
+Recording (needs the API keys and network access) stores live responses in
+the cassette for later replays:
+
+    session = ReplaySession(cassette=Cassette(path), mode="record")
+    with install_replay(session):
+        run_evaluations("migraine")
+    session.cassette.save()
+
+Embeddings are never recorded: vectors are computed locally by feature
+hashing of the words, which keeps retrieval roughly lexical and stable.
+"""
+
+import asyncio
+import hashlib
+import importlib
+import json
+import math
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import Runnable
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import ConfigDict
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+CASSETTE_DIR = Path(__file__).parent / "cassettes"
+REPLAY_MODES = ("replay", "record", "strict")
+
+
+# =============================================================================
+# Latency model
+# =============================================================================
+
+class Latency:
+    """Simulated service latency: base + per-token time, with +/- jitter"""
+
+    def __init__(self, base_ms: float, per_token_ms: float = 0.0, jitter: float = 0.15):
+        self.base_ms = base_ms
+        self.per_token_ms = per_token_ms
+        self.jitter = jitter
+
+    def seconds(self, tokens: int = 0, recorded_ms: Optional[float] = None,
+                scale: float = 1.0, rng: Optional[random.Random] = None) -> float:
+        ms = recorded_ms if recorded_ms is not None else self.base_ms + tokens * self.per_token_ms
+        if self.jitter and rng is not None:
+            ms *= 1 + rng.uniform(-self.jitter, self.jitter)
+        return max(0.0, ms * scale / 1000)
+
+
+# Rough public figures for the hosted services; adjust with --latency-scale
+DEFAULT_LATENCIES: Dict[str, Latency] = {
+    "chat": Latency(base_ms=700, per_token_ms=15),        # time to first token + ~65 tokens/s
+    "chat_small": Latency(base_ms=400, per_token_ms=6),   # Haiku-class models, ~170 tokens/s
+    "embedding": Latency(base_ms=150, per_token_ms=0.01),
+    "search": Latency(base_ms=1200),                        # Tavily, search_depth="advanced"
+    "search_basic": Latency(base_ms=500),                   # Tavily, search_depth="basic"
+    "codegen": Latency(base_ms=3000, per_token_ms=15),     # Agent SDK session start + generation
+}
+
+
+SMALL_MODEL_MARKERS = ("haiku", "mini", "flash")
+
+
+def chat_latency_kind(model: str) -> str:
+    return "chat_small" if any(marker in model for marker in SMALL_MODEL_MARKERS) else "chat"
+
+
+def estimate_tokens(text: str) -> int:
+    """~4 characters per token"""
+    return max(1, len(text) // 4) if text else 0
+
+
+# =============================================================================
+# Cassette
+# =============================================================================
+
+def request_key(kind: str, payload: Any) -> str:
+    raw = json.dumps([kind, payload], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """Recorded responses keyed on a request hash, stored as one JSON file"""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else None
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if self.path and self.path.exists():
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            self.entries = data.get("entries", {})
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self.entries.get(key)
+
+    def put(self, key: str, entry: Dict[str, Any]):
+        with self._lock:
+            self.entries[key] = entry
+
+    def save(self):
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            raw = json.dumps({"version": 1, "entries": self.entries}, ensure_ascii=False, indent=1)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(raw, encoding="utf-8")
+        tmp.replace(self.path)
+
+
+def _message_payload(message: BaseMessage) -> Dict[str, Any]:
+    payload = {"type": message.type, "content": message.content}
+    if getattr(message, "tool_calls", None):
+        payload["tool_calls"] = [{"name": tc["name"], "args": tc["args"]} for tc in message.tool_calls]
+    if getattr(message, "tool_call_id", None):
+        payload["tool_call_id"] = message.tool_call_id
+    return payload
+
+
+def _message_text(message: BaseMessage) -> str:
+    content = message.content
+    if isinstance(content, str):
+        return content
+    if all(isinstance(block, dict) and block.get("type") == "text" for block in content):
+        return "\n".join(block["text"] for block in content)
+    return json.dumps(content, ensure_ascii=False, default=str)
+
+
+def _cached_prefix(messages: List[BaseMessage]) -> Optional[str]:
+    """Text up to the last block marked with cache_control (the Anthropic cache prefix), if any"""
+    prefix = []
+    marked = None
+    for message in messages:
+        content = message.content if isinstance(message.content, list) else [message.content]
+        for block in content:
+            prefix.append(json.dumps(block, ensure_ascii=False, sort_keys=True, default=str))
+            if isinstance(block, dict) and block.get("cache_control"):
+                marked = len(prefix)
+    return "".join(prefix[:marked]) if marked else None
+
+
+def _ai_message_to_dict(message: AIMessage) -> Dict[str, Any]:
+    return {
+        "content": message.content,
+        "tool_calls": [{"name": tc["name"], "args": tc["args"], "id": tc.get("id")} for tc in message.tool_calls],
+        "usage_metadata": dict(message.usage_metadata or {}),
+    }
+
+
+def _ai_message_from_dict(data: Dict[str, Any], model: str) -> AIMessage:
+    return AIMessage(
+        content=data.get("content", ""),
+        tool_calls=[{"name": tc["name"], "args": tc["args"], "id": tc.get("id") or f"toolu_replay_{i}",
+                     "type": "tool_call"} for i, tc in enumerate(data.get("tool_calls", []))],
+        usage_metadata=data.get("usage_metadata") or None,
+        response_metadata={"model": model, "model_name": model},
+    )
+
+
+# =============================================================================
+# Synthesized responses
+# =============================================================================
+
+WORDS = (
+    "patient apprenant expert scénario situation évaluation raisonnement communication "
+    "priorité sécurité équipe collaboration ordonnance migraine traitement suivi "
+    "documentation leadership objectif compétence intervention justification clinique "
+    "recommandation analyse contexte risque plan soins approche pertinent"
+).split()
+
+# Learner question keywords -> tool, for tool-bound calls answering a human turn
+DEFAULT_ROUTES: List[Tuple[str, str]] = [
+    (r"tableau|graphique|visuali|diagramme|chart|graph", "generate_visualization"),
+    (r"derni[eè]res|actualit|latest|news", "search_web"),
+    (r"que disent les experts|r[ée]ponses? des experts|contenu de la formation", "get_training_content"),
+    (r"pourquoi|guideline|recommandation|lignes? directrices|ordonnance", "search_knowledge_base"),
+]
+
+COVERAGE_MAP = {"Low": "Early", "Medium": "Partial", "High": "Achieved"}
+REASONING_MAP = {"Unsatisfactory": "Developing", "Needs Improvement": "Developing",
+                 "Satisfactory": "Emerging", "Good": "Established", "Very Good": "Strong"}
+COMMUNICATION_MAP = {"Unsatisfactory": "Early", "Needs Improvement": "Early",
+                     "Satisfactory": "Developing", "Good": "Developing", "Very Good": "Established"}
+
+SYNTH_VISUALIZATION_CODE = '''```python
+import matplotlib.pyplot as plt
+import io
+import base64
+
+def generate_visualization(evaluations: dict) -> dict:
+    counts = {"High": 0, "Medium": 0, "Low": 0}
+    for training in evaluations.values():
+        for situation in training.get("situations", {}).values():
+            for scenario in situation.get("scenarios", {}).values():
+                level = scenario.get("coverage", {}).get("score_assessment")
+                if level in counts:
+                    counts[level] += 1
+    fig, ax = plt.subplots(figsize=(8, 5))
+    add_sensai_header(fig)
+    ax.bar(["Élevée", "Moyenne", "Faible"], list(counts.values()), color=["#2E86AB", "#F6AE2D", "#E4572E"])
+    ax.set_ylabel("Nombre de scénarios")
+    plt.tight_layout()
+    buffer = io.BytesIO()
+    plt.savefig(buffer, format="png", dpi=120)
+    plt.close()
+    return {"image_base64": base64.b64encode(buffer.getvalue()).decode(), "summary_data": counts}
+```'''
+
+
+class Responder:
+    """Deterministic responses for requests missing from the cassette"""
+
+    def __init__(self, text_words: int = 120, map_size: int = 3, list_size: int = 3,
+                 routes: Optional[List[Tuple[str, str]]] = None):
+        self.text_words = text_words
+        self.map_size = map_size
+        self.list_size = list_size
+        self.routes = [(re.compile(p, re.I), tool) for p, tool in (routes or DEFAULT_ROUTES)]
+        # Per-schema overrides: tool name -> args builder
+        self.overrides: Dict[str, Callable[[List[BaseMessage], random.Random], Dict[str, Any]]] = {
+            "RankingResult": lambda msgs, rng: {"is_relevant": True, "reasoning": self.text(rng, 20)},
+            "RewrittenQuery": lambda msgs, rng: {"query": f"{self._user_request(msgs)} recommandations cliniques"},
+            "ExpertAnalysis": self.expert_analysis,
+            "LearnerEvaluation": self.learner_evaluation,
+            "PerformanceTableRows": self.table_rows,
+        }
+
+    # ----- building blocks -----
+
+    def text(self, rng: random.Random, words: Optional[int] = None) -> str:
+        n = words or self.text_words
+        return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + "."
+
+    def from_schema(self, schema: Dict[str, Any], rng: random.Random, defs: Dict[str, Any],
+                    name: str = "") -> Any:
+        """Schema-valid value for a JSON schema (pydantic flavour)"""
+        if "$ref" in schema:
+            return self.from_schema(defs[schema["$ref"].split("/")[-1]], rng, defs, name)
+        if "enum" in schema:
+            return schema["enum"][rng.randrange(len(schema["enum"]))]
+        if "anyOf" in schema:
+            options = [s for s in schema["anyOf"] if s.get("type") != "null"] or schema["anyOf"]
+            return self.from_schema(options[0], rng, defs, name)
+        kind = schema.get("type")
+        if kind == "object":
+            props = schema.get("properties")
+            if props:
+                return {key: self.from_schema(sub, rng, defs, key) for key, sub in props.items()}
+            extra = schema.get("additionalProperties")
+            if isinstance(extra, dict):
+                singular = name[:-1] if name.endswith("s") else name or "item"
+                return {f"{singular}_{i + 1}": self.from_schema(extra, rng, defs, singular)
+                        for i in range(self.map_size)}
+            return {}
+        if kind == "array":
+            count = max(schema.get("minItems", 0), min(self.list_size, schema.get("maxItems", self.list_size)))
+            return [self.from_schema(schema.get("items", {"type": "string"}), rng, defs, name) for _ in range(count)]
+        if kind == "boolean":
+            return True
+        if kind == "integer":
+            return int(schema.get("minimum", 1))
+        if kind == "number":
+            return float(schema.get("minimum", 0.5))
+        return self.text(rng, 12)
+
+    @staticmethod
+    def _user_request(messages: List[BaseMessage]) -> str:
+        humans = [m for m in messages if isinstance(m, HumanMessage)]
+        if not humans:
+            return ""
+        text = _message_text(humans[-1])
+        match = re.search(r"User's New Request:\s*(.*)", text)
+        return (match.group(1) if match else text).strip()
+
+    # ----- responses -----
+
+    def chat(self, messages: List[BaseMessage], tools: List[Dict[str, Any]],
+             tool_choice: Any, rng: random.Random) -> Tuple[str, List[Dict[str, Any]]]:
+        """Return (content, tool_calls) for a chat request"""
+        functions = {t["function"]["name"]: t["function"] for t in tools if "function" in t}
+
+        forced = None
+        if tool_choice and len(functions) == 1:
+            forced = next(iter(functions))
+        elif isinstance(tool_choice, str) and tool_choice in functions:
+            forced = tool_choice
+        elif isinstance(tool_choice, dict):
+            forced = tool_choice.get("name") or tool_choice.get("function", {}).get("name")
+        if forced:
+            return "", [{"name": forced, "args": self.tool_args(forced, functions[forced], messages, rng)}]
+
+        system = " ".join(_message_text(m) for m in messages if isinstance(m, SystemMessage))
+        if "CODE TEMPLATE" in system and "table1_detailed.png" in system:
+            return self.table_script(system, messages), []
+
+        if functions and messages and isinstance(messages[-1], HumanMessage):
+            request = self._user_request(messages)
+            for pattern, tool in self.routes:
+                if tool in functions and pattern.search(request):
+                    return "", [{"name": tool, "args": self.tool_args(tool, functions[tool], messages, rng)}]
+        return self.text(rng), []
+
+    def tool_args(self, name: str, function: Dict[str, Any], messages: List[BaseMessage],
+                  rng: random.Random) -> Dict[str, Any]:
+        if name in self.overrides:
+            return self.overrides[name](messages, rng)
+        request = self._user_request(messages)
+        if name == "generate_visualization":
+            return {"user_request": request, "conversation_history": "", "include_evaluation_data": True}
+        if name == "get_training_content":
+            args = {"module_number": 1}
+            for field in ("situation", "scenario"):
+                match = re.search(rf"{field.replace('e', '[eé]')}\s*(\d+)", request, re.I)
+                if match:
+                    args[field] = int(match.group(1))
+            return args
+        if name in ("search_knowledge_base", "search_web"):
+            return {"query": request}
+        schema = function.get("parameters", {})
+        return self.from_schema(schema, rng, schema.get("$defs", {}))
+
+    # Split evaluation (backend.expert_analysis): one entry per situation / scenario of the prompt
+
+    def expert_analysis(self, messages: List[BaseMessage], rng: random.Random) -> Dict[str, Any]:
+        text = _message_text(messages[-1])
+        objectives = [f"Objectif {i + 1}" for i in range(self.map_size)]
+        return {
+            "objectives": objectives,
+            "situations": [{"situation": int(n), "description": self.text(rng, 12)}
+                           for n in re.findall(r"^Situation (\d+):", text, re.M)],
+            "scenarios": [{
+                "scenario": int(n),
+                "expert_key_elements": [self.text(rng, 3) for _ in range(self.list_size)],
+                "expert_consensus": self.text(rng, 20),
+                "applicable_objectives": rng.sample(objectives, 2),
+            } for n in re.findall(r"^Scenario (\d+):", text, re.M)],
+        }
+
+    def table_rows(self, messages: List[BaseMessage], rng: random.Random) -> Dict[str, Any]:
+        """One row per `row` number of the request (backend.table_generator.update_performance_table_rows)"""
+        rows = [int(n) for n in re.findall(r'"row": (\d+)', _message_text(messages[-1]))]
+        return {"rows": [{
+            "row": n,
+            "coverage": rng.choice(["Early", "Partial", "Achieved"]),
+            "logical_reasoning": rng.choice(["Developing", "Emerging", "Established"]),
+            "communication": rng.choice(["Early", "Developing", "Established"]),
+            "themes_addressed": self.text(rng, 6),
+            "themes_missing": self.text(rng, 6),
+        } for n in rows]}
+
+    def learner_evaluation(self, messages: List[BaseMessage], rng: random.Random) -> Dict[str, Any]:
+        # The expert brief is in the system prompt, the learner's answers in the last message
+        text = "\n".join(_message_text(m) for m in messages)
+        answered = set(re.findall(r"^Scenario (\d+):", _message_text(messages[-1]), re.M))
+        scenarios = []
+        for n, objectives in re.findall(r"^Scenario (\d+) \(Situation \d+\):.*?^Applicable objectives: (.*?)$",
+                                        text, re.M | re.S):
+            if n not in answered:
+                continue
+            scenarios.append({
+                "scenario": int(n),
+                "coverage": {"score_assessment": rng.choice(["High", "Medium", "Low"]),
+                             "justification": self.text(rng, 30)},
+                "logical_reasoning": {"assessment": self.text(rng, 15),
+                                      "rating": rng.choice(["Satisfactory", "Unsatisfactory"])},
+                "communication": {"assessment": self.text(rng, 15),
+                                  "rating": rng.choice(["Excellent", "Good", "Needs Improvement"])},
+                "skills_assessment": {name: {"present_in_scenario": True,
+                                             "learner_assessment": rng.choice(["Satisfactory", "Unsatisfactory"]),
+                                             "justification": self.text(rng, 12)}
+                                      for name in objectives.split("; ") if name},
+            })
+        return {"scenarios": scenarios}
+
+    def table_script(self, system: str, messages: List[BaseMessage]) -> str:
+        """The prompt's own code template with the data rows filled in"""
+        match = re.search(r"```python\n(.*?)```", system, re.S)
+        try:
+            evaluations = json.loads(_message_text(messages[-1]))
+        except (json.JSONDecodeError, IndexError):
+            evaluations = {}
+        trainings = [evaluations] if "situations" in evaluations else [
+            t for t in evaluations.values() if isinstance(t, dict)]
+
+        rows = []
+        for training in trainings:
+            for sit_index, situation in enumerate(training.get("situations", {}).values(), 1):
+                title = " ".join(situation.get("description", "").split()[:2]) or "Situation"
+                for scenario in situation.get("scenarios", {}).values():
+                    rows.append([
+                        f"S{len(rows) + 1}", f"Sit. {sit_index}\n{title}",
+                        COVERAGE_MAP.get(scenario.get("coverage", {}).get("score_assessment"), "Early"),
+                        REASONING_MAP.get(scenario.get("logical_reasoning", {}).get("rating"), "Developing"),
+                        COMMUNICATION_MAP.get(scenario.get("communication", {}).get("rating"), "Early"),
+                        "Themes addressed\nby the learner", "Themes not yet\naddressed",
+                    ])
+        if not match:
+            return "import matplotlib.pyplot as plt\nfig = plt.figure()\nplt.savefig('table1_detailed.png')\n"
+        return re.sub(r"data = \[\n.*?\n\]\n", lambda _: f"data = {rows!r}\n", match.group(1), count=1, flags=re.S)
+
+    def search(self, query: str, max_results: int, include_answer: bool, rng: random.Random,
+               search_depth: str = "advanced") -> Dict[str, Any]:
+        slug = re.sub(r"\W+", "-", query.lower()).strip("-")[:40] or "query"
+        # Basic depth: shorter snippets and less relevant results, more or less so per query
+        top = 0.9 if search_depth == "advanced" else round(rng.uniform(0.45, 0.85), 2)
+        results = [{
+            "title": f"{query[:60]} ({i + 1})",
+            "url": f"https://example.org/replay/{slug}-{i + 1}",
+            "content": self.text(rng, 60 if search_depth == "advanced" else 30),
+            "score": round(max(0.05, top - i * 0.1), 2),
+        } for i in range(max_results)]
+        response = {"query": query, "results": results}
+        if include_answer:
+            response["answer"] = self.text(rng, 40)
+        return response
+
+
+# =============================================================================
+# Session
+# =============================================================================
+
+class ReplaySession:
+    """Shared state of the stand-ins: cassette, responder, latencies, counters"""
+
+    def __init__(self, cassette: Optional[Cassette] = None, mode: str = "replay",
+                 latency_scale: float = 1.0, latencies: Optional[Dict[str, Latency]] = None,
+                 responder: Optional[Responder] = None, workdir: Optional[Path] = None, seed: int = 0):
+        if mode not in REPLAY_MODES:
+            raise ValueError(f"Unknown replay mode '{mode}'. Available: {', '.join(REPLAY_MODES)}")
+        self.cassette = cassette or Cassette()
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.latencies = {**DEFAULT_LATENCIES, **(latencies or {})}
+        self.responder = responder or Responder()
+        # Chroma index and visualization cache of the replayed run
+        self.workdir = Path(workdir) if workdir else Path(tempfile.mkdtemp(prefix="sensai_replay_"))
+        self.seed = seed
+        self._jitter_rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats: Dict[str, Dict[str, float]] = {}
+        self.live_codegen: Optional[Callable] = None
+        # Hashes of the prompt-cache prefixes written by earlier synthesized responses
+        self._prompt_cache: set = set()
+
+    def rng_for(self, key: str) -> random.Random:
+        """Per-request RNG so synthesized content does not depend on call order"""
+        return random.Random(f"{self.seed}:{key}")
+
+    def _count(self, kind: str, source: str, slept: float):
+        with self._lock:
+            stats = self.stats.setdefault(kind, {"calls": 0, "recorded": 0, "synthesized": 0, "live": 0,
+                                                 "simulated_s": 0.0})
+            stats["calls"] += 1
+            stats[source] += 1
+            stats["simulated_s"] = round(stats["simulated_s"] + slept, 3)
+
+    def delay(self, kind: str, tokens: int = 0, recorded_ms: Optional[float] = None) -> float:
+        with self._lock:
+            seconds = self.latencies[kind].seconds(tokens, recorded_ms, self.latency_scale, self._jitter_rng)
+        return seconds
+
+    def lookup(self, kind: str, key: str) -> Optional[Dict[str, Any]]:
+        entry = self.cassette.get(key)
+        if entry is None and self.mode == "strict":
+            raise KeyError(f"No recorded {kind} response for request {key[:12]}")
+        return entry
+
+    # ----- chat -----
+
+    def chat(self, model: str, messages: List[BaseMessage], tools: List[Dict[str, Any]],
+             tool_choice: Any) -> AIMessage:
+        payload = {
+            "model": model,
+            "messages": [_message_payload(m) for m in messages],
+            "tools": [t.get("function", t).get("name") for t in tools],
+            "tool_choice": tool_choice,
+        }
+        key = request_key("chat", payload)
+
+        if self.mode == "record":
+            start = time.perf_counter()
+            message = self._live_chat(model, messages, tools, tool_choice)
+            self.cassette.put(key, {"kind": "chat", "message": _ai_message_to_dict(message),
+                                    "latency_ms": round((time.perf_counter() - start) * 1000, 1)})
+            self._count("chat", "live", 0.0)
+            return message
+
+        entry = self.lookup("chat", key)
+        if entry is not None:
+            message = _ai_message_from_dict(entry["message"], model)
+            seconds = self.delay(chat_latency_kind(model), recorded_ms=entry.get("latency_ms"))
+            source = "recorded"
+        else:
+            content, tool_calls = self.responder.chat(messages, tools, tool_choice, self.rng_for(key))
+            input_tokens = sum(estimate_tokens(_message_text(m)) for m in messages)
+            input_tokens += estimate_tokens(json.dumps(tools, default=str)) if tools else 0
+            output_tokens = estimate_tokens(content) + sum(
+                estimate_tokens(json.dumps(tc["args"], ensure_ascii=False)) for tc in tool_calls)
+            usage = {"input_tokens": input_tokens, "output_tokens": output_tokens,
+                     "total_tokens": input_tokens + output_tokens}
+            # Like Anthropic: the first call writes a marked prefix, the next ones read it
+            prefix = _cached_prefix(messages)
+            if prefix is not None:
+                prefix_key = hashlib.sha256(f"{model}:{prefix}".encode("utf-8")).hexdigest()
+                with self._lock:
+                    cached = prefix_key in self._prompt_cache
+                prefix_tokens = min(estimate_tokens(prefix), input_tokens)
+                usage["input_token_details"] = {"cache_read" if cached else "cache_creation": prefix_tokens}
+            message = AIMessage(
+                content=content,
+                tool_calls=[{**tc, "id": f"toolu_replay_{key[:8]}_{i}", "type": "tool_call"}
+                            for i, tc in enumerate(tool_calls)],
+                usage_metadata=usage,
+                response_metadata={"model": model, "model_name": model},
+            )
+            seconds = self.delay(chat_latency_kind(model), tokens=output_tokens)
+            source = "synthesized"
+        time.sleep(seconds)
+        if entry is None and prefix is not None:
+            with self._lock:
+                self._prompt_cache.add(prefix_key)
+        self._count("chat", source, seconds)
+        return message
+
+    def _live_chat(self, model: str, messages: List[BaseMessage], tools: List[Dict[str, Any]],
+                   tool_choice: Any) -> AIMessage:
+        from langchain_anthropic import ChatAnthropic
+        llm = ChatAnthropic(model=model, temperature=0, anthropic_api_key=os.getenv("ANTHROPIC_API_KEY"))
+        if tools:
+            llm = llm.bind_tools(tools, tool_choice=tool_choice) if tool_choice else llm.bind_tools(tools)
+        return llm.invoke(messages)
+
+    # ----- web search -----
+
+    def search(self, query: str, **kwargs) -> Dict[str, Any]:
+        max_results = int(kwargs.get("max_results", 5))
+        include_answer = bool(kwargs.get("include_answer", False))
+        depth = kwargs.get("search_depth", "basic")  # Tavily's default
+        latency_kind = "search_basic" if depth == "basic" else "search"
+        key = request_key("search", {"query": query, **kwargs})
+
+        if self.mode == "record":
+            from tavily import TavilyClient
+            start = time.perf_counter()
+            response = TavilyClient(api_key=os.getenv("TAVILY_API_KEY")).search(query=query, **kwargs)
+            self.cassette.put(key, {"kind": "search", "response": response,
+                                    "latency_ms": round((time.perf_counter() - start) * 1000, 1)})
+            self._count("search", "live", 0.0)
+            return response
+
+        entry = self.lookup("search", key)
+        if entry is not None:
+            response, source = entry["response"], "recorded"
+            seconds = self.delay(latency_kind, recorded_ms=entry.get("latency_ms"))
+        else:
+            response = self.responder.search(query, max_results, include_answer, self.rng_for(key), depth)
+            source = "synthesized"
+            seconds = self.delay(latency_kind)
+        time.sleep(seconds)
+        self._count("search", source, seconds)
+        return response
+
+    # ----- code generation (Agent SDK) -----
+
+    async def generate_code(self, system_prompt: str, user_prompt: str) -> str:
+        key = request_key("codegen", {"system": system_prompt, "user": user_prompt})
+
+        if self.mode == "record" and self.live_codegen is not None:
+            start = time.perf_counter()
+            text = await self.live_codegen(system_prompt, user_prompt)
+            self.cassette.put(key, {"kind": "codegen", "text": text,
+                                    "latency_ms": round((time.perf_counter() - start) * 1000, 1)})
+            self._count("codegen", "live", 0.0)
+            return text
+
+        entry = self.lookup("codegen", key)
+        if entry is not None:
+            text, source = entry["text"], "recorded"
+            seconds = self.delay("codegen", recorded_ms=entry.get("latency_ms"))
+        else:
+            text, source = SYNTH_VISUALIZATION_CODE, "synthesized"
+            seconds = self.delay("codegen", tokens=estimate_tokens(text))
+        await asyncio.sleep(seconds)
+        self._count("codegen", source, seconds)
+        return text
+
+    # ----- embeddings -----
+
+    def embed(self, texts: List[str], dimensions: int) -> List[List[float]]:
+        vectors = [hashed_embedding(text, dimensions) for text in texts]
+        seconds = self.delay("embedding", tokens=sum(estimate_tokens(t) for t in texts))
+        time.sleep(seconds)
+        self._count("embedding", "synthesized", seconds)
+        return vectors
+
+
+def hashed_embedding(text: str, dimensions: int = 1536) -> List[float]:
+    """Unit vector from signed feature hashing of the lowercased words"""
+    vector = [0.0] * dimensions
+    for word in re.findall(r"\w+", text.lower()):
+        h = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "big")
+        vector[h % dimensions] += 1.0 if (h >> 63) & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector))
+    if norm == 0:
+        vector[0], norm = 1.0, 1.0
+    return [v / norm for v in vector]
+
+
+_session: Optional[ReplaySession] = None
+
+
+def get_replay_session() -> ReplaySession:
+    """Active session; a default synthesized one when none is installed"""
+    global _session
+    if _session is None:
+        _session = ReplaySession()
+    return _session
+
+
+# =============================================================================
+# Stand-ins
+# =============================================================================
+
+class ReplayChatAnthropic(BaseChatModel):
+    """ChatAnthropic stand-in served by the active ReplaySession"""
+
+    model: str = "claude-sonnet-4-6"
+    temperature: float = 0.0
+    max_tokens: Optional[int] = None
+
+    model_config = ConfigDict(extra="ignore")
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay-anthropic"
+
+    def bind_tools(self, tools, *, tool_choice=None, **kwargs) -> Runnable:
+        formatted = [convert_to_openai_tool(tool) for tool in tools]
+        return self.bind(tools=formatted, tool_choice=tool_choice, **kwargs)
+
+    def with_structured_output(self, schema, **kwargs) -> Runnable:
+        # Resolvable return annotation: RunnableWithFallbacks (model registry
+        # fallback chains) relies on it to forward the call to every model
+        return super().with_structured_output(schema, **kwargs)
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None,
+                  tools: Optional[List[Dict[str, Any]]] = None, tool_choice: Any = None,
+                  **kwargs) -> ChatResult:
+        message = get_replay_session().chat(self.model, messages, tools or [], tool_choice)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+class ReplayEmbeddings(Embeddings):
+    """OpenAIEmbeddings stand-in (text-embedding-3-small dimensions)"""
+
+    def __init__(self, model: str = "text-embedding-3-small", dimensions: int = 1536, **kwargs):
+        self.model = model
+        self.dimensions = dimensions
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return get_replay_session().embed(list(texts), self.dimensions)
+
+    def embed_query(self, text: str) -> List[float]:
+        return get_replay_session().embed([text], self.dimensions)[0]
+
+
+class ReplayTavilyClient:
+    """TavilyClient stand-in"""
+
+    def __init__(self, api_key: Optional[str] = None, **kwargs):
+        self.api_key = api_key
+
+    def search(self, query: str, **kwargs) -> Dict[str, Any]:
+        return get_replay_session().search(query, **kwargs)
+
+
+class ReplayAsyncTavilyClient:
+    """AsyncTavilyClient stand-in; the simulated latency runs in a worker thread"""
+
+    def __init__(self, api_key: Optional[str] = None, **kwargs):
+        self.api_key = api_key
+
+    async def search(self, query: str, **kwargs) -> Dict[str, Any]:
+        return await asyncio.to_thread(get_replay_session().search, query, **kwargs)
+
+
+async def replay_generate_code(system_prompt: str, user_prompt: str) -> str:
+    """Stand-in for code_tool._generate_code_via_claude_agent"""
+    return await get_replay_session().generate_code(system_prompt, user_prompt)
+
+
+# =============================================================================
+# Installation
+# =============================================================================
+
+BACKEND_MODULES = (
+    "backend.evaluator",
+    "backend.chat_agent",
+    "backend.supervisor_agent",
+    "backend.supervisor_tools",
+    "backend.rag_tool",
+    "backend.table_generator",
+    "backend.web_search_tool",
+    "backend.code_tool",
+    "backend.model_registry",
+)
+
+STAND_INS = {
+    "ChatAnthropic": ReplayChatAnthropic,
+    # Secondary providers of the model registry (hedging / failover)
+    "ChatOpenAI": ReplayChatAnthropic,
+    "ChatGoogleGenerativeAI": ReplayChatAnthropic,
+    "OpenAIEmbeddings": ReplayEmbeddings,
+    "TavilyClient": ReplayTavilyClient,
+    "AsyncTavilyClient": ReplayAsyncTavilyClient,
+}
+
+
+def disable_tracing():
+    """The backend modules force LangSmith tracing on at import time"""
+    os.environ["LANGCHAIN_TRACING_V2"] = "false"
+    os.environ["LANGSMITH_TRACING"] = "false"
+    try:
+        from langsmith import utils as ls_utils
+        ls_utils.get_env_var.cache_clear()
+    except (ImportError, AttributeError):
+        pass
+
+
+@contextmanager
+def install_replay(session: ReplaySession) -> Iterator[ReplaySession]:
+    """Route the backend's external calls to the replay stand-ins.
+
+    Also points the Chroma index, the usage ledger, the evaluation
+    analytics table and the visualization, web search and expert analysis
+    caches at the session workdir, so replayed vectors, token usage,
+    evaluations, renders, search results and analyses never mix with the
+    real ones, and drops cached RAG modules built with real clients.
+    """
+    global _session
+    modules = [importlib.import_module(name) for name in BACKEND_MODULES]
+    disable_tracing()
+
+    patches: List[Tuple[Any, str, Any]] = []
+
+    def patch(obj, attr, value):
+        patches.append((obj, attr, getattr(obj, attr)))
+        setattr(obj, attr, value)
+
+    for module in modules:
+        for name, stand_in in STAND_INS.items():
+            if hasattr(module, name):
+                patch(module, name, stand_in)
+
+    from backend import analytics, code_tool, expert_analysis, rag_tool, search_cache, usage_ledger, viz_cache
+    session.live_codegen = code_tool._generate_code_via_claude_agent
+    patch(code_tool, "_generate_code_via_claude_agent", replay_generate_code)
+    patch(rag_tool, "_rag_module_instances", {})
+    session.workdir.mkdir(parents=True, exist_ok=True)
+    patch(rag_tool, "CHROMA_PERSIST_DIR", session.workdir / "chroma")
+    # The Chroma index is reused across runs; cached renders would hide code generation
+    shutil.rmtree(session.workdir / "viz_cache", ignore_errors=True)
+    patch(viz_cache, "_cache_instance", viz_cache.VisualizationCache(cache_dir=session.workdir / "viz_cache"))
+    shutil.rmtree(session.workdir / "search_cache", ignore_errors=True)
+    patch(search_cache, "_cache_instance", search_cache.SearchCache(cache_dir=session.workdir / "search_cache"))
+    shutil.rmtree(session.workdir / "expert_cache", ignore_errors=True)
+    patch(expert_analysis, "_cache_instance",
+          expert_analysis.ExpertAnalysisCache(cache_dir=session.workdir / "expert_cache"))
+    # Replayed token usage must not reach the capacity-planning ledger
+    shutil.rmtree(session.workdir / "usage", ignore_errors=True)
+    patch(usage_ledger, "_ledger_instance", usage_ledger.UsageLedger(usage_dir=session.workdir / "usage"))
+    # ... and replayed evaluations must not reach the analytics table
+    shutil.rmtree(session.workdir / "analytics", ignore_errors=True)
+    patch(analytics, "_analytics_instance",
+          analytics.EvaluationAnalytics(data_dir=session.workdir / "analytics"))
+
+    previous, _session = _session, session
+    try:
+        yield session
+    finally:
+        _session = previous
+        for obj, attr, value in reversed(patches):
+            setattr(obj, attr, value)
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Serve the FastAPI app with the external services replayed (see bench.replay).
+
+Used by bench.loadtest; can also be started by hand to click through the
+frontend offline. Sessions and the replay Chroma index live in --workdir.
+
+Run from the project root:
+    python -m bench.replay_server --port 8100 --latency-scale 1.0
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from bench.replay import Cassette, ReplaySession, install_replay, disable_tracing
+
+DEFAULT_WORKDIR = Path(__file__).parent.parent / ".bench_cache"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the app against replayed LLM/embedding/search services")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-scale", type=float, default=1.0)
+    parser.add_argument("--cassette", help="Recorded responses (JSON); misses are synthesized")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", default=str(DEFAULT_WORKDIR))
+    args = parser.parse_args()
+
+    workdir = Path(args.workdir)
+    session = ReplaySession(cassette=Cassette(args.cassette) if args.cassette else Cassette(),
+                            latency_scale=args.latency_scale, workdir=workdir, seed=args.seed)
+    with install_replay(session):
+        import uvicorn
+        from backend import session_store
+        from backend.app import app
+
+        disable_tracing()  # backend.app turns tracing back on at import
+
+        session_store.SESSIONS_DIR = workdir / "sessions"
+        uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Local HTTP stand-in for the Tavily search API (POST /search).
+
+Answers with the synthesized or recorded responses of bench.replay, after
+the simulated search latency (shorter at basic depth), so the real
+TavilyClient / AsyncTavilyClient code paths of backend.web_search_tool,
+HTTP and JSON included, run without network access or API credits:
+
+    python -m bench.tavily_stub --port 8765 --latency-scale 0.5
+    TAVILY_API_URL=http://127.0.0.1:8765 uvicorn backend.app:app
+
+GET /stats returns the requests served (query, depth, start/end times) and
+the replay counters, to check concurrency and depth escalation.
+
+From Python, serve_stub() runs the stand-in in a background thread:
+
+    with serve_stub(ReplaySession(latency_scale=0.1)) as base_url:
+        os.environ["TAVILY_API_URL"] = base_url
+        ...
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from bench.replay import Cassette, ReplaySession
+
+# Request fields that change the replayed response (and its cassette key)
+SEARCH_FIELDS = ("max_results", "search_depth", "include_answer")
+
+
+class TavilyStubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, session: ReplaySession):
+        super().__init__(address, TavilyStubHandler)
+        self.session = session
+        self.requests: List[Dict[str, Any]] = []
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def log_request(self, entry: Dict[str, Any]):
+        with self._lock:
+            self.requests.append(entry)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class TavilyStubHandler(BaseHTTPRequestHandler):
+    server: TavilyStubServer
+
+    def _send_json(self, status: int, payload: Dict[str, Any]):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/search":
+            self._send_json(404, {"detail": {"error": f"Unknown endpoint {self.path}"}})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"detail": {"error": "Invalid JSON body"}})
+            return
+        query = request.get("query")
+        if not query:
+            self._send_json(400, {"detail": {"error": "query is required"}})
+            return
+
+        kwargs = {field: request[field] for field in SEARCH_FIELDS if field in request}
+        start = time.perf_counter() - self.server.started
+        response = self.server.session.search(query, **kwargs)
+        end = time.perf_counter() - self.server.started
+        self.server.log_request({"query": query, "search_depth": kwargs.get("search_depth", "basic"),
+                                 "start_s": round(start, 3), "end_s": round(end, 3)})
+        self._send_json(200, {**response, "response_time": round(end - start, 3)})
+
+    def do_GET(self):
+        if self.path.rstrip("/") != "/stats":
+            self._send_json(404, {"detail": {"error": f"Unknown endpoint {self.path}"}})
+            return
+        with self.server._lock:
+            requests = list(self.server.requests)
+        self._send_json(200, {"requests": requests, "replay": self.server.session.stats})
+
+    def log_message(self, format, *args):
+        pass  # one line per search is too noisy next to the backend logs
+
+
+@contextmanager
+def serve_stub(session: ReplaySession, host: str = "127.0.0.1", port: int = 0) -> Iterator[str]:
+    """Run the stand-in in a background thread; yields its base URL (port 0 = any free port)"""
+    server = TavilyStubServer((host, port), session)
+    thread = threading.Thread(target=server.serve_forever, name="tavily-stub", daemon=True)
+    thread.start()
+    try:
+        yield server.base_url
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve replayed Tavily search responses over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-scale", type=float, default=1.0)
+    parser.add_argument("--cassette", help="Recorded responses (JSON); misses are synthesized")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    session = ReplaySession(cassette=Cassette(args.cassette) if args.cassette else Cassette(),
+                            latency_scale=args.latency_scale, seed=args.seed)
+    server = TavilyStubServer((args.host, args.port), session)
+    print(f"🔍 Tavily stand-in listening on {server.base_url} (TAVILY_API_URL={server.base_url})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -50,4 +50,61 @@ class SituationEvaluation(BaseModel):
 
 class TrainingEvaluation(BaseModel):
     """Complete evaluation for a training module"""
-    situations: Dict[str, SituationEvaluation]
\ No newline at end of file
+    situations: Dict[str, SituationEvaluation]
+
+# ============= Split evaluation (expert side cached, learner side per learner) =============
+
+class ScenarioExpertAnalysis(BaseModel):
+    """Expert-side analysis of a scenario, shared by every learner of the training"""
+    scenario: int = Field(description="Scenario number")
+    expert_key_elements: List[str]
+    expert_consensus: str = Field(description="One line summary of the expert panel's position and reasoning")
+    applicable_objectives: List[str] = Field(
+        description="Learning objectives at stake in this scenario, named exactly as in `objectives`"
+    )
+
+
+class SituationExpertAnalysis(BaseModel):
+    """Expert-side description of a situation"""
+    situation: int = Field(description="Situation number")
+    description: str = Field(description="One line description of the situation")
+
+
+class ExpertAnalysis(BaseModel):
+    """Expert-side analysis of a training module (no learner data)"""
+    objectives: List[str] = Field(description="Short name of each learning objective, in order")
+    situations: List[SituationExpertAnalysis]
+    scenarios: List[ScenarioExpertAnalysis]
+
+
+class LearnerScenarioAssessment(BaseModel):
+    """Learner-side evaluation of a scenario against the cached expert analysis"""
+    scenario: int = Field(description="Scenario number")
+    coverage: CoverageAssessment
+    logical_reasoning: LogicalReasoningAssessment
+    communication: CommunicationAssessment
+    skills_assessment: Dict[str, SkillAssessment] = Field(
+        description="One entry per applicable objective of the scenario, keyed by its name"
+    )
+
+
+class LearnerEvaluation(BaseModel):
+    """Learner-side evaluation of a training module"""
+    scenarios: List[LearnerScenarioAssessment]
+
+
+# ============= Performance table rows (incremental re-evaluation) =============
+
+class PerformanceTableRow(BaseModel):
+    """Cells of one scenario row of the performance table"""
+    row: int = Field(description="Row number given in the input")
+    coverage: str = Field(description="COVERAGE_MAP label")
+    logical_reasoning: str = Field(description="REASONING_MAP label")
+    communication: str = Field(description="COMMUNICATION_MAP label")
+    themes_addressed: str = Field(description="Themes addressed, <= 2 lines")
+    themes_missing: str = Field(description="Key themes not yet addressed, <= 2 lines")
+
+
+class PerformanceTableRows(BaseModel):
+    """Updated rows of the performance table"""
+    rows: List[PerformanceTableRow]